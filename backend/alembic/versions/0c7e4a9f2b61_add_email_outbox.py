@@ -0,0 +1,43 @@
+"""Add email outbox
+
+Revision ID: 0c7e4a9f2b61
+Revises: 6f3b9e2d5c70
+Create Date: 2026-10-19 02:08:45.371902
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0c7e4a9f2b61'
+down_revision: Union[str, Sequence[str], None] = '6f3b9e2d5c70'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'email_outbox',
+        sa.Column('id', sa.UUID(), nullable=False),
+        sa.Column('recipients', sa.JSON(), nullable=False),
+        sa.Column('subject', sa.String(length=255), nullable=False),
+        sa.Column('body', sa.Text(), nullable=False),
+        sa.Column('attempts', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('next_attempt_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('sent_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_email_outbox_due', 'email_outbox', ['next_attempt_at'],
+                    postgresql_where=sa.text('sent_at IS NULL'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_email_outbox_due', table_name='email_outbox')
+    op.drop_table('email_outbox')
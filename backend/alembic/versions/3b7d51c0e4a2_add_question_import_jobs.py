@@ -0,0 +1,46 @@
+"""Add question import jobs
+
+Revision ID: 3b7d51c0e4a2
+Revises: 69c290fd9b12
+Create Date: 2026-10-18 19:12:05.481370
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b7d51c0e4a2'
+down_revision: Union[str, Sequence[str], None] = '69c290fd9b12'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('question_import_jobs',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('filename', sa.String(), nullable=False),
+    sa.Column('file_path', sa.String(), nullable=False),
+    sa.Column('status', sa.Enum('PENDING', 'RUNNING', 'COMPLETED', 'FAILED', name='importjobstatus'), nullable=False),
+    sa.Column('rows_processed', sa.Integer(), nullable=False),
+    sa.Column('rows_failed', sa.Integer(), nullable=False),
+    sa.Column('questions_created', sa.Integer(), nullable=False),
+    sa.Column('last_committed_row', sa.Integer(), nullable=False),
+    sa.Column('errors', sa.JSON(), nullable=True),
+    sa.Column('error_message', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_question_import_jobs_status', 'question_import_jobs', ['status'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_question_import_jobs_status', table_name='question_import_jobs')
+    op.drop_table('question_import_jobs')
+    sa.Enum(name='importjobstatus').drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,28 @@
+"""Add question sampling index
+
+Revision ID: 5e0c7a9d3b64
+Revises: f1e6b2d4a037
+Create Date: 2026-10-18 21:17:48.220619
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e0c7a9d3b64'
+down_revision: Union[str, Sequence[str], None] = 'f1e6b2d4a037'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_questions_complexity_type_id', 'questions', ['complexity', 'ques_type', 'id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_questions_complexity_type_id', table_name='questions')
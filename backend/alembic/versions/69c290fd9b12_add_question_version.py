@@ -0,0 +1,29 @@
+"""Add question version
+
+Revision ID: 69c290fd9b12
+Revises: ee4ab8790205
+Create Date: 2026-10-18 18:31:47.902214
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '69c290fd9b12'
+down_revision: Union[str, Sequence[str], None] = 'ee4ab8790205'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('questions', sa.Column(
+        'version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('questions', 'version')
@@ -0,0 +1,90 @@
+"""Add question content hash
+
+Revision ID: 8d2f0a6c91e7
+Revises: 3b7d51c0e4a2
+Create Date: 2026-10-18 19:48:22.610935
+
+"""
+import hashlib
+import json
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d2f0a6c91e7'
+down_revision: Union[str, Sequence[str], None] = '3b7d51c0e4a2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _content_hash(title, ques_type, options, correct_answers) -> str:
+    # Frozen copy of exam.utils.question_content_hash at this revision
+    answers = dict(correct_answers or {})
+    selected = answers.get("selected_options")
+    if isinstance(selected, list):
+        answers["selected_options"] = sorted(selected, key=str)
+
+    payload = json.dumps(
+        {
+            "title": " ".join(str(title or "").split()).casefold(),
+            "ques_type": str(ques_type or "").strip().lower(),
+            "options": options or {},
+            "correct_answers": answers,
+        },
+        sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('questions', sa.Column('content_hash', sa.String(length=64), nullable=True))
+    op.add_column('question_import_jobs', sa.Column(
+        'questions_updated', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('question_import_jobs', sa.Column(
+        'questions_skipped', sa.Integer(), server_default='0', nullable=False))
+
+    # Backfill; existing duplicates keep a NULL hash (they may be referenced
+    # by attempts, so they are not deleted)
+    bind = op.get_bind()
+    questions = sa.table(
+        'questions',
+        sa.column('id', sa.UUID()),
+        sa.column('title', sa.Text()),
+        sa.column('ques_type', sa.String()),
+        sa.column('options', sa.JSON()),
+        sa.column('correct_answers', sa.JSON()),
+        sa.column('content_hash', sa.String()),
+    )
+    seen = set()
+    updates = []
+    rows = bind.execute(sa.select(
+        questions.c.id, questions.c.title, questions.c.ques_type,
+        questions.c.options, questions.c.correct_answers
+    ).order_by(questions.c.id))
+    for row in rows:
+        content_hash = _content_hash(row.title, row.ques_type, row.options, row.correct_answers)
+        if content_hash in seen:
+            continue
+        seen.add(content_hash)
+        updates.append({"question_id": row.id, "content_hash": content_hash})
+        if len(updates) >= 5000:
+            bind.execute(questions.update().where(questions.c.id == sa.bindparam("question_id"))
+                         .values(content_hash=sa.bindparam("content_hash")), updates)
+            updates = []
+    if updates:
+        bind.execute(questions.update().where(questions.c.id == sa.bindparam("question_id"))
+                     .values(content_hash=sa.bindparam("content_hash")), updates)
+
+    op.create_index('ix_questions_content_hash', 'questions', ['content_hash'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_questions_content_hash', table_name='questions')
+    op.drop_column('question_import_jobs', 'questions_skipped')
+    op.drop_column('question_import_jobs', 'questions_updated')
+    op.drop_column('questions', 'content_hash')
@@ -0,0 +1,29 @@
+"""Add attempt shuffle seed
+
+Revision ID: a47c1e0b9d25
+Revises: 5e0c7a9d3b64
+Create Date: 2026-10-18 21:46:03.118254
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a47c1e0b9d25'
+down_revision: Union[str, Sequence[str], None] = '5e0c7a9d3b64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Existing attempts keep a NULL seed and the unshuffled paper
+    op.add_column('exam_attempts', sa.Column('shuffle_seed', sa.BigInteger(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('exam_attempts', 'shuffle_seed')
@@ -0,0 +1,82 @@
+"""Intern question tags
+
+Revision ID: b93d4e1f6a28
+Revises: a47c1e0b9d25
+Create Date: 2026-10-18 23:41:07.215830
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b93d4e1f6a28'
+down_revision: Union[str, Sequence[str], None] = 'a47c1e0b9d25'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'tags',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('uq_tags_name_lower', 'tags', [sa.text('lower(name)')], unique=True)
+
+    # One tag per case-insensitive name, spelled as first seen; whitespace is
+    # collapsed the same way as exam.utils.normalize_tag
+    op.execute("""
+        INSERT INTO tags (name)
+        SELECT DISTINCT ON (lower(n.name)) n.name
+        FROM questions q,
+             unnest(q.tags) AS t(name),
+             LATERAL (SELECT btrim(regexp_replace(t.name, '\\s+', ' ', 'g')) AS name) n
+        WHERE n.name <> ''
+        ORDER BY lower(n.name), n.name
+    """)
+
+    op.add_column('questions', sa.Column('tag_ids', postgresql.ARRAY(sa.Integer()),
+                                         server_default='{}', nullable=False))
+    # Keep each question's tag order, dropping repeats
+    op.execute("""
+        UPDATE questions q
+        SET tag_ids = coalesce((
+            SELECT array_agg(tag_id ORDER BY first_pos)
+            FROM (
+                SELECT tg.id AS tag_id, min(t.pos) AS first_pos
+                FROM unnest(q.tags) WITH ORDINALITY AS t(name, pos)
+                JOIN tags tg
+                  ON lower(tg.name) = lower(btrim(regexp_replace(t.name, '\\s+', ' ', 'g')))
+                GROUP BY tg.id
+            ) ordered
+        ), '{}')
+    """)
+
+    op.drop_index('ix_questions_tags', table_name='questions')
+    op.drop_column('questions', 'tags')
+    op.create_index('ix_questions_tag_ids', 'questions', ['tag_ids'], postgresql_using='gin')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.add_column('questions', sa.Column('tags', postgresql.ARRAY(sa.String()), nullable=True))
+    op.execute("""
+        UPDATE questions q
+        SET tags = coalesce((
+            SELECT array_agg(tg.name ORDER BY t.pos)
+            FROM unnest(q.tag_ids) WITH ORDINALITY AS t(id, pos)
+            JOIN tags tg ON tg.id = t.id
+        ), '{}')
+    """)
+    op.alter_column('questions', 'tags', nullable=False)
+    op.drop_index('ix_questions_tag_ids', table_name='questions')
+    op.drop_column('questions', 'tag_ids')
+    op.create_index('ix_questions_tags', 'questions', ['tags'], postgresql_using='gin')
+    op.drop_index('uq_tags_name_lower', table_name='tags')
+    op.drop_table('tags')
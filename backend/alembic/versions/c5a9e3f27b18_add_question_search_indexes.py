@@ -0,0 +1,43 @@
+"""Add question search indexes
+
+Revision ID: c5a9e3f27b18
+Revises: 8d2f0a6c91e7
+Create Date: 2026-10-18 20:21:40.337105
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5a9e3f27b18'
+down_revision: Union[str, Sequence[str], None] = '8d2f0a6c91e7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.add_column('questions', sa.Column(
+        'search_vector', postgresql.TSVECTOR(),
+        sa.Computed(
+            "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('english', coalesce(complexity, '')), 'B')",
+            persisted=True
+        ),
+        nullable=True))
+    op.create_index('ix_questions_search_vector', 'questions', ['search_vector'],
+                    postgresql_using='gin')
+    op.create_index('ix_questions_title_trgm', 'questions', ['title'],
+                    postgresql_using='gin', postgresql_ops={'title': 'gin_trgm_ops'})
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_questions_title_trgm', table_name='questions')
+    op.drop_index('ix_questions_search_vector', table_name='questions')
+    op.drop_column('questions', 'search_vector')
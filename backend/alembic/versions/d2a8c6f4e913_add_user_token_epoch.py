@@ -0,0 +1,28 @@
+"""Add user token epoch
+
+Revision ID: d2a8c6f4e913
+Revises: b93d4e1f6a28
+Create Date: 2026-10-19 00:37:52.604118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2a8c6f4e913'
+down_revision: Union[str, Sequence[str], None] = 'b93d4e1f6a28'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('token_epoch', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('users', 'token_epoch')
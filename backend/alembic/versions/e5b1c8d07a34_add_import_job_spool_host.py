@@ -0,0 +1,28 @@
+"""Add import job spool host
+
+Revision ID: e5b1c8d07a34
+Revises: 0c7e4a9f2b61
+Create Date: 2026-10-19 09:14:26.538217
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5b1c8d07a34'
+down_revision: Union[str, Sequence[str], None] = '0c7e4a9f2b61'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('question_import_jobs', sa.Column('spool_host', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('question_import_jobs', 'spool_host')
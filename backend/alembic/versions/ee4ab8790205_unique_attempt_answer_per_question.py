@@ -0,0 +1,47 @@
+"""Unique attempt answer per question
+
+Revision ID: ee4ab8790205
+Revises: 7e8a30b3addf
+Create Date: 2026-10-18 18:02:11.214507
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'ee4ab8790205'
+down_revision: Union[str, Sequence[str], None] = '7e8a30b3addf'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Drop duplicate answers left by the old select-then-insert autosave,
+    # keeping one row per (attempt_id, question_id)
+    op.execute(
+        """
+        DELETE FROM attempt_answers a
+        USING attempt_answers b
+        WHERE a.attempt_id = b.attempt_id
+          AND a.question_id = b.question_id
+          AND a.ctid < b.ctid
+        """
+    )
+    op.create_unique_constraint(
+        'uq_attempt_answers_attempt_question',
+        'attempt_answers',
+        ['attempt_id', 'question_id']
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint(
+        'uq_attempt_answers_attempt_question',
+        'attempt_answers',
+        type_='unique'
+    )
@@ -0,0 +1,28 @@
+"""Add question tags index
+
+Revision ID: f1e6b2d4a037
+Revises: c5a9e3f27b18
+Create Date: 2026-10-18 20:52:13.905471
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1e6b2d4a037'
+down_revision: Union[str, Sequence[str], None] = 'c5a9e3f27b18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_questions_tags', 'questions', ['tags'], postgresql_using='gin')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_questions_tags', table_name='questions')
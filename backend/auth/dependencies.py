@@ -1,12 +1,16 @@
-from typing import List, Any
+from typing import List, Any, Optional
 from fastapi import Depends, Request, status
 from fastapi.exceptions import HTTPException
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from conf.database import get_db
+from pydantic import ValidationError
+from conf.config import settings
+from conf.database import async_session, get_db
 from sqlalchemy.ext.asyncio import AsyncSession
 from .models import User, UserRole
+from .schemas import TokenClaims
 from .services import UserService
-from .utils import decode_token
+from .utils import decode_token, token_epoch_floors
+import time
 import uuid
 
 user_service = UserService()
@@ -14,8 +18,10 @@ user_service = UserService()
 
 class TokenBearer(HTTPBearer):
 
-    def __init__(self, auto_error: bool = True):
+    def __init__(self, auto_error: bool = True, check_revoked: bool = True):
         super().__init__(auto_error=auto_error)
+        # Off only where the caller checks revocation itself (refresh rotation)
+        self.check_revoked = check_revoked
 
     async def __call__(self, request: Request) -> dict[str, Any]:
         credentials: HTTPAuthorizationCredentials = await super().__call__(request)
@@ -42,6 +48,12 @@ class TokenBearer(HTTPBearer):
             )
 
         self.verify_token_data(token_data)
+
+        if self.check_revoked and await user_service.is_token_revoked(token_data.get("jti", "")):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Token has been revoked. Please sign in again.",
+            )
         return token_data
 
 
@@ -69,10 +81,7 @@ class RefreshTokenBearer(TokenBearer):
             )
 
 
-async def get_current_user(
-    token_details: dict[str, Any] = Depends(AccessTokenBearer()),
-    session: AsyncSession = Depends(get_db),
-) -> User:
+def _token_user_id(token_details: dict[str, Any]) -> uuid.UUID:
     user_id_str = token_details.get("user_id")
 
     if not user_id_str:
@@ -82,15 +91,15 @@ async def get_current_user(
         )
 
     try:
-        user_id = uuid.UUID(user_id_str)
+        return uuid.UUID(user_id_str)
     except ValueError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid user ID format in token."
         )
 
-    user = await user_service.get_user_by_id(user_id, session)
 
+def check_token_user(user: Optional[User], token_details: dict[str, Any]) -> User:
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -103,9 +112,24 @@ async def get_current_user(
             detail="User account is inactive.",
         )
 
+    if token_details.get("epoch", 0) < user.token_epoch:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token has been revoked. Please sign in again.",
+        )
+
     return user
 
 
+async def get_current_user(
+    token_details: dict[str, Any] = Depends(AccessTokenBearer()),
+    session: AsyncSession = Depends(get_db),
+) -> User:
+    user_id = _token_user_id(token_details)
+    user = await user_service.get_user_by_id(user_id, session)
+    return check_token_user(user, token_details)
+
+
 class RoleChecker:
     def __init__(self, allowed_roles: List[str]) -> None:
         self.allowed_roles = allowed_roles
@@ -140,3 +164,63 @@ async def get_admin_user(
     return current_user
 
 
+class ClaimsChecker:
+    """
+    Authorizes from the access token alone, with no database query or
+    session, for high-frequency endpoints. The role and verified claims are
+    trusted for CLAIMS_MAX_TOKEN_AGE_SECONDS after the token was issued;
+    older tokens are checked against the (cached) user row instead.
+    """
+
+    def __init__(self, allowed_roles: List[str]) -> None:
+        self.allowed_roles = allowed_roles
+
+    async def __call__(self, token_details: dict[str, Any] = Depends(AccessTokenBearer())) -> TokenClaims:
+        user_id = _token_user_id(token_details)
+        epoch = token_details.get("epoch", 0)
+
+        if epoch < token_epoch_floors.get(user_id, 0):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Token has been revoked. Please sign in again.",
+            )
+
+        if time.time() - token_details.get("iat", 0) <= settings.CLAIMS_MAX_TOKEN_AGE_SECONDS:
+            try:
+                claims = TokenClaims(
+                    id=user_id,
+                    email=token_details["email"],
+                    role=token_details.get("role"),
+                    is_verified=token_details.get("verified", False),
+                    token_epoch=epoch,
+                )
+            except ValidationError:
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="Token data corrupted or missing essential user info.",
+                )
+        else:
+            async with async_session() as session:
+                user = check_token_user(await user_service.get_user_by_id(user_id, session), token_details)
+            claims = TokenClaims(
+                id=user.id, email=user.email, role=user.role,
+                is_verified=user.is_verified, token_epoch=epoch
+            )
+
+        if not claims.is_verified:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="User is not verified. Please check your email.",
+            )
+
+        if claims.role.value not in self.allowed_roles:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="User does not have the required role.",
+            )
+
+        return claims
+
+
+# Students and admins, authorized from token claims (see ClaimsChecker)
+get_user_claims = ClaimsChecker(allowed_roles=[UserRole.STUDENT.value, UserRole.ADMIN.value])
@@ -3,7 +3,7 @@ from enum import Enum
 from conf.database import Base
 from datetime import datetime
 from typing import Optional, TYPE_CHECKING
-from sqlalchemy import String, DateTime, Boolean, func, UUID, Enum as SQLAlchemyEnum
+from sqlalchemy import ForeignKey, Index, Integer, JSON, String, Text, DateTime, text, Boolean, func, UUID, Enum as SQLAlchemyEnum
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 if TYPE_CHECKING:
     from result.models import ExamAttempt
@@ -32,6 +32,9 @@ class User(Base):
     last_name: Mapped[Optional[str]] = mapped_column(String(50))
     is_active: Mapped[bool] = mapped_column(Boolean, default=True)
     is_verified: Mapped[bool] = mapped_column(Boolean, default=False)
+    # Tokens carry the epoch they were issued in; bumping it revokes them all
+    token_epoch: Mapped[int] = mapped_column(
+        Integer, default=0, server_default="0", nullable=False)
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), default=func.now()
     )
@@ -45,3 +48,49 @@ class User(Base):
     def __repr__(self):
         return f"<User(id={self.id}, email={self.email}, role={self.role.value})>"
 
+
+class RevokedToken(Base):
+    """A token id (jti) that must no longer be accepted: logged out or a used refresh token."""
+    __tablename__ = 'revoked_tokens'
+
+    jti: Mapped[str] = mapped_column(String(36), primary_key=True)
+    user_id: Mapped[uuid.UUID] = mapped_column(ForeignKey('users.id', ondelete="CASCADE"))
+    # The token's own expiry; the row is useless (and pruned) after it
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), index=True)
+    revoked_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), index=True
+    )
+
+    def __repr__(self):
+        return f"<RevokedToken(jti={self.jti}, user_id={self.user_id})>"
+
+
+class OutboxEmail(Base):
+    """
+    An email waiting to be sent. Rows are written in the same transaction as
+    the change that triggers them and delivered by the background sender.
+    """
+    __tablename__ = 'email_outbox'
+    __table_args__ = (
+        # The sender only scans unsent rows that are due
+        Index('ix_email_outbox_due', 'next_attempt_at', postgresql_where=text("sent_at IS NULL")),
+    )
+
+    id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), primary_key=True, default=uuid.uuid4
+    )
+    recipients: Mapped[list] = mapped_column(JSON)
+    subject: Mapped[str] = mapped_column(String(255))
+    body: Mapped[str] = mapped_column(Text)
+    attempts: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    next_attempt_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+    last_error: Mapped[Optional[str]] = mapped_column(Text)
+    sent_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now()
+    )
+
+    def __repr__(self):
+        return f"<OutboxEmail(id={self.id}, subject={self.subject}, attempts={self.attempts})>"
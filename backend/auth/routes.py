@@ -1,23 +1,31 @@
+import uuid
 from fastapi import APIRouter
 from datetime import timedelta
-from .dependencies import  get_current_user, RoleChecker
-from .services import UserService
+from typing import Any
+from .dependencies import (
+    get_current_user, get_admin_user, RoleChecker, AccessTokenBearer, RefreshTokenBearer, check_token_user
+)
+from .services import UserService, email_outbox_metrics, email_outbox_wakeup, queue_email
 from .schemas import (
     UserCreateSchema,
     UserOutSchema,
+    UserUpdateSchema,
     EmailSchema,
+    LogoutSchema,
     UserLoginSchema
 )
 from conf.database import get_db
 from fastapi import Depends, status, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from .utils import (
+    revoked_token_filter,
+    user_cache,
+    decode_token,
     create_access_token,
     create_verification_token,
     decode_verification_token,
 )
 from fastapi.responses import JSONResponse
-from conf.utils import send_email
 from conf.config import settings
 from .models import User, UserRole
 
@@ -28,18 +36,20 @@ role_checker = RoleChecker(
 
 
 @auth_router.post("/send_mail", summary="Send a welcome email")
-async def send_mail(email: EmailSchema):
+async def send_mail(email: EmailSchema, session: AsyncSession = Depends(get_db)):
     """
-    Send a welcome email to the provided email addresses.
+    Queue a welcome email to the provided email address.
     """
     html = "<h1>Welcome to the app</h1>"
     subject = "Welcome to our app"
 
-    send_email.delay([email.email], subject, html)
+    queue_email(session, [email.email], subject, html)
+    await session.commit()
+    email_outbox_wakeup.set()
 
     return JSONResponse(
         status_code=status.HTTP_200_OK, content={
-            "message": "Email sent successfully"}
+            "message": "Email queued for delivery"}
     )
 
 
@@ -55,15 +65,16 @@ async def register_user(user_data: UserCreateSchema, session: AsyncSession = Dep
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="User already exists")
 
-    new_user = await auth_service.create_user(user_data, session)
-
     token = create_verification_token({"email": email})
     verification_link = f"http://{settings.DOMAIN}/api/v1/auth/verify-email?token={token}"
     html = f"""
     <h1>Verify Your Email</h1>
     <p>Please click this <a href="{verification_link}">link</a> to verify your email</p>
     """
-    send_email([email], "Verify Your Email", html)
+    # Committed together with the new user by create_user
+    queue_email(session, [email], "Verify Your Email", html)
+    new_user = await auth_service.create_user(user_data, session)
+    email_outbox_wakeup.set()
 
     return {
         "message": "Account created! Check your email to verify your account.",
@@ -95,7 +106,7 @@ async def verify_email(token: str, session: AsyncSession = Depends(get_db)):
                 content={"message": "Account already verified."},
             )
 
-        update_data = {"is_verified": True}
+        update_data = UserUpdateSchema(is_verified=True)
 
         await auth_service.update_user(user, update_data, session)
 
@@ -111,6 +122,28 @@ async def verify_email(token: str, session: AsyncSession = Depends(get_db)):
 REFRESH_TOKEN_EXPIRY_DAYS = 2
 
 
+def _issue_tokens(user: User) -> dict:
+    user_id_str = str(user.id)
+    token_payload = {
+        "email": user.email,
+        "user_id": user_id_str,
+        "role": user.role.value,
+        "verified": user.is_verified,
+        "epoch": user.token_epoch,
+    }
+
+    access_token = create_access_token(
+        user_data=token_payload
+    )
+
+    refresh_token = create_access_token(
+        user_data={"email": user.email, "user_id": user_id_str, "epoch": user.token_epoch},
+        refresh=True,
+        expiry=timedelta(days=REFRESH_TOKEN_EXPIRY_DAYS),
+    )
+    return {"access_token": access_token, "refresh_token": refresh_token}
+
+
 @auth_router.post("/sign-in", summary="User Login")
 async def login_user(login_data: UserLoginSchema, session: AsyncSession = Depends(get_db)):
     user = await auth_service.authenticate_user(
@@ -138,33 +171,67 @@ async def login_user(login_data: UserLoginSchema, session: AsyncSession = Depend
         )
 
     # TOKEN GENERATION AND RESPONSE
-    user_id_str = str(user.id)
-    token_payload = {
-        "email": user.email,
-        "user_id": user_id_str,
-        "role": user.role.value,
-    }
-
-    access_token = create_access_token(
-        user_data=token_payload
-    )
-
-    refresh_token = create_access_token(
-        user_data={"email": user.email, "user_id": user_id_str},
-        refresh=True,
-        expiry=timedelta(days=REFRESH_TOKEN_EXPIRY_DAYS),
-    )
-
     return JSONResponse(
         status_code=status.HTTP_200_OK,
         content={
             "message": "Login successful",
-            "access_token": access_token,
-            "refresh_token": refresh_token,
-            "user": {"email": user.email, "id": user_id_str, "role": user.role.value},
+            **_issue_tokens(user),
+            "user": {"email": user.email, "id": str(user.id), "role": user.role.value},
         },
     )
 
+
+@auth_router.post("/refresh-token", summary="Rotate Refresh Token")
+async def refresh_tokens(
+    token_details: dict[str, Any] = Depends(RefreshTokenBearer(check_revoked=False)),
+    session: AsyncSession = Depends(get_db)
+):
+    """
+    Exchange a refresh token for a new access token and a new refresh token.
+    Each refresh token works once; presenting a used one signs the user out everywhere.
+    """
+    user_id = uuid.UUID(token_details["user_id"])
+    user = check_token_user(await auth_service.get_user_by_id(user_id, session), token_details)
+
+    if not await auth_service.revoke_token(token_details, session):
+        # Someone else holds a copy of this token: end every session of the user
+        await session.rollback()
+        await auth_service.revoke_tokens(user_id, session)
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Refresh token was already used. Please sign in again."
+        )
+    await session.commit()
+
+    return JSONResponse(
+        status_code=status.HTTP_200_OK,
+        content={"message": "Token refreshed", **_issue_tokens(user)},
+    )
+
+
+@auth_router.post("/logout", summary="User Logout")
+async def logout_user(
+    logout_data: LogoutSchema,
+    token_details: dict[str, Any] = Depends(AccessTokenBearer()),
+    session: AsyncSession = Depends(get_db)
+):
+    """Revoke the access token used for this call and, if given, the refresh token."""
+    await auth_service.revoke_token(token_details, session)
+
+    if logout_data.refresh_token:
+        refresh_details = decode_token(logout_data.refresh_token)
+        if (not refresh_details or not refresh_details.get("refresh")
+                or refresh_details.get("user_id") != token_details.get("user_id")):
+            await session.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid refresh token."
+            )
+        await auth_service.revoke_token(refresh_details, session)
+
+    await session.commit()
+    return {"message": "Logged out."}
+
 @auth_router.get("/current-user", response_model=UserOutSchema, summary="Get Current User")
 async def get_current_authenticated_user(
     current_user: User = Depends(get_current_user)
@@ -174,3 +241,46 @@ async def get_current_authenticated_user(
     """
     return current_user
 
+
+@auth_router.post("/users/{user_id}/revoke-tokens", summary="Force Re-login")
+async def revoke_user_tokens(
+    user_id: uuid.UUID,
+    session: AsyncSession = Depends(get_db),
+    admin_user: User = Depends(get_admin_user)
+):
+    """
+    Admin: Revoke every token issued to a user so they must sign in again.
+    Other worker processes notice within CLAIMS_MAX_TOKEN_AGE_SECONDS.
+    """
+    epoch = await auth_service.revoke_tokens(user_id, session)
+    return {"message": "Tokens revoked.", "token_epoch": epoch}
+
+
+@auth_router.get("/cache/metrics", response_model=dict, summary="User Cache Metrics")
+async def get_user_cache_metrics(
+    admin_user: User = Depends(get_admin_user)
+):
+    """
+    Admin: Hit ratio of the user cache behind get_current_user.
+    """
+    return user_cache.metrics()
+
+
+@auth_router.get("/revoked-tokens/metrics", response_model=dict, summary="Revoked Token Filter Metrics")
+async def get_revoked_token_metrics(
+    admin_user: User = Depends(get_admin_user)
+):
+    """
+    Admin: Size and hit counts of the in-memory revoked-token filter.
+    """
+    return revoked_token_filter.metrics()
+
+
+@auth_router.get("/email-outbox/metrics", response_model=dict, summary="Email Outbox Metrics")
+async def get_email_outbox_metrics(
+    admin_user: User = Depends(get_admin_user)
+):
+    """
+    Admin: Delivery counters and last batch throughput of this worker's email sender.
+    """
+    return email_outbox_metrics
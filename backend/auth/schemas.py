@@ -72,3 +72,17 @@ class UserLoginSchema(BaseModel):
                 "password": "strongpassword123"
             }
         }
+
+
+class TokenClaims(BaseModel):
+    """The user as described by a verified access token."""
+    id: uuid.UUID
+    email: str
+    role: UserRole
+    is_verified: bool
+    token_epoch: int
+
+
+class LogoutSchema(BaseModel):
+    # Revoked together with the access token used to log out
+    refresh_token: Optional[str] = None
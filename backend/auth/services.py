@@ -1,12 +1,45 @@
+import asyncio
+import logging
+import random
+import time
 import uuid
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import delete, exists, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.future import select
 from sqlalchemy.ext.asyncio import AsyncSession
-from .models import User
+from sqlalchemy.orm import make_transient_to_detached
+from conf.config import settings
+from conf.database import async_session
+from conf.utils import create_message, smtp_pool
+from .models import OutboxEmail, RevokedToken, User
 from .schemas import UserCreateSchema, UserUpdateSchema
-from .utils import generate_password_hash, verify_password
-from typing import Optional
+from .utils import generate_password_hash, verify_password, revoked_token_filter, token_epoch_floors, user_cache
+from typing import Any, Dict, Iterable, Optional
 from fastapi import HTTPException, status
 
+logger = logging.getLogger(__name__)
+
+# Set after committing outbox rows so the sender delivers them without waiting for its next poll
+email_outbox_wakeup = asyncio.Event()
+
+# Delivery counters of this process's outbox sender
+email_outbox_metrics: Dict[str, Any] = {
+    "sent": 0,
+    "failed_attempts": 0,
+    "given_up": 0,
+    "last_batch_size": 0,
+    "last_batch_messages_per_second": 0.0,
+}
+
+# Default of user_cache lookups, to tell a miss from a cached "no such user"
+_NOT_CACHED = object()
+
+
+def _user_snapshot(user: User) -> Dict[str, Any]:
+    return {attr.key: getattr(user, attr.key) for attr in User.__mapper__.column_attrs}
+
+
 class UserService:
     async def get_user_by_email(self, email: str, session: AsyncSession) -> Optional[User]:
         statement = select(User).where(User.email == email)
@@ -19,8 +52,21 @@ class UserService:
         return user is not None
     
     async def get_user_by_id(self, user_id: uuid.UUID, session: AsyncSession) -> Optional[User]:
-        user = await session.get(User, user_id)
-        return user
+        """
+        Served from user_cache when possible. A cached user is attached to the
+        session without a query, so it can still be updated through it.
+        """
+        cached = user_cache.get(user_id, _NOT_CACHED)
+        if cached is _NOT_CACHED:
+            user = await session.get(User, user_id)
+            user_cache.set(user_id, _user_snapshot(user) if user else None)
+            return user
+        if cached is None:
+            return None
+
+        user = User(**cached)
+        make_transient_to_detached(user)
+        return await session.merge(user, load=False)
 
     async def create_user(self, user_data: UserCreateSchema, session: AsyncSession) -> User:
         if await self.user_exists(user_data.email, session):
@@ -31,7 +77,7 @@ class UserService:
         raw_password = user_data_dict.pop("password")
 
         # Pydantic validation (max_length=72) ensures raw_password is safe for hashing
-        password_hash = generate_password_hash(raw_password)
+        password_hash = await generate_password_hash(raw_password)
         user_data_dict["password_hash"] = password_hash
 
         # Ensure default role is applied if not provided (UserRole.STUDENT from model)
@@ -43,6 +89,7 @@ class UserService:
         session.add(new_user)
         await session.commit()
         await session.refresh(new_user)
+        user_cache.pop(new_user.id)
         return new_user
 
     async def update_user(self, user: User, user_data: UserUpdateSchema, session: AsyncSession) -> User:
@@ -50,20 +97,236 @@ class UserService:
 
         if "password" in update_data:
             raw_password = update_data.pop("password")
-            user.password_hash = generate_password_hash(raw_password)
+            user.password_hash = await generate_password_hash(raw_password)
 
         for key, value in update_data.items():
             setattr(user, key, value)
+        if update_data.get("is_active") is False:
+            # Outstanding tokens must stop working, including on the claims-only path
+            user.token_epoch = user.token_epoch + 1
 
         await session.commit()
         await session.refresh(user)
+        user_cache.pop(user.id)
+        token_epoch_floors[user.id] = user.token_epoch
         return user
+
+    async def revoke_tokens(self, user_id: uuid.UUID, session: AsyncSession) -> int:
+        """Invalidate every token issued to the user so far; returns the new epoch."""
+        stmt = (
+            update(User)
+            .where(User.id == user_id)
+            .values(token_epoch=User.token_epoch + 1)
+            .returning(User.token_epoch)
+            .execution_options(synchronize_session=False)
+        )
+        epoch = (await session.execute(stmt)).scalar()
+        if epoch is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found.")
+        await session.commit()
+        user_cache.pop(user_id)
+        token_epoch_floors[user_id] = epoch
+        return epoch
     
     async def authenticate_user(self, email: str, password: str, session: AsyncSession) -> Optional[User]:
         user = await self.get_user_by_email(email, session)
+        if not user:
+            return None
 
-        if user and verify_password(password, user.password_hash):
-            return user
+        valid, new_hash = await verify_password(password, user.password_hash)
+        if not valid:
+            return None
+
+        if new_hash:
+            # Hashed with outdated Argon2 parameters: upgrade it while we have the password
+            user.password_hash = new_hash
+            await session.commit()
+            user_cache.pop(user.id)
+        return user
+
+    async def revoke_token(self, token_details: Dict[str, Any], session: AsyncSession) -> bool:
+        """
+        Record a decoded token's jti as revoked (the caller commits). Returns
+        False if it already was, which for a refresh token means it was reused.
+        """
+        jti = token_details["jti"]
+        stmt = (
+            pg_insert(RevokedToken)
+            .values(
+                jti=jti,
+                user_id=uuid.UUID(token_details["user_id"]),
+                expires_at=datetime.fromtimestamp(token_details["exp"], timezone.utc),
+            )
+            .on_conflict_do_nothing(index_elements=[RevokedToken.jti])
+            .returning(RevokedToken.jti)
+        )
+        inserted = (await session.execute(stmt)).scalar() is not None
+        # Added before commit: if the caller rolls back this is just a false positive
+        revoked_token_filter.add(jti)
+        return inserted
+
+    async def is_token_revoked(self, jti: str) -> bool:
+        """Checked in memory; only Bloom filter hits query the database."""
+        if not revoked_token_filter.might_contain(jti):
+            return False
+        async with async_session() as session:
+            revoked = (await session.execute(select(exists().where(RevokedToken.jti == jti)))).scalar()
+        if not revoked:
+            revoked_token_filter.false_positives += 1
+        return revoked
+
+
+async def rebuild_revoked_token_filter() -> int:
+    """Reload the revoked-token filter with every unexpired revoked jti."""
+    synced_at = datetime.now(timezone.utc)
+    async with async_session() as session:
+        result = await session.stream_scalars(
+            select(RevokedToken.jti).where(RevokedToken.expires_at > synced_at))
+        jtis = [jti async for jti in result]
+    revoked_token_filter.replace(jtis, synced_at)
+    return len(jtis)
+
+
+async def sync_revoked_token_filter() -> None:
+    """Add jtis revoked by other worker processes since the last sync, and prune expired rows."""
+    if revoked_token_filter.synced_at is None or revoked_token_filter.needs_rebuild:
+        await rebuild_revoked_token_filter()
+        return
+
+    now = datetime.now(timezone.utc)
+    # Overlap the previous window a little: revoked_at comes from the database clock
+    since = revoked_token_filter.synced_at - timedelta(seconds=settings.REVOKED_TOKEN_SYNC_INTERVAL_SECONDS)
+    async with async_session() as session:
+        jtis = (await session.execute(
+            select(RevokedToken.jti).where(RevokedToken.revoked_at >= since)
+        )).scalars().all()
+        await session.execute(delete(RevokedToken).where(RevokedToken.expires_at < now))
+        await session.commit()
+    for jti in jtis:
+        if jti not in revoked_token_filter.bloom:
+            revoked_token_filter.add(jti)
+    revoked_token_filter.synced_at = now
+
+
+async def run_revoked_token_sync(interval: float) -> None:
+    """Background loop that keeps the revoked-token filter in step with the table."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await sync_revoked_token_filter()
+        except Exception:
+            logger.exception("Revoked token sync failed")
+
+
+def queue_email(session: AsyncSession, recipients: Iterable[str], subject: str, body: str) -> OutboxEmail:
+    """Add an email to the outbox; it is sent once the caller's transaction commits."""
+    email = OutboxEmail(recipients=list(recipients), subject=subject, body=body)
+    session.add(email)
+    return email
+
+
+def email_outbox_claim_limit() -> int:
+    """
+    Emails one batch may claim. Each send takes at most MAIL_TIMEOUT_SECONDS
+    on one of the pooled connections, so this many finish inside the lease,
+    keeping one timeout spare for claiming and recording. Rows still being
+    sent are never handed to another sender and sent twice.
+    """
+    per_connection = int(settings.EMAIL_OUTBOX_LEASE_SECONDS // settings.MAIL_TIMEOUT_SECONDS) - 1
+    return max(1, min(settings.EMAIL_OUTBOX_BATCH_SIZE, smtp_pool.size * per_connection))
+
+
+async def deliver_email_outbox_batch() -> int:
+    """Claim a batch of due outbox emails, send them over pooled SMTP connections and record the outcome."""
+    now = datetime.now(timezone.utc)
+    due = (
+        select(OutboxEmail.id)
+        .where(
+            OutboxEmail.sent_at.is_(None),
+            OutboxEmail.next_attempt_at <= now,
+            OutboxEmail.attempts < settings.EMAIL_OUTBOX_MAX_ATTEMPTS,
+        )
+        .order_by(OutboxEmail.next_attempt_at)
+        .limit(email_outbox_claim_limit())
+        .with_for_update(skip_locked=True)
+    )
+    # Claiming pushes next_attempt_at to the end of the lease, so other senders
+    # skip these rows, and a sender that dies mid-batch gets them retried
+    claim = (
+        update(OutboxEmail)
+        .where(OutboxEmail.id.in_(due.scalar_subquery()))
+        .values(
+            attempts=OutboxEmail.attempts + 1,
+            next_attempt_at=now + timedelta(seconds=settings.EMAIL_OUTBOX_LEASE_SECONDS),
+        )
+        .returning(OutboxEmail.id, OutboxEmail.recipients, OutboxEmail.subject, OutboxEmail.body, OutboxEmail.attempts)
+        .execution_options(synchronize_session=False)
+    )
+    async with async_session() as session:
+        rows = (await session.execute(claim)).all()
+        await session.commit()
+    if not rows:
+        return 0
+
+    started = time.perf_counter()
+    messages, errors = [], {}
+    for row in rows:
+        try:
+            messages.append((row, create_message(row.recipients, row.subject, row.body)))
+        except ValueError as e:
+            errors[row.id] = e
+    for (row, _), error in zip(messages, await smtp_pool.send_many([message for _, message in messages])):
+        if error is not None:
+            errors[row.id] = error
+    elapsed = time.perf_counter() - started
+
+    sent_ids = [row.id for row in rows if row.id not in errors]
+    async with async_session() as session:
+        if sent_ids:
+            await session.execute(
+                update(OutboxEmail)
+                .where(OutboxEmail.id.in_(sent_ids))
+                .values(sent_at=datetime.now(timezone.utc), last_error=None)
+                .execution_options(synchronize_session=False)
+            )
+        for row in rows:
+            error = errors.get(row.id)
+            if error is None:
+                continue
+            # Exponential backoff with jitter, so a recovering server is not hit all at once
+            delay = min(settings.EMAIL_OUTBOX_RETRY_BASE_SECONDS * 2 ** (row.attempts - 1),
+                        settings.EMAIL_OUTBOX_RETRY_MAX_SECONDS) * random.uniform(0.8, 1.2)
+            await session.execute(
+                update(OutboxEmail)
+                .where(OutboxEmail.id == row.id)
+                .values(next_attempt_at=datetime.now(timezone.utc) + timedelta(seconds=delay),
+                        last_error=str(error)[:1000])
+                .execution_options(synchronize_session=False)
+            )
+            if row.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+                email_outbox_metrics["given_up"] += 1
+                logger.warning("Giving up on email %s after %s attempts: %s", row.id, row.attempts, error)
+        await session.commit()
+
+    email_outbox_metrics["sent"] += len(sent_ids)
+    email_outbox_metrics["failed_attempts"] += len(errors)
+    email_outbox_metrics["last_batch_size"] = len(rows)
+    email_outbox_metrics["last_batch_messages_per_second"] = len(sent_ids) / elapsed if elapsed > 0 else 0.0
+    logger.info("Email outbox: sent %s of %s in %.2fs", len(sent_ids), len(rows), elapsed)
+    return len(rows)
 
-        return None
 
+async def run_email_outbox_sender(interval: float) -> None:
+    """Background loop that drains the email outbox, then waits for a wakeup or `interval` seconds."""
+    while True:
+        email_outbox_wakeup.clear()
+        try:
+            # A full batch means more may be due
+            while await deliver_email_outbox_batch() == email_outbox_claim_limit():
+                pass
+        except Exception:
+            logger.exception("Email outbox delivery failed")
+        try:
+            await asyncio.wait_for(email_outbox_wakeup.wait(), timeout=interval)
+        except asyncio.TimeoutError:
+            pass
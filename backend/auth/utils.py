@@ -1,10 +1,16 @@
+import asyncio
+import hashlib
 import logging
+import math
 import uuid
 import jwt
+from concurrent.futures import Executor, ProcessPoolExecutor
+from fastapi import HTTPException, status
 from passlib.context import CryptContext
 from itsdangerous import URLSafeTimedSerializer
 from datetime import datetime, timedelta, timezone
-from typing import Optional, Dict, Any, Union
+from typing import Optional, Dict, Any, Iterable, Tuple, Union
+from conf.cache import LRUCache
 from conf.config import settings
 from .models import UserRole
 
@@ -15,12 +21,100 @@ from .models import UserRole
 # Initialize password hashing context
 passwd_context = CryptContext(
     schemes=["argon2"],
-    deprecated="auto"
+    deprecated="auto",
+    argon2__time_cost=settings.ARGON2_TIME_COST,
+    argon2__memory_cost=settings.ARGON2_MEMORY_COST_KIB,
+    argon2__parallelism=settings.ARGON2_PARALLELISM,
 )
 
 # Constants
 ACCESS_TOKEN_EXPIRY_SECONDS = 3600  # 1 hour
 
+# Column values of users by id (None for ids with no user), see UserService.get_user_by_id
+user_cache = LRUCache(settings.USER_CACHE_SIZE, settings.USER_CACHE_TTL_SECONDS)
+
+class BloomFilter:
+    """
+    Set of strings with no false negatives and a bounded false-positive rate
+    while it holds at most `capacity` items.
+    """
+
+    def __init__(self, capacity: int, error_rate: float) -> None:
+        self.capacity = max(capacity, 1)
+        self.error_rate = error_rate
+        self.size = max(8, math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / self.capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str) -> Iterable[int]:
+        # Double hashing: k positions from the two halves of one digest
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class RevokedTokenFilter:
+    """
+    In-process mirror of the revoked_tokens table. A jti not in the filter is
+    certainly not revoked (in this process's view); a hit must be confirmed in
+    the database. Rebuilt on startup and grown when it fills up.
+    """
+
+    def __init__(self, capacity: int, error_rate: float) -> None:
+        self.bloom = BloomFilter(capacity, error_rate)
+        self.synced_at: Optional[datetime] = None
+        self.hits = 0
+        self.false_positives = 0
+
+    def replace(self, jtis: Iterable[str], synced_at: datetime) -> None:
+        jtis = list(jtis)
+        bloom = BloomFilter(max(settings.REVOKED_TOKEN_FILTER_CAPACITY, 2 * len(jtis)), self.bloom.error_rate)
+        for jti in jtis:
+            bloom.add(jti)
+        self.bloom = bloom
+        self.synced_at = synced_at
+
+    def add(self, jti: str) -> None:
+        self.bloom.add(jti)
+
+    @property
+    def needs_rebuild(self) -> bool:
+        return self.bloom.count > self.bloom.capacity
+
+    def might_contain(self, jti: str) -> bool:
+        if jti in self.bloom:
+            self.hits += 1
+            return True
+        return False
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "items": self.bloom.count,
+            "capacity": self.bloom.capacity,
+            "bits": self.bloom.size,
+            "hashes": self.bloom.hash_count,
+            "hits": self.hits,
+            "false_positives": self.false_positives,
+            "synced_at": self.synced_at.isoformat() if self.synced_at else None,
+        }
+
+
+revoked_token_filter = RevokedTokenFilter(
+    settings.REVOKED_TOKEN_FILTER_CAPACITY, settings.REVOKED_TOKEN_FILTER_ERROR_RATE)
+
+# Lowest token epoch still accepted, for users whose tokens were revoked by this process
+token_epoch_floors: Dict[uuid.UUID, int] = {}
+
 
 serializer = URLSafeTimedSerializer(
     secret_key=settings.JWT_SECRET,
@@ -43,20 +137,63 @@ def decode_verification_token(token: str, max_age: int = 3600) -> Dict[str, str]
         raise ValueError("Invalid or expired token") from e
 
 
-def generate_password_hash(password: str) -> str:
-    """Generates a hash for the provided password, truncating if necessary."""
+def _hash_password(password: str) -> str:
     # truncated_password = password[:BCRYPT_MAX_LENGTH]
     return passwd_context.hash(password)
 
 
-def verify_password(password: str, password_hash: str) -> bool:
+def _verify_and_update_password(password: str, password_hash: str) -> Tuple[bool, Optional[str]]:
+    # truncated_password = password[:BCRYPT_MAX_LENGTH]
+    return passwd_context.verify_and_update(password, password_hash)
+
+
+# Argon2 takes tens of milliseconds of CPU per call, so it runs off the event loop
+_hash_pool: Optional[Executor] = None
+_hash_calls = 0
+
+
+def get_hash_pool() -> Optional[Executor]:
+    """The password hashing process pool; None means the loop's default thread pool."""
+    global _hash_pool
+    if _hash_pool is None and settings.PASSWORD_HASH_WORKERS > 0:
+        _hash_pool = ProcessPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS)
+    return _hash_pool
+
+
+def shutdown_hash_pool() -> None:
+    global _hash_pool
+    if _hash_pool is not None:
+        _hash_pool.shutdown(cancel_futures=True)
+        _hash_pool = None
+
+
+async def _run_hasher(func, *args):
+    global _hash_calls
+    if _hash_calls >= max(settings.PASSWORD_HASH_WORKERS, 1) + settings.PASSWORD_HASH_MAX_QUEUE:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many sign-ins at the moment. Please retry shortly.",
+            headers={"Retry-After": str(settings.PASSWORD_HASH_RETRY_AFTER_SECONDS)},
+        )
+    _hash_calls += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(get_hash_pool(), func, *args)
+    finally:
+        _hash_calls -= 1
+
+
+async def generate_password_hash(password: str) -> str:
+    """Generates a hash for the provided password in the hashing pool."""
+    return await _run_hasher(_hash_password, password)
+
+
+async def verify_password(password: str, password_hash: str) -> Tuple[bool, Optional[str]]:
     """
-    Verifies a raw password against a stored hash.
-    Crucially, it truncates the input password before verification 
-    to prevent the 72-byte ValueError.
+    Verifies a raw password against a stored hash in the hashing pool.
+    Returns (valid, new_hash); new_hash is set when the stored hash was made
+    with other Argon2 parameters and should be replaced.
     """
-    # truncated_password = password[:BCRYPT_MAX_LENGTH]
-    return passwd_context.verify(password, password_hash)
+    return await _run_hasher(_verify_and_update_password, password, password_hash)
 
 
 def create_access_token(
@@ -66,7 +203,8 @@ def create_access_token(
 ) -> str:
     """
     Create a JWT access token for a user.
-    The user_data is expected to contain 'user_id' (UUID str), 'email', and 'role' (UserRole or str value).
+    The user_data is expected to contain 'user_id' (UUID str), 'email', and 'role' (UserRole or str value),
+    and optionally 'verified' and 'epoch' (User.is_verified / User.token_epoch).
     """
     if "role" in user_data and isinstance(user_data["role"], UserRole):
         role_value = user_data["role"].value
@@ -80,6 +218,8 @@ def create_access_token(
         "user_id": str(user_data["user_id"]),
         "email": user_data["email"],
         "role": role_value,
+        "verified": bool(user_data.get("verified", False)),
+        "epoch": int(user_data.get("epoch", 0)),
 
         # Standard JWT claims
         "exp": expire_time,
@@ -1,4 +1,6 @@
 import os
+import socket
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -28,6 +30,10 @@ class Settings:
     MAIL_SSL_TLS: bool = os.getenv("MAIL_SSL_TLS", "False") == "True"
     USE_CREDENTIALS: bool = os.getenv("USE_CREDENTIALS", "True") == "True"
     VALIDATE_CERTS: bool = os.getenv("VALIDATE_CERTS", "True") == "True"
+    # Bounds one whole message send, reconnect included
+    MAIL_TIMEOUT_SECONDS: float = float(os.getenv("MAIL_TIMEOUT_SECONDS", 30))
+    # SMTP connections kept open by the outbox sender
+    MAIL_SMTP_CONNECTIONS: int = int(os.getenv("MAIL_SMTP_CONNECTIONS", 2))
     
     DOMAIN: str = os.getenv("DOMAIN")
     CORS_ALLOWED_ORIGINS: list = parse_list(
@@ -39,5 +45,98 @@ class Settings:
         default_value=["localhost", "127.0.0.1"]
     )
 
+    # Write-behind autosave: buffer progress saves in memory and flush in batches.
+    # At most AUTOSAVE_FLUSH_INTERVAL_SECONDS of saves can be lost on a crash.
+    # The buffer is per process, so a submit on another worker would miss its
+    # answers: only safe with a single worker, and startup refuses it when
+    # WEB_CONCURRENCY asks for more.
+    AUTOSAVE_WRITE_BEHIND: bool = os.getenv("AUTOSAVE_WRITE_BEHIND", "False") == "True"
+    AUTOSAVE_FLUSH_INTERVAL_SECONDS: float = float(os.getenv("AUTOSAVE_FLUSH_INTERVAL_SECONDS", 2.0))
+    AUTOSAVE_MAX_BUFFERED_ANSWERS: int = int(os.getenv("AUTOSAVE_MAX_BUFFERED_ANSWERS", 50000))
+
+    # Exam-close finalizer: grades attempts left open after Exam.end_time.
+    # An interval of 0 disables the periodic sweep (the admin endpoint still works).
+    EXAM_FINALIZER_INTERVAL_SECONDS: float = float(os.getenv("EXAM_FINALIZER_INTERVAL_SECONDS", 60))
+    EXAM_FINALIZER_CHUNK_SIZE: int = int(os.getenv("EXAM_FINALIZER_CHUNK_SIZE", 500))
+    # Worker processes used to grade finalizer chunks; 0 or 1 grades in-process
+    GRADING_PROCESS_WORKERS: int = int(os.getenv("GRADING_PROCESS_WORKERS", os.cpu_count() or 1))
+
+    # Per-exam leaderboards are reloaded from the database when older than this.
+    # Scores up to LEADERBOARD_TREE_MAX_SCORE are counted in an array sized by the
+    # highest score; higher scores fall back to a sorted list
+    LEADERBOARD_MAX_STALENESS_SECONDS: float = float(os.getenv("LEADERBOARD_MAX_STALENESS_SECONDS", 30))
+    LEADERBOARD_TREE_MAX_SCORE: int = int(os.getenv("LEADERBOARD_TREE_MAX_SCORE", 100_000))
+
+    # Serialized results of submitted attempts; the TTL bounds staleness
+    # after a regrade run by another worker process
+    RESULT_CACHE_SIZE: int = int(os.getenv("RESULT_CACHE_SIZE", 20000))
+    RESULT_CACHE_TTL_SECONDS: float = float(os.getenv("RESULT_CACHE_TTL_SECONDS", 300))
+
+    # Pre-serialized student exam papers, one entry per exam
+    EXAM_PAPER_CACHE_SIZE: int = int(os.getenv("EXAM_PAPER_CACHE_SIZE", 1000))
+    EXAM_PAPER_CACHE_TTL_SECONDS: float = float(os.getenv("EXAM_PAPER_CACHE_TTL_SECONDS", 300))
+    # (exam, owner, shuffle seed) per attempt; these never change, so no TTL
+    ATTEMPT_CACHE_SIZE: int = int(os.getenv("ATTEMPT_CACHE_SIZE", 50000))
+
+    # Excel import and batch question writes: rows per multi-row statement (keep rows * 10 columns
+    # under the 32767 bind-parameter limit) and per-row errors reported
+    QUESTION_IMPORT_CHUNK_SIZE: int = int(os.getenv("QUESTION_IMPORT_CHUNK_SIZE", 1000))
+    QUESTION_IMPORT_MAX_ERRORS: int = int(os.getenv("QUESTION_IMPORT_MAX_ERRORS", 1000))
+
+    # Background import jobs: uploads are spooled here, and a RUNNING job whose
+    # last chunk commit is older than QUESTION_IMPORT_STALE_SECONDS is resumed.
+    # A job is only claimed by workers with the QUESTION_IMPORT_HOST it was
+    # spooled under; give every host the same value only if the spool dir is shared storage
+    QUESTION_IMPORT_SPOOL_DIR: str = os.getenv(
+        "QUESTION_IMPORT_SPOOL_DIR", os.path.join(tempfile.gettempdir(), "question-imports"))
+    QUESTION_IMPORT_HOST: str = os.getenv("QUESTION_IMPORT_HOST", socket.gethostname())
+    QUESTION_IMPORT_STALE_SECONDS: float = float(os.getenv("QUESTION_IMPORT_STALE_SECONDS", 300))
+    QUESTION_IMPORT_SWEEP_INTERVAL_SECONDS: float = float(os.getenv("QUESTION_IMPORT_SWEEP_INTERVAL_SECONDS", 60))
+
+    # Question bank facet counts; the TTL bounds staleness after writes in other workers
+    QUESTION_FACET_CACHE_SIZE: int = int(os.getenv("QUESTION_FACET_CACHE_SIZE", 1000))
+    QUESTION_FACET_CACHE_TTL_SECONDS: float = float(os.getenv("QUESTION_FACET_CACHE_TTL_SECONDS", 60))
+
+    # Users loaded by get_current_user (including "no such user"); the TTL bounds
+    # how long a user deactivated by another worker process stays authorized
+    USER_CACHE_SIZE: int = int(os.getenv("USER_CACHE_SIZE", 10000))
+    USER_CACHE_TTL_SECONDS: float = float(os.getenv("USER_CACHE_TTL_SECONDS", 30))
+
+    # Claims-only authorization (auth.dependencies.ClaimsChecker) trusts an access
+    # token's role and verified flag for this long after it was issued; older
+    # tokens are checked against the user row. This bounds how long a revocation
+    # made by another worker process can go unnoticed.
+    CLAIMS_MAX_TOKEN_AGE_SECONDS: float = float(os.getenv("CLAIMS_MAX_TOKEN_AGE_SECONDS", 300))
+
+    # Argon2 cost of new password hashes; hashes made with other parameters are
+    # upgraded on the user's next successful login
+    ARGON2_TIME_COST: int = int(os.getenv("ARGON2_TIME_COST", 3))
+    ARGON2_MEMORY_COST_KIB: int = int(os.getenv("ARGON2_MEMORY_COST_KIB", 65536))
+    ARGON2_PARALLELISM: int = int(os.getenv("ARGON2_PARALLELISM", 4))
+    # Worker processes for password hashing (0 uses threads of this process).
+    # Calls beyond the workers wait in a queue of at most PASSWORD_HASH_MAX_QUEUE;
+    # further logins and sign-ups get 503 with Retry-After
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+    PASSWORD_HASH_MAX_QUEUE: int = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", 64))
+    PASSWORD_HASH_RETRY_AFTER_SECONDS: int = int(os.getenv("PASSWORD_HASH_RETRY_AFTER_SECONDS", 2))
+
+    # Revoked token ids are mirrored into an in-process Bloom filter sized for
+    # this many ids at this false-positive rate (only filter hits query the
+    # database); other workers' revocations are picked up every sync interval
+    REVOKED_TOKEN_FILTER_CAPACITY: int = int(os.getenv("REVOKED_TOKEN_FILTER_CAPACITY", 100000))
+    REVOKED_TOKEN_FILTER_ERROR_RATE: float = float(os.getenv("REVOKED_TOKEN_FILTER_ERROR_RATE", 0.001))
+    REVOKED_TOKEN_SYNC_INTERVAL_SECONDS: float = float(os.getenv("REVOKED_TOKEN_SYNC_INTERVAL_SECONDS", 10))
+
+    # Email outbox: messages claimed per batch, polling interval when idle, and
+    # retries with exponential backoff before a message is given up. Claimed
+    # rows are leased to one sender for EMAIL_OUTBOX_LEASE_SECONDS; a batch is
+    # cut down to what MAIL_SMTP_CONNECTIONS can send inside the lease
+    EMAIL_OUTBOX_BATCH_SIZE: int = int(os.getenv("EMAIL_OUTBOX_BATCH_SIZE", 100))
+    EMAIL_OUTBOX_LEASE_SECONDS: float = float(os.getenv("EMAIL_OUTBOX_LEASE_SECONDS", 300))
+    EMAIL_OUTBOX_POLL_INTERVAL_SECONDS: float = float(os.getenv("EMAIL_OUTBOX_POLL_INTERVAL_SECONDS", 5))
+    EMAIL_OUTBOX_MAX_ATTEMPTS: int = int(os.getenv("EMAIL_OUTBOX_MAX_ATTEMPTS", 8))
+    EMAIL_OUTBOX_RETRY_BASE_SECONDS: float = float(os.getenv("EMAIL_OUTBOX_RETRY_BASE_SECONDS", 30))
+    EMAIL_OUTBOX_RETRY_MAX_SECONDS: float = float(os.getenv("EMAIL_OUTBOX_RETRY_MAX_SECONDS", 3600))
+
 
 settings = Settings()
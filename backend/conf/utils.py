@@ -1,34 +1,21 @@
-from typing import List
+import asyncio
+import logging
+from email.message import EmailMessage
+from email.utils import formataddr
+from typing import List, Optional, Sequence, Tuple
 from pathlib import Path
+import aiosmtplib
 from .config import settings
-from fastapi_mail import FastMail, ConnectionConfig, MessageSchema, MessageType
+
+logger = logging.getLogger(__name__)
 
 # Base directory for locating templates or other static resources
 BASE_DIR = Path(__file__).resolve().parent
 
-# Email Configuration
-mail_config = ConnectionConfig(
-    MAIL_USERNAME=settings.MAIL_USERNAME,
-    MAIL_PASSWORD=settings.MAIL_PASSWORD,
-    MAIL_FROM=settings.MAIL_FROM,
-    MAIL_PORT=587,
-    MAIL_SERVER=settings.MAIL_SERVER,
-    MAIL_FROM_NAME=settings.MAIL_FROM_NAME,
-    MAIL_STARTTLS=True,
-    MAIL_SSL_TLS=False,
-    USE_CREDENTIALS=True,
-    VALIDATE_CERTS=True,
-    # Uncomment and set the TEMPLATE_FOLDER when using email templates
-    # TEMPLATE_FOLDER=Path(BASE_DIR, "templates"),
-)
-
-# Initialize FastMail instance
-mail = FastMail(config=mail_config)
-
-
-def create_message(recipients: List[str], subject: str, body: str) -> MessageSchema:
+
+def create_message(recipients: List[str], subject: str, body: str) -> EmailMessage:
     """
-    Create an email message schema for FastMail.
+    Create an HTML email message.
 
     Args:
         recipients (List[str]): A list of email addresses to send the email to.
@@ -36,42 +23,98 @@ def create_message(recipients: List[str], subject: str, body: str) -> MessageSch
         body (str): The body of the email, supports HTML.
 
     Returns:
-        MessageSchema: The constructed email message.
+        EmailMessage: The constructed email message.
 
     Raises:
-        ValueError: If recipients list is empty or invalid arguments are provided.
+        ValueError: If recipients list is empty.
     """
     if not recipients:
         raise ValueError("The recipients list cannot be empty.")
 
-    try:
-        message = MessageSchema(
-            recipients=recipients,
-            subject=subject,
-            body=body,
-            subtype=MessageType.html,  # Specify HTML email subtype
-        )
-        return message
-    except Exception as e:
-        raise ValueError(f"Failed to create the email message: {e}")
+    message = EmailMessage()
+    message["From"] = formataddr((settings.MAIL_FROM_NAME or "", settings.MAIL_FROM))
+    message["To"] = ", ".join(recipients)
+    message["Subject"] = subject
+    message.set_content(body, subtype="html")
+    return message
 
 
-async def send_email(recipients: List[str], subject: str, body: str) -> None:
+class SMTPConnectionPool:
+    """
+    A few SMTP connections kept open and reused across messages, instead of
+    one connect/STARTTLS/login handshake per message.
     """
-    Send an email asynchronously using FastMail.
 
-    Args:
-        recipients (List[str]): A list of email addresses to send the email to.
-        subject (str): The subject of the email.
-        body (str): The body of the email, supports HTML.
+    def __init__(self, size: int) -> None:
+        self.size = max(size, 1)
+        self._idle: "asyncio.Queue[aiosmtplib.SMTP]" = asyncio.Queue()
+        self._created = 0
 
-    Raises:
-        Exception: If sending the email fails.
-    """
-    message = create_message(recipients, subject, body)
+    def _new_client(self) -> aiosmtplib.SMTP:
+        return aiosmtplib.SMTP(
+            hostname=settings.MAIL_SERVER,
+            port=settings.MAIL_PORT,
+            username=settings.MAIL_USERNAME if settings.USE_CREDENTIALS else None,
+            password=settings.MAIL_PASSWORD if settings.USE_CREDENTIALS else None,
+            use_tls=settings.MAIL_SSL_TLS,
+            start_tls=settings.MAIL_STARTTLS and not settings.MAIL_SSL_TLS,
+            validate_certs=settings.VALIDATE_CERTS,
+            timeout=settings.MAIL_TIMEOUT_SECONDS,
+        )
+
+    async def _acquire(self) -> aiosmtplib.SMTP:
+        if self._idle.empty() and self._created < self.size:
+            self._created += 1
+            return self._new_client()
+        return await self._idle.get()
+
+    async def send(self, message: EmailMessage) -> None:
+        """
+        Send one message, reconnecting once if the server dropped the
+        connection. The whole send takes at most MAIL_TIMEOUT_SECONDS.
+        """
+        client = await self._acquire()
+        try:
+            async with asyncio.timeout(settings.MAIL_TIMEOUT_SECONDS):
+                for retry in (False, True):
+                    try:
+                        if not client.is_connected:
+                            await client.connect()
+                        await client.send_message(message)
+                        return
+                    except aiosmtplib.SMTPServerDisconnected:
+                        client.close()
+                        if retry:
+                            raise
+        except TimeoutError:
+            # Cut off mid-command; the session is in an unknown state
+            client.close()
+            raise
+        except Exception:
+            if client.is_connected:
+                # Reset the session state so the next message starts clean
+                try:
+                    await client.rset()
+                except aiosmtplib.SMTPException:
+                    client.close()
+            raise
+        finally:
+            self._idle.put_nowait(client)
+
+    async def send_many(self, messages: Sequence[EmailMessage]) -> List[Optional[Exception]]:
+        """Send messages over the pooled connections; returns None or the error per message."""
+        results = await asyncio.gather(*(self.send(message) for message in messages), return_exceptions=True)
+        return [result if isinstance(result, Exception) else None for result in results]
+
+    async def close(self) -> None:
+        while not self._idle.empty():
+            client = self._idle.get_nowait()
+            if client.is_connected:
+                try:
+                    await client.quit()
+                except aiosmtplib.SMTPException:
+                    client.close()
+        self._created = 0
 
-    try:
-        await mail.send_message(message)
-    except Exception as e:
-        raise Exception(f"Failed to send email: {e}")
 
+smtp_pool = SMTPConnectionPool(settings.MAIL_SMTP_CONNECTIONS)
@@ -2,11 +2,12 @@ import uuid
 from enum import Enum
 from conf.database import Base
 from datetime import datetime
-from typing import List, TYPE_CHECKING
+from typing import List, Optional, TYPE_CHECKING
 from sqlalchemy import (
-    Integer, String, DateTime, JSON, Text,
+    Integer, String, DateTime, JSON, Text, Computed, Index,
     ARRAY, UUID, func, Enum as SQLAlchemyEnum
 )
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 
 if TYPE_CHECKING:
@@ -19,8 +20,41 @@ class ExamStatus(Enum):
     ARCHIVED = "Archived"
 
 
+class ImportJobStatus(Enum):
+    PENDING = "Pending"
+    RUNNING = "Running"
+    COMPLETED = "Completed"
+    FAILED = "Failed"
+
+
+class Tag(Base):
+    """Interned question tag; names are unique ignoring case."""
+    __tablename__ = 'tags'
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    name: Mapped[str] = mapped_column(String, nullable=False)
+
+    def __repr__(self):
+        return f"<Tag(id={self.id}, name={self.name})>"
+
+
+Index('uq_tags_name_lower', func.lower(Tag.name), unique=True)
+
+
+# Text search configuration of Question.search_vector; queries must use the same one
+QUESTION_SEARCH_CONFIG = "english"
+
+
 class Question(Base):
     __tablename__ = 'questions'
+    __table_args__ = (
+        Index('ix_questions_search_vector', 'search_vector', postgresql_using='gin'),
+        Index('ix_questions_title_trgm', 'title', postgresql_using='gin',
+              postgresql_ops={'title': 'gin_trgm_ops'}),
+        Index('ix_questions_tag_ids', 'tag_ids', postgresql_using='gin'),
+        # Random-pivot probes of blueprint sections seek on (complexity, ques_type, id)
+        Index('ix_questions_complexity_type_id', 'complexity', 'ques_type', 'id'),
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True), primary_key=True, default=uuid.uuid4
@@ -33,11 +67,37 @@ class Question(Base):
     correct_answers: Mapped[dict] = mapped_column(JSON)
 
     max_score: Mapped[int] = mapped_column(Integer)
-    tags: Mapped[List[str]] = mapped_column(ARRAY(String))
+    # Ids into the interned `tags` table, in the order the tags were given
+    tag_ids: Mapped[List[int]] = mapped_column(
+        ARRAY(Integer), default=list, server_default="{}", nullable=False)
+    # Bumped whenever the answer key changes; compiled keys are cached per version
+    version: Mapped[int] = mapped_column(
+        Integer, default=1, server_default="1", nullable=False)
+    # question_content_hash() of title, type, options and answer key; NULL only
+    # for duplicates that predate the column
+    content_hash: Mapped[Optional[str]] = mapped_column(
+        String(64), index=True, unique=True)
+    # Maintained by PostgreSQL; deferred so plain question loads don't fetch it
+    search_vector: Mapped[Optional[str]] = mapped_column(
+        TSVECTOR,
+        Computed(
+            f"setweight(to_tsvector('{QUESTION_SEARCH_CONFIG}', coalesce(title, '')), 'A') || "
+            f"setweight(to_tsvector('{QUESTION_SEARCH_CONFIG}', coalesce(complexity, '')), 'B')",
+            persisted=True
+        ),
+        deferred=True
+    )
 
     # Relationships
     attempt_answers: Mapped[List["AttemptAnswer"]] = relationship("AttemptAnswer", back_populates="question")
 
+    @property
+    def tags(self) -> List[str]:
+        """Tag names from the in-process tag cache (warmed with tag_cache.ensure_ids)."""
+        # Imported here: exam.utils imports this module
+        from .utils import tag_cache
+        return tag_cache.names_for(self.tag_ids or [])
+
     def __repr__(self):
         return f"<Question(title={self.title}, complexity={self.complexity})>"
 
@@ -63,3 +123,38 @@ class Exam(Base):
 
     def __repr__(self):
         return f"<Exam(title={self.title}, status={self.status})>"
+
+
+class QuestionImportJob(Base):
+    __tablename__ = 'question_import_jobs'
+
+    id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), primary_key=True, default=uuid.uuid4
+    )
+    filename: Mapped[str] = mapped_column(String, nullable=False)
+    # Spooled upload; removed once the job completes or fails
+    file_path: Mapped[str] = mapped_column(String, nullable=False)
+    # Host whose spool dir holds file_path; only its workers claim the job
+    spool_host: Mapped[Optional[str]] = mapped_column(String)
+    status: Mapped[ImportJobStatus] = mapped_column(
+        SQLAlchemyEnum(ImportJobStatus), default=ImportJobStatus.PENDING, nullable=False, index=True)
+
+    rows_processed: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    rows_failed: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    questions_created: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    questions_updated: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    questions_skipped: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    # Sheet row of the last committed chunk (1 = header); a resumed job starts after it
+    last_committed_row: Mapped[int] = mapped_column(Integer, default=1, nullable=False)
+    errors: Mapped[List[str]] = mapped_column(JSON, default=list)
+    error_message: Mapped[Optional[str]] = mapped_column(Text)
+
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=func.now(), nullable=False)
+    # Bumped on every chunk commit; a RUNNING job that stops updating is resumed
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=func.now(), nullable=False)
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
+
+    def __repr__(self):
+        return f"<QuestionImportJob(filename={self.filename}, status={self.status})>"
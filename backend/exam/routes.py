@@ -1,19 +1,23 @@
 import uuid
-from typing import List
-from fastapi import APIRouter, Depends, status, UploadFile, File
+from typing import List, Optional
+from fastapi import APIRouter, Depends, status, UploadFile, File, Header, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from conf.database import get_db
 from .services import ExamService
+from .utils import etag_matches
 from auth.models import User
 from auth.dependencies import get_current_user, get_admin_user
-from .schemas import ExamCreate, ExamUpdate, ExamOut, QuestionImportSummary, QuestionFilter, QuestionOut, QuestionCreate
+from .schemas import (
+    ExamCreate, ExamGenerate, ExamUpdate, ExamOut, QuestionImportJobOut, QuestionFilter, QuestionFacetsOut, QuestionOut, QuestionPageOut, QuestionPageParams, QuestionCreate, QuestionAnswerKeyUpdate, ExamPaperOut,
+    QuestionBatchCreate, QuestionBatchDelete, QuestionBatchOut, QuestionBatchUpdate
+)
 
 
 exam_router = APIRouter(prefix="/exam", tags=["Exams"])
 exam_service = ExamService()
 
 
-@exam_router.post("/import-excel", response_model=QuestionImportSummary)
+@exam_router.post("/import-excel", response_model=QuestionImportJobOut, status_code=status.HTTP_202_ACCEPTED)
 async def import_questions(
     file: UploadFile = File(...,
                             description="Excel file (.xlsx) containing question data"),
@@ -21,23 +25,50 @@ async def import_questions(
     admin_user: User = Depends(get_admin_user)
 ):
     """
-    Admin: Upload Excel file, preview (conceptual), and confirm import of questions 
-    into the Question Bank. The file parsing step remains synchronous within the service.
+    Admin: Queue an .xlsx file for import into the Question Bank and return the job.
+    Header row: title, complexity, ques_type, options (JSON), correct_answers (JSON),
+    max_score, tags (comma-separated). Poll /exam/import-jobs/{job_id} for progress.
     """
-    return await exam_service.import_questions_from_excel(db, file)
+    return await exam_service.create_import_job(db, file)
 
 
-@exam_router.get("/all-questions", response_model=List[QuestionOut])
+@exam_router.get("/import-jobs/{job_id}", response_model=QuestionImportJobOut)
+async def get_import_job(
+    job_id: uuid.UUID,
+    db: AsyncSession = Depends(get_db),
+    admin_user: User = Depends(get_admin_user)
+):
+    """Admin: Progress of a question import job."""
+    return await exam_service.get_import_job(db, job_id)
+
+
+@exam_router.get("/all-questions", response_model=QuestionPageOut)
 async def list_and_filter_questions(
     filters: QuestionFilter = Depends(),
+    page: QuestionPageParams = Depends(),
     db: AsyncSession = Depends(get_db),
     admin_user: User = Depends(get_admin_user)
 ):
     """
     Admin: List, filter, and search questions in the bank.
-    Filters are passed as query parameters.
+    Filters are passed as query parameters; with search_term, results are
+    ordered by relevance and include a highlighted snippet. Results are paged:
+    pass next_cursor back as cursor to get the following page.
+    """
+    return await exam_service.list_questions(db, filters, page)
+
+
+@exam_router.get("/question-facets", response_model=QuestionFacetsOut)
+async def question_facets(
+    filters: QuestionFilter = Depends(),
+    db: AsyncSession = Depends(get_db),
+    admin_user: User = Depends(get_admin_user)
+):
+    """
+    Admin: Number of questions per tag, complexity and type among those
+    matching the filters (same query parameters as /all-questions).
     """
-    return await exam_service.list_questions(db, filters)
+    return await exam_service.get_question_facets(db, filters)
 
 
 @exam_router.get("/view-question/{question_id}", response_model=QuestionOut)
@@ -62,6 +93,51 @@ async def create_single_question(
     return await exam_service.create_question(db, question_data)
 
 
+@exam_router.post("/batch-create-questions", response_model=QuestionBatchOut)
+async def batch_create_questions(
+    batch: QuestionBatchCreate,
+    db: AsyncSession = Depends(get_db),
+    admin_user: User = Depends(get_admin_user)
+):
+    """
+    Admin: Create up to 5000 questions in one transaction. In "atomic" mode any
+    duplicate rejects the whole batch (409 with per-item results); in
+    "best_effort" mode the rest are saved and duplicates reported.
+    """
+    return await exam_service.create_questions_batch(db, batch)
+
+
+@exam_router.post("/batch-update-questions", response_model=QuestionBatchOut)
+async def batch_update_questions(
+    batch: QuestionBatchUpdate,
+    db: AsyncSession = Depends(get_db),
+    admin_user: User = Depends(get_admin_user)
+):
+    """Admin: Update up to 5000 questions in one transaction (modes as in batch-create)."""
+    return await exam_service.update_questions_batch(db, batch)
+
+
+@exam_router.post("/batch-delete-questions", response_model=QuestionBatchOut)
+async def batch_delete_questions(
+    batch: QuestionBatchDelete,
+    db: AsyncSession = Depends(get_db),
+    admin_user: User = Depends(get_admin_user)
+):
+    """Admin: Delete up to 5000 questions; questions used by an exam or an answer are kept."""
+    return await exam_service.delete_questions_batch(db, batch)
+
+
+@exam_router.patch("/update-answer-key/{question_id}", response_model=QuestionOut)
+async def update_answer_key(
+    question_id: uuid.UUID,
+    key_data: QuestionAnswerKeyUpdate,
+    db: AsyncSession = Depends(get_db),
+    admin_user: User = Depends(get_admin_user)
+):
+    """Admin: Correct a question's answer key. Run a regrade afterwards to fix submitted results."""
+    return await exam_service.update_answer_key(db, question_id, key_data)
+
+
 @exam_router.post("/create-exam", response_model=ExamOut, status_code=status.HTTP_201_CREATED)
 async def create_exam(
     exam_data: ExamCreate,
@@ -72,6 +148,16 @@ async def create_exam(
     return await exam_service.create_exam(db, exam_data)
 
 
+@exam_router.post("/generate-exam", response_model=ExamOut, status_code=status.HTTP_201_CREATED)
+async def generate_exam(
+    blueprint: ExamGenerate,
+    db: AsyncSession = Depends(get_db),
+    admin_user: User = Depends(get_admin_user)
+):
+    """Admin: Create a draft exam by drawing random questions for each blueprint section."""
+    return await exam_service.generate_exam(db, blueprint)
+
+
 @exam_router.patch("/update-exam/{exam_id}", response_model=ExamOut)
 async def update_exam(
     exam_id: uuid.UUID,
@@ -90,3 +176,21 @@ async def view_available_exams(
 ):
     """Student: View and start available exams (Published and within time window)."""
     return await exam_service.get_available_exams(db)
+
+
+@exam_router.get("/paper/{exam_id}", responses={200: {"model": ExamPaperOut}, 304: {}})
+async def get_exam_paper(
+    exam_id: uuid.UUID,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db),
+    admin_user: User = Depends(get_admin_user)
+):
+    """Admin: Get an exam's canonical, unshuffled questions (without answer keys), drafts included. Supports If-None-Match.
+
+    Students read their own shuffled copy from /{attempt_id}/paper.
+    """
+    paper = await exam_service.get_cached_paper(db, exam_id)
+    headers = {"ETag": paper.etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(if_none_match, paper.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=paper.body, media_type="application/json", headers=headers)
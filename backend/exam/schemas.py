@@ -1,8 +1,8 @@
 import uuid
 from datetime import datetime
-from typing import List, Optional, Dict, Any
+from typing import List, Literal, Optional, Dict, Any, Union
 from pydantic import BaseModel, Field
-from .models import ExamStatus
+from .models import ExamStatus, ImportJobStatus
 
 class IDBase(BaseModel):
     id: uuid.UUID
@@ -23,21 +23,151 @@ class QuestionCreate(QuestionBase):
 
 
 class QuestionFilter(BaseModel):
+    # Full-text search over title and complexity, ranked by relevance; the last
+    # word matches as a prefix so results update while typing
     search_term: Optional[str] = None
+    # Also match titles by trigram similarity (typos, substrings)
+    fuzzy: bool = True
     complexity: Optional[str] = None
     ques_type: Optional[str] = None
     tags: Optional[List[str]] = None
+    # "all": question has every tag; "any": question has at least one
+    tag_mode: Literal["all", "any"] = "all"
 
 class QuestionOut(QuestionBase, IDBase):
     class Config:
         from_attributes = True
+
+
+class QuestionSearchOut(QuestionOut):
+    # Set only when searching: relevance and the title with matches in <mark> tags
+    rank: Optional[float] = None
+    snippet: Optional[str] = None
+
+
+class QuestionSummaryOut(IDBase):
+    """A question list row without options or answer key."""
+    title: str
+    complexity: str
+    ques_type: str
+    max_score: int
+    tags: List[str]
+    rank: Optional[float] = None
+    snippet: Optional[str] = None
+
+
+class QuestionPageParams(BaseModel):
+    limit: int = Field(50, ge=1, le=500)
+    # next_cursor of the previous page
+    cursor: Optional[str] = None
+    # "summary" leaves out options and correct_answers
+    fields: Literal["full", "summary"] = "full"
+    # Counting every match costs a second query, so it is opt-in
+    include_total: bool = False
+
+
+class QuestionPageOut(BaseModel):
+    items: List[Union[QuestionSearchOut, QuestionSummaryOut]]
+    next_cursor: Optional[str] = None
+    total: Optional[int] = None
         
 
-class QuestionImportSummary(BaseModel):
-    total_rows_parsed: int
-    new_questions_created: int
-    import_successful: bool
+class PaperQuestionOut(IDBase):
+    """A question as shown to a student: no answer key."""
+    title: str
+    ques_type: str
+    max_score: int
+    # Kept last: papers are assembled from serialized fragments (exam.utils.ExamPaper)
+    options: Dict[str, Any]
+
+    class Config:
+        from_attributes = True
+
+
+class ExamPaperOut(BaseModel):
+    exam_id: uuid.UUID
+    title: str
+    start_time: datetime
+    end_time: datetime
+    duration_minutes: int
+    # Kept last, see PaperQuestionOut.options
+    questions: List[PaperQuestionOut]
+
+
+class QuestionFacetsOut(BaseModel):
+    total: int
+    tags: Dict[str, int] = Field(default_factory=dict)
+    complexity: Dict[str, int] = Field(default_factory=dict)
+    ques_type: Dict[str, int] = Field(default_factory=dict)
+
+
+# Largest batch accepted by the /questions/batch-* endpoints
+QUESTION_BATCH_MAX_ITEMS = 5000
+
+
+class QuestionBatchCreate(BaseModel):
+    questions: List[QuestionCreate] = Field(..., min_length=1, max_length=QUESTION_BATCH_MAX_ITEMS)
+    # "atomic": any failed item rolls back the whole batch;
+    # "best_effort": successful items are committed and failures reported
+    mode: Literal["atomic", "best_effort"] = "atomic"
+
+
+class QuestionBatchUpdateItem(IDBase):
+    """Fields left out keep their current value."""
+    title: Optional[str] = None
+    complexity: Optional[str] = None
+    ques_type: Optional[str] = None
+    options: Optional[Dict[str, Any]] = None
+    correct_answers: Optional[Dict[str, Any]] = None
+    max_score: Optional[int] = Field(None, ge=0)
+    tags: Optional[List[str]] = None
+
+
+class QuestionBatchUpdate(BaseModel):
+    questions: List[QuestionBatchUpdateItem] = Field(..., min_length=1, max_length=QUESTION_BATCH_MAX_ITEMS)
+    mode: Literal["atomic", "best_effort"] = "atomic"
+
+
+class QuestionBatchDelete(BaseModel):
+    ids: List[uuid.UUID] = Field(..., min_length=1, max_length=QUESTION_BATCH_MAX_ITEMS)
+    mode: Literal["atomic", "best_effort"] = "atomic"
+
+
+class QuestionBatchItemResult(BaseModel):
+    # Position of the item in the request
+    index: int
+    id: Optional[uuid.UUID] = None
+    status: Literal["created", "updated", "unchanged", "deleted", "duplicate", "not_found", "conflict", "in_use"]
+    detail: Optional[str] = None
+
+
+class QuestionBatchOut(BaseModel):
+    committed: bool
+    results: List[QuestionBatchItemResult]
+
+
+class QuestionAnswerKeyUpdate(BaseModel):
+    correct_answers: Dict[str, Any]
+    max_score: Optional[int] = Field(None, ge=0)
+
+
+class QuestionImportJobOut(IDBase):
+    filename: str
+    status: ImportJobStatus
+    rows_processed: int
+    rows_failed: int
+    questions_created: int
+    questions_updated: int
+    questions_skipped: int
+    last_committed_row: int
     errors: List[str] = Field(default_factory=list)
+    error_message: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
 
 class ExamCreate(BaseModel):
     title: str = Field(..., max_length=255)
@@ -46,6 +176,24 @@ class ExamCreate(BaseModel):
     duration_minutes: int = Field(..., gt=0)
     question_ids: List[uuid.UUID]
 
+class BlueprintSection(BaseModel):
+    """Draw `count` random questions matching these filters."""
+    count: int = Field(..., gt=0, le=1000)
+    complexity: Optional[str] = None
+    ques_type: Optional[str] = None
+    # Question must have every tag
+    tags: Optional[List[str]] = None
+
+
+class ExamGenerate(BaseModel):
+    title: str = Field(..., max_length=255)
+    start_time: datetime
+    end_time: datetime
+    duration_minutes: int = Field(..., gt=0)
+    sections: List[BlueprintSection] = Field(..., min_length=1)
+    # Skip questions used by exams that started within this many days
+    avoid_recent_days: Optional[int] = Field(None, gt=0)
+
 class ExamUpdate(BaseModel):
     title: Optional[str] = None
     start_time: Optional[datetime] = None
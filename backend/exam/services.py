@@ -1,158 +1,590 @@
+import asyncio
+import logging
+import os
+import random
 import uuid
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Set, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import func, or_
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import (
+    UUID, Integer, String, and_, bindparam, any_, cast, column, exists, false, func, literal, or_, true, union_all,
+    update, values, delete
+)
+from sqlalchemy.dialects.postgresql import ARRAY as PG_ARRAY, array as pg_array, insert as pg_insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.future import select
+from sqlalchemy.orm import load_only
 from fastapi import HTTPException, status, UploadFile
-from .models import Exam, Question, ExamStatus
-from .schemas import ExamCreate, ExamUpdate, QuestionBase, QuestionFilter, QuestionImportSummary, QuestionCreate
+from conf.config import settings
+from conf.database import async_session
+from result.models import AttemptAnswer
+from .models import Exam, Question, ExamStatus, ImportJobStatus, QuestionImportJob, QUESTION_SEARCH_CONFIG
+from .utils import (
+    answer_key_cache, compile_question_key, exam_paper_cache, iter_question_chunks, spool_upload,
+    dedupe_questions, question_content_hash, question_upsert_statement, with_content_hash, ExamPaper,
+    build_prefix_tsquery, escape_like, question_facet_cache, encode_cursor, decode_cursor, normalize_tag, tag_cache
+)
+from .schemas import (
+    BlueprintSection, ExamCreate, ExamGenerate, ExamUpdate, ExamPaperOut, PaperQuestionOut, QuestionFilter, QuestionFacetsOut, QuestionSearchOut,
+    QuestionCreate, QuestionPageOut, QuestionPageParams, QuestionSummaryOut, QuestionAnswerKeyUpdate,
+    QuestionBatchCreate, QuestionBatchDelete, QuestionBatchItemResult, QuestionBatchOut, QuestionBatchUpdate
+)
+
+logger = logging.getLogger(__name__)
+
+# Columns selected for question list pages; rows are read as plain mappings
+QUESTION_SUMMARY_COLUMNS = (
+    Question.id, Question.title, Question.complexity, Question.ques_type,
+    Question.max_score, Question.tag_ids
+)
+QUESTION_FULL_COLUMNS = QUESTION_SUMMARY_COLUMNS + (Question.options, Question.correct_answers)
+
+# Question fields a batch update may change, and those that change grading
+# (a change to any of the latter bumps Question.version)
+QUESTION_EDITABLE_FIELDS = ("title", "complexity", "ques_type", "options", "correct_answers", "max_score", "tag_ids")
+QUESTION_KEY_FIELDS = ("ques_type", "options", "correct_answers", "max_score")
+
+# Blueprint sampling: probe rounds before falling back to reading one id
+# window, and random probes (or window rows) per question still needed
+BLUEPRINT_SAMPLE_ROUNDS = 3
+BLUEPRINT_OVERSAMPLE = 2
+
+# Import jobs running in this process; kept referenced so they are not garbage collected
+_import_tasks: Set[asyncio.Task] = set()
 
 
 class ExamService:
     
-    def parse_excel_file(file: UploadFile) -> List[Dict[str, Any]]:
-        """
-        Conceptual function to read an XLSX file and return a list of question dictionaries.
-        In a real application, this would use pandas/openpyxl and handle:
-        - Reading the file into a DataFrame.
-        - Renaming/Validating required columns (title, complexity, type, etc.).
-        - Converting 'options' and 'correct_answers' (JSON string -> Dict).
-        - Converting 'tags' (CSV string -> List).
-        """
-        if file.filename.endswith(".xlsx") or file.filename.endswith(".xls"):
-            return [
-                {
-                    "title": "What is 2+2?",
-                    "complexity": "Class 1",
-                    "ques_type": "single_choice",
-                    "options": {"A": "3", "B": "4", "C": "5"},
-                    "correct_answers": {"selected_option": "B"},
-                    "max_score": 5,
-                    "tags": ["Math", "Basic"]
-                },
-                {
-                    "title": "Describe gravity.",
-                    "complexity": "Class 5",
-                    "ques_type": "text",
-                    "options": {},
-                    "correct_answers": {"model_answer": "Gravity is the force that..."},
-                    "max_score": 10,
-                    "tags": ["Physics"]
-                }
-            ]
-        else:
-            raise ValueError("File must be an Excel (.xlsx) file.")
-    
     # Helper function for grading objective questions
     def _grade_objective_question(self, question: Question, student_answer: Dict[str, Any]) -> float:
-        correct_answers = question.correct_answers.get('selected_options', [])
-        student_selected = student_answer.get('selected_options', [])
+        compiled = answer_key_cache.get(question.id, question.version)
+        if compiled is None:
+            compiled = compile_question_key(question)
+            answer_key_cache.put(compiled)
 
-        if question.ques_type == 'single_choice':
-            is_correct = set(student_selected) == set(correct_answers)
-            return question.max_score if is_correct else 0.0
+        score = compiled.grade(student_answer)
+        return score if score is not None else 0.0
+    
+    # Admin: Spool an uploaded workbook and queue a background import job
+    async def create_import_job(self, db: AsyncSession, file: UploadFile) -> QuestionImportJob:
+        if not (file.filename or "").lower().endswith(".xlsx"):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail="File must be an Excel (.xlsx) file.")
+
+        job_id = uuid.uuid4()
+        file_path = os.path.join(settings.QUESTION_IMPORT_SPOOL_DIR, f"{job_id}.xlsx")
+        await asyncio.to_thread(spool_upload, file.file, file_path)
+
+        now = datetime.now(timezone.utc)
+        job = QuestionImportJob(
+            id=job_id,
+            filename=file.filename,
+            file_path=file_path,
+            spool_host=settings.QUESTION_IMPORT_HOST,
+            status=ImportJobStatus.PENDING,
+            errors=[],
+            created_at=now,
+            updated_at=now
+        )
+        db.add(job)
+        try:
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            await asyncio.to_thread(_remove_spooled_file, file_path)
+            raise
 
-        elif question.ques_type == 'multiple_choice':
-            if set(student_selected) == set(correct_answers):
-                return question.max_score
-            else:
-                return 0.0
+        start_import_job(job_id)
+        return job
 
-        return 0.0
-    
-    # Admin: Import Questions from Excel
-    async def import_questions_from_excel(self, db: AsyncSession, file: UploadFile) -> QuestionImportSummary:
-        errors = []
-        parsed_data: List[Dict[str, Any]]
+    # Admin: Import job progress
+    async def get_import_job(self, db: AsyncSession, job_id: uuid.UUID) -> QuestionImportJob:
+        stmt = select(QuestionImportJob).where(QuestionImportJob.id == job_id)
+        result = await db.execute(stmt)
+        job = result.scalars().first()
 
-        try:
-            parsed_data = self.parse_excel_file(file)
-        except ValueError as e:
+        if not job:
             raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
-        except Exception as e:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Error parsing file: {e}")
+                status_code=status.HTTP_404_NOT_FOUND, detail="Import job not found.")
+        return job
 
-        new_questions_created = 0
+    # Claim a job that is pending or whose worker stopped committing chunks
+    async def _claim_import_job(self, db: AsyncSession, job_id: uuid.UUID) -> Optional[QuestionImportJob]:
+        now = datetime.now(timezone.utc)
+        stale_before = now - timedelta(seconds=settings.QUESTION_IMPORT_STALE_SECONDS)
+        stmt = (
+            update(QuestionImportJob)
+            .where(QuestionImportJob.id == job_id, _runnable_import_jobs(stale_before))
+            .values(status=ImportJobStatus.RUNNING, updated_at=now)
+            .returning(QuestionImportJob)
+            .execution_options(populate_existing=True)
+        )
+        job = (await db.execute(stmt)).scalars().first()
+        await db.commit()
+        return job
 
-        for idx, row in enumerate(parsed_data):
-            try:
-                question_data = QuestionBase(**row)
-
-                new_question = Question(
-                    title=question_data.title,
-                    complexity=question_data.complexity,
-                    ques_type=question_data.ques_type,
-                    options=question_data.options,
-                    correct_answers=question_data.correct_answers,
-                    max_score=question_data.max_score,
-                    tags=question_data.tags
-                )
-                db.add(new_question)
-                new_questions_created += 1
+    # Run (or resume) an import job, committing questions and progress per chunk
+    async def run_import_job(self, job_id: uuid.UUID) -> None:
+        async with async_session() as db:
+            job = await self._claim_import_job(db, job_id)
+            if job is None:
+                return
 
+            file_path = job.file_path
+            logger.info("Import job %s: starting after sheet row %s", job_id, job.last_committed_row)
+            try:
+                source = await asyncio.to_thread(open, file_path, "rb")
+                chunks = iter_question_chunks(
+                    source, settings.QUESTION_IMPORT_CHUNK_SIZE, after_row=job.last_committed_row)
+                try:
+                    while True:
+                        chunk = await asyncio.to_thread(next, chunks, None)
+                        if chunk is None:
+                            break
+
+                        created = updated = 0
+                        questions = dedupe_questions(chunk.questions)
+                        if questions:
+                            await tag_cache.intern_question_rows(questions)
+                            inserted_flags = (await db.execute(question_upsert_statement(questions))).scalars().all()
+                            created = sum(1 for inserted in inserted_flags if inserted)
+                            updated = len(inserted_flags) - created
+                        room = settings.QUESTION_IMPORT_MAX_ERRORS - len(job.errors or [])
+                        if room > 0 and chunk.errors:
+                            job.errors = (job.errors or []) + chunk.errors[:room]
+                        job.rows_processed += chunk.rows_read
+                        job.rows_failed += len(chunk.errors)
+                        job.questions_created += created
+                        job.questions_updated += updated
+                        job.questions_skipped += len(chunk.questions) - created - updated
+                        job.last_committed_row = chunk.last_row
+                        job.updated_at = datetime.now(timezone.utc)
+                        # Questions and progress commit together, so a resumed
+                        # job never inserts a chunk twice
+                        await db.commit()
+                        question_facet_cache.clear()
+                        if updated:
+                            # An update may have changed max_score, which papers show
+                            exam_paper_cache.clear()
+                finally:
+                    # If cancelled mid-chunk the worker thread is still inside
+                    # next(); leave the generator and file for it to finish with
+                    if not chunks.gi_running:
+                        chunks.close()
+                        source.close()
+
+                job.status = ImportJobStatus.COMPLETED
+                job.finished_at = datetime.now(timezone.utc)
+                job.updated_at = job.finished_at
+                await db.commit()
+            except asyncio.CancelledError:
+                # Shutting down: hand the job back so the next sweep resumes it
+                await db.rollback()
+                job.status = ImportJobStatus.PENDING
+                await db.commit()
+                raise
             except Exception as e:
-                errors.append(
-                    f"Row {idx + 1} ('{row.get('title', 'N/A')}'): Validation or DB error: {e}")
-
-        try:
-            await db.commit()
-            return QuestionImportSummary(
-                total_rows_parsed=len(parsed_data),
-                new_questions_created=new_questions_created,
-                import_successful=True,
-                errors=errors
-            )
-        except Exception as e:
-            await db.rollback()
-            errors.append(f"Database commit failed: {e}")
-            return QuestionImportSummary(
-                total_rows_parsed=len(parsed_data),
-                new_questions_created=0,
-                import_successful=False,
-                errors=errors
-            )
+                logger.exception("Import job %s failed", job_id)
+                await db.rollback()
+                job.status = ImportJobStatus.FAILED
+                job.error_message = str(e)
+                job.finished_at = datetime.now(timezone.utc)
+                job.updated_at = job.finished_at
+                await db.commit()
+
+        await asyncio.to_thread(_remove_spooled_file, file_path)
+        logger.info("Import job %s finished", job_id)
+
+    # Start every job on this host that is pending or was left running by a stopped worker
+    async def resume_import_jobs(self, db: AsyncSession) -> int:
+        stale_before = datetime.now(timezone.utc) - timedelta(seconds=settings.QUESTION_IMPORT_STALE_SECONDS)
+        stmt = select(QuestionImportJob.id).where(_runnable_import_jobs(stale_before))
+        job_ids = (await db.execute(stmt)).scalars().all()
+        for job_id in job_ids:
+            start_import_job(job_id)
+        return len(job_ids)
     
     # Admin: Create Single Question (ADD THIS METHOD)
     async def create_question(self, db: AsyncSession, question_data: QuestionCreate) -> Question:
         """
         Manually creates a single Question record from the validated Pydantic model.
+        A question with identical content (see question_content_hash) is rejected.
         """
-        new_question = Question(**question_data.model_dump())
+        values = with_content_hash(question_data.model_dump())
+        await tag_cache.intern_question_rows([values])
+        stmt = (
+            pg_insert(Question)
+            .values(values)
+            .on_conflict_do_nothing(index_elements=[Question.content_hash])
+            .returning(Question)
+        )
+        new_question = (await db.execute(stmt)).scalars().first()
 
-        db.add(new_question)
+        if new_question is None:
+            existing_id = (await db.execute(
+                select(Question.id).where(Question.content_hash == values["content_hash"])
+            )).scalar()
+            await db.rollback()
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                                detail=f"An identical question already exists: {existing_id}")
 
         await db.commit()
-        await db.refresh(new_question)
-
+        question_facet_cache.clear()
         return new_question
 
-    # Admin: List, Filter, and Search Questions
-    async def list_questions(self, db: AsyncSession, filters: QuestionFilter) -> List[Question]:
-        stmt = select(Question)
+    # Commit a batch, or roll it all back when it is atomic and an item failed
+    async def _finish_batch(self, db: AsyncSession, mode: str, results: List[QuestionBatchItemResult],
+                            failed: Set[str]) -> QuestionBatchOut:
+        if mode == "atomic" and any(result.status in failed for result in results):
+            await db.rollback()
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                                detail=QuestionBatchOut(committed=False, results=results).model_dump(mode="json"))
+        try:
+            await db.commit()
+        except IntegrityError:
+            await db.rollback()
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                                detail="The batch conflicts with a concurrent change; nothing was saved.")
+        return QuestionBatchOut(committed=True, results=results)
+
+    # Admin: Create many questions in one transaction
+    async def create_questions_batch(self, db: AsyncSession, batch: QuestionBatchCreate) -> QuestionBatchOut:
+        rows = [with_content_hash(question.model_dump()) for question in batch.questions]
+        await tag_cache.intern_question_rows(rows)
+
+        # The first item with given content is inserted; later ones are duplicates
+        first_index: Dict[str, int] = {}
+        for index, row in enumerate(rows):
+            first_index.setdefault(row["content_hash"], index)
+        unique_rows = [rows[index] for index in first_index.values()]
+
+        # Multi-row INSERTs, chunked to stay under the bind-parameter limit
+        ids_by_hash: Dict[str, uuid.UUID] = {}
+        for start in range(0, len(unique_rows), settings.QUESTION_IMPORT_CHUNK_SIZE):
+            stmt = (
+                pg_insert(Question)
+                .values(unique_rows[start:start + settings.QUESTION_IMPORT_CHUNK_SIZE])
+                .on_conflict_do_nothing(index_elements=[Question.content_hash])
+                .returning(Question.content_hash, Question.id)
+            )
+            ids_by_hash.update((await db.execute(stmt)).tuples().all())
+        created = set(ids_by_hash)
+
+        existing_hashes = [content_hash for content_hash in first_index if content_hash not in created]
+        if existing_hashes:
+            stmt = select(Question.content_hash, Question.id).where(
+                Question.content_hash == any_(bindparam("hashes", existing_hashes, type_=PG_ARRAY(String))))
+            ids_by_hash.update((await db.execute(stmt)).tuples().all())
+
+        results = []
+        for index, row in enumerate(rows):
+            content_hash = row["content_hash"]
+            question_id = ids_by_hash.get(content_hash)
+            if first_index[content_hash] != index:
+                results.append(QuestionBatchItemResult(
+                    index=index, id=question_id, status="duplicate",
+                    detail=f"Same content as item {first_index[content_hash]}."))
+            elif content_hash in created:
+                results.append(QuestionBatchItemResult(index=index, id=question_id, status="created"))
+            else:
+                results.append(QuestionBatchItemResult(
+                    index=index, id=question_id, status="duplicate",
+                    detail="An identical question already exists."))
+
+        out = await self._finish_batch(db, batch.mode, results, failed={"duplicate"})
+        if created:
+            question_facet_cache.clear()
+        return out
+
+    # Admin: Update many questions in one transaction
+    async def update_questions_batch(self, db: AsyncSession, batch: QuestionBatchUpdate) -> QuestionBatchOut:
+        ids = [item.id for item in batch.questions]
+        stmt = select(Question.id, Question.content_hash, *(getattr(Question, field) for field in QUESTION_EDITABLE_FIELDS)).where(
+            Question.id == any_(bindparam("ids", ids, type_=PG_ARRAY(UUID(as_uuid=True)))))
+        current = {row["id"]: row for row in (await db.execute(stmt)).mappings()}
+
+        changes = [item.model_dump(exclude={"id"}, exclude_none=True) for item in batch.questions]
+        await tag_cache.intern_question_rows([change for change in changes if "tags" in change])
+
+        results: List[Optional[QuestionBatchItemResult]] = [None] * len(changes)
+        pending: Dict[int, Dict[str, Any]] = {}
+        seen_ids: Set[uuid.UUID] = set()
+        for index, (question_id, change) in enumerate(zip(ids, changes)):
+            if question_id in seen_ids:
+                results[index] = QuestionBatchItemResult(
+                    index=index, id=question_id, status="conflict", detail="Question appears more than once in the batch.")
+                continue
+            seen_ids.add(question_id)
+            old = current.get(question_id)
+            if old is None:
+                results[index] = QuestionBatchItemResult(index=index, id=question_id, status="not_found")
+                continue
+
+            new = {field: change.get(field, old[field]) for field in QUESTION_EDITABLE_FIELDS}
+            if all(new[field] == old[field] for field in QUESTION_EDITABLE_FIELDS):
+                results[index] = QuestionBatchItemResult(index=index, id=question_id, status="unchanged")
+                continue
+            new["id"] = question_id
+            new["content_hash"] = question_content_hash(new["title"], new["ques_type"], new["options"], new["correct_answers"])
+            new["version_bump"] = int(any(new[field] != old[field] for field in QUESTION_KEY_FIELDS))
+            pending[index] = new
+
+        # New content must not match another question, in the bank or in the batch
+        new_hashes = {new["content_hash"] for new in pending.values() if new["content_hash"] != current[new["id"]]["content_hash"]}
+        holders: Dict[str, uuid.UUID] = {}
+        if new_hashes:
+            stmt = select(Question.content_hash, Question.id).where(
+                Question.content_hash == any_(bindparam("hashes", list(new_hashes), type_=PG_ARRAY(String))))
+            holders = dict((await db.execute(stmt)).tuples().all())
+        for index, new in list(pending.items()):
+            holder = holders.setdefault(new["content_hash"], new["id"])
+            if holder != new["id"]:
+                results[index] = QuestionBatchItemResult(
+                    index=index, id=new["id"], status="conflict",
+                    detail=f"Question {holder} already has this content and answer key.")
+                del pending[index]
+
+        updated: Set[uuid.UUID] = set()
+        rejected = any(result is not None and result.status != "unchanged" for result in results)
+        if pending and not (batch.mode == "atomic" and rejected):
+            # UPDATE ... FROM (VALUES ...): one statement per chunk of rows
+            fields = ("id", "content_hash") + QUESTION_EDITABLE_FIELDS
+            new_rows = list(pending.values())
+            for start in range(0, len(new_rows), settings.QUESTION_IMPORT_CHUNK_SIZE):
+                batch_values = values(
+                    *(column(field, Question.__table__.c[field].type) for field in fields),
+                    column("version_bump", Integer),
+                    name="batch_values"
+                ).data([
+                    tuple(new[field] for field in fields) + (new["version_bump"],)
+                    for new in new_rows[start:start + settings.QUESTION_IMPORT_CHUNK_SIZE]
+                ])
+                stmt = (
+                    update(Question)
+                    .where(Question.id == batch_values.c.id)
+                    .values({
+                        **{field: batch_values.c[field] for field in fields if field != "id"},
+                        "version": Question.version + batch_values.c.version_bump,
+                    })
+                    .returning(Question.id)
+                    .execution_options(synchronize_session=False)
+                )
+                updated.update((await db.execute(stmt)).scalars().all())
+
+            for index, new in pending.items():
+                # Not returned: deleted since it was read
+                state = "updated" if new["id"] in updated else "not_found"
+                results[index] = QuestionBatchItemResult(index=index, id=new["id"], status=state)
+        else:
+            for index, new in pending.items():
+                results[index] = QuestionBatchItemResult(
+                    index=index, id=new["id"], status="unchanged", detail="Not saved: another item failed.")
+
+        out = await self._finish_batch(db, batch.mode, results, failed={"not_found", "conflict"})
+        for new in pending.values():
+            if new["version_bump"] and new["id"] in updated:
+                answer_key_cache.invalidate(new["id"])
+        if updated:
+            question_facet_cache.clear()
+            # Papers show titles, options and max_score
+            exam_paper_cache.clear()
+        return out
+
+    # Admin: Delete many questions that no exam or attempt uses, in one transaction
+    async def delete_questions_batch(self, db: AsyncSession, batch: QuestionBatchDelete) -> QuestionBatchOut:
+        unique_ids = list(dict.fromkeys(batch.ids))
+        id_array = bindparam("ids", unique_ids, type_=PG_ARRAY(UUID(as_uuid=True)))
+        in_use = or_(
+            exists().where(AttemptAnswer.question_id == Question.id),
+            exists().where(Question.id == any_(Exam.questions_order))
+        )
+
+        stmt = select(Question.id, in_use).where(Question.id == any_(id_array))
+        in_use_by_id = dict((await db.execute(stmt)).tuples().all())
+        outcome = {
+            question_id: "not_found" if question_id not in in_use_by_id
+            else "in_use" if in_use_by_id[question_id] else "deleted"
+            for question_id in unique_ids
+        }
+
+        deleted: Set[uuid.UUID] = set()
+        if batch.mode == "best_effort" or all(state == "deleted" for state in outcome.values()):
+            # in_use is checked again so a question picked up meanwhile is kept
+            stmt = (
+                delete(Question)
+                .where(Question.id == any_(id_array), ~in_use)
+                .returning(Question.id)
+                .execution_options(synchronize_session=False)
+            )
+            deleted = set((await db.execute(stmt)).scalars().all())
+            for question_id, state in outcome.items():
+                if state == "deleted" and question_id not in deleted:
+                    outcome[question_id] = "in_use"
+
+        results = [
+            QuestionBatchItemResult(
+                index=index, id=question_id, status=outcome[question_id],
+                detail="Used by an exam or a submitted answer." if outcome[question_id] == "in_use" else None)
+            for index, question_id in enumerate(batch.ids)
+        ]
+        out = await self._finish_batch(db, batch.mode, results, failed={"not_found", "in_use"})
+        for question_id in deleted:
+            answer_key_cache.invalidate(question_id)
+        if deleted:
+            question_facet_cache.clear()
+        return out
+
+    # WHERE clauses for a QuestionFilter, plus (rank, snippet) columns when searching
+    async def _question_filter_clauses(self, db: AsyncSession, filters: QuestionFilter) -> Tuple[list, Optional[Tuple[Any, Any]]]:
+        clauses = []
 
         if filters.ques_type:
-            stmt = stmt.where(Question.ques_type == filters.ques_type)
+            clauses.append(Question.ques_type == filters.ques_type)
 
         if filters.complexity:
-            stmt = stmt.where(Question.complexity == filters.complexity)
+            clauses.append(Question.complexity == filters.complexity)
 
         if filters.tags:
-            for tag in filters.tags:
-                stmt = stmt.where(Question.tags.contains([tag]))
-
-        if filters.search_term:
-            search = f"%{filters.search_term}%"
-            stmt = stmt.where(
-                or_(
-                    Question.title.ilike(search),
-                    Question.complexity.ilike(search)
-                )
-            )
+            # @> / && on the GIN-indexed tag_ids array; unknown tag names match nothing
+            names = {normalize_tag(name).lower() for name in filters.tags} - {""}
+            ids_by_name = await tag_cache.lookup(db, names)
+            tag_ids = pg_array(sorted(ids_by_name.values()), type_=Integer)
+            if filters.tag_mode == "any":
+                clauses.append(Question.tag_ids.op("&&")(tag_ids) if ids_by_name else false())
+            else:
+                clauses.append(Question.tag_ids.op("@>")(tag_ids) if len(ids_by_name) == len(names) else false())
+
+        search_term = (filters.search_term or "").strip()
+        if not search_term:
+            return clauses, None
+
+        # Served by the GIN index on search_vector and the trigram index on title
+        query_text = build_prefix_tsquery(search_term)
+        matches = []
+        rank = literal(0.0)
+        snippet = Question.title
+        if query_text:
+            ts_query = func.to_tsquery(QUESTION_SEARCH_CONFIG, query_text)
+            matches.append(Question.search_vector.op("@@")(ts_query))
+            rank = func.ts_rank_cd(Question.search_vector, ts_query)
+            snippet = func.ts_headline(
+                QUESTION_SEARCH_CONFIG, Question.title, ts_query,
+                "StartSel=<mark>, StopSel=</mark>, HighlightAll=true")
+        if filters.fuzzy:
+            matches.append(Question.title.ilike(f"%{escape_like(search_term)}%", escape="\\"))
+            matches.append(Question.title.op("%>")(search_term))
+            rank = rank + func.word_similarity(search_term, Question.title)
+
+        clauses.append(or_(*matches) if matches else false())
+        return clauses, (rank.label("rank"), snippet.label("snippet"))
+
+    # Admin: List, Filter, and Search Questions (one keyset page at a time)
+    async def list_questions(self, db: AsyncSession, filters: QuestionFilter, page: QuestionPageParams) -> QuestionPageOut:
+        clauses, search_columns = await self._question_filter_clauses(db, filters)
+        if search_columns is None:
+            rank = snippet = None
+        else:
+            rank, snippet = search_columns
 
-        result = await db.execute(stmt)
-        return result.scalars().all()
+        summary = page.fields == "summary"
+        columns = QUESTION_SUMMARY_COLUMNS if summary else QUESTION_FULL_COLUMNS
+        out_model = QuestionSummaryOut if summary else QuestionSearchOut
+
+        stmt = select(*columns).where(*clauses)
+        if rank is not None:
+            stmt = stmt.add_columns(rank, snippet)
+
+        # Stable order: by id, or by relevance then id when searching
+        if page.cursor:
+            try:
+                position = decode_cursor(page.cursor)
+                after_id = uuid.UUID(position["id"])
+                after_rank = float(position["rank"]) if rank is not None else None
+            except (ValueError, KeyError, TypeError) as e:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid cursor: {e}")
+            if rank is None:
+                stmt = stmt.where(Question.id > after_id)
+            else:
+                stmt = stmt.where(or_(
+                    rank.element < after_rank,
+                    and_(rank.element == after_rank, Question.id > after_id)
+                ))
+        if rank is None:
+            stmt = stmt.order_by(Question.id)
+        else:
+            stmt = stmt.order_by(rank.desc(), Question.id)
+
+        # One extra row tells whether there is a next page
+        rows = (await db.execute(stmt.limit(page.limit + 1))).mappings().all()
+        next_cursor = None
+        if len(rows) > page.limit:
+            rows = rows[:page.limit]
+            last = rows[-1]
+            position = {"id": str(last["id"])}
+            if rank is not None:
+                position["rank"] = last["rank"]
+            next_cursor = encode_cursor(position)
+
+        items = []
+        await tag_cache.ensure_ids(db, {tag_id for row in rows for tag_id in row["tag_ids"]})
+        for row in rows:
+            item = dict(row)
+            item["tags"] = tag_cache.names_for(item.pop("tag_ids"))
+            items.append(out_model.model_validate(item))
+
+        total = None
+        if page.include_total:
+            total = (await db.execute(
+                select(func.count()).select_from(Question).where(*clauses)
+            )).scalar_one()
+
+        return QuestionPageOut(
+            items=items,
+            next_cursor=next_cursor,
+            total=total
+        )
+
+    # Admin: Question counts per tag, complexity and type for a filter
+    async def get_question_facets(self, db: AsyncSession, filters: QuestionFilter) -> QuestionFacetsOut:
+        cache_key = filters.model_dump_json()
+        facets = question_facet_cache.get(cache_key)
+        if facets is not None:
+            return facets
+
+        clauses, _ = await self._question_filter_clauses(db, filters)
+        matched = (
+            select(Question.tag_ids, Question.complexity, Question.ques_type)
+            .where(*clauses)
+            .cte("matched")
+        )
+        tag = func.unnest(matched.c.tag_ids).column_valued("tag_id")
+        # One round trip: every facet is a branch of the same UNION ALL over the CTE
+        stmt = union_all(
+            select(literal("total").label("facet"), literal(None, String).label("value"), func.count().label("count"))
+            .select_from(matched),
+            select(literal("tags"), cast(tag, String), func.count())
+            .select_from(matched).group_by(tag),
+            select(literal("complexity"), matched.c.complexity, func.count())
+            .select_from(matched).group_by(matched.c.complexity),
+            select(literal("ques_type"), matched.c.ques_type, func.count())
+            .select_from(matched).group_by(matched.c.ques_type),
+        )
+
+        facets = QuestionFacetsOut(total=0)
+        tag_counts: Dict[int, int] = {}
+        for facet, value, count in (await db.execute(stmt)).all():
+            if facet == "total":
+                facets.total = count
+            elif facet == "tags":
+                tag_counts[int(value)] = count
+            elif value is not None:
+                getattr(facets, facet)[value] = count
+
+        await tag_cache.ensure_ids(db, tag_counts)
+        facets.tags = dict(zip(tag_cache.names_for(tag_counts), tag_counts.values()))
+
+        question_facet_cache.set(cache_key, facets)
+        return facets
 
     # Admin: Get Single Question
     async def get_question_by_id(self, db: AsyncSession, question_id: uuid.UUID) -> Question:
@@ -163,8 +595,35 @@ class ExamService:
         if not question:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Question not found.")
+        # Question.tags resolves names through the tag cache
+        await tag_cache.ensure_ids(db, question.tag_ids)
         return question
     
+    # Admin: Fix a question's answer key (existing results are fixed by a regrade)
+    async def update_answer_key(self, db: AsyncSession, question_id: uuid.UUID, key_data: QuestionAnswerKeyUpdate) -> Question:
+        question = await self.get_question_by_id(db, question_id)
+
+        question.correct_answers = key_data.correct_answers
+        if key_data.max_score is not None:
+            question.max_score = key_data.max_score
+        # New version so no cached compiled key for the old answers is used
+        question.version = question.version + 1
+        question.content_hash = question_content_hash(
+            question.title, question.ques_type, question.options, question.correct_answers)
+
+        try:
+            await db.commit()
+        except IntegrityError:
+            await db.rollback()
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                                detail="Another question already has this content and answer key.")
+        answer_key_cache.invalidate(question_id)
+        question_facet_cache.clear()
+        if key_data.max_score is not None:
+            # Papers show max_score; we don't track which exams use the question
+            exam_paper_cache.clear()
+        return question
+
     # Admin: Create Exam
     async def create_exam(self, db: AsyncSession, exam_data: ExamCreate) -> Exam:
         if exam_data.start_time >= exam_data.end_time:
@@ -194,6 +653,100 @@ class ExamService:
         await db.refresh(new_exam)
         return new_exam
     
+    # Draw `section.count` random question ids for one blueprint section
+    async def _sample_section(self, db: AsyncSession, section: BlueprintSection, exclude: Set[uuid.UUID],
+                              recent_question_ids, rng: random.Random) -> List[uuid.UUID]:
+        clauses, _ = await self._question_filter_clauses(db, QuestionFilter(
+            complexity=section.complexity, ques_type=section.ques_type, tags=section.tags))
+        if recent_question_ids is not None:
+            clauses.append(Question.id.notin_(recent_question_ids))
+
+        picked: List[uuid.UUID] = []
+        seen = set(exclude)
+
+        # Question ids are uniformly random UUIDs, so "first matching id at or
+        # after a random UUID" is a random question. Each probe is one seek on
+        # an index ending in id (see ix_questions_complexity_type_id); all
+        # probes of a round run as a single LATERAL query.
+        for _ in range(BLUEPRINT_SAMPLE_ROUNDS):
+            needed = section.count - len(picked)
+            pivots = [uuid.UUID(int=rng.getrandbits(128))
+                      for _ in range(needed * BLUEPRINT_OVERSAMPLE + 8)]
+            pivot_table = select(
+                func.unnest(bindparam("pivots", pivots, type_=PG_ARRAY(UUID(as_uuid=True)))).label("pivot")
+            ).subquery("pivots")
+            probe = (
+                select(Question.id)
+                .where(*clauses, Question.id >= pivot_table.c.pivot)
+                .order_by(Question.id)
+                .limit(1)
+                .lateral("probe")
+            )
+            stmt = select(probe.c.id).select_from(pivot_table).join(probe, true())
+
+            for question_id in (await db.execute(stmt)).scalars():
+                if question_id not in seen:
+                    seen.add(question_id)
+                    picked.append(question_id)
+                    if len(picked) == section.count:
+                        return picked
+
+        # Probes keep landing on taken ids (a small pool, or one mostly
+        # excluded): read the ids at and after one random pivot, wrapping
+        # around, as a single index range of at most `window` rows. Anything
+        # taken is already in `seen`, so the window holds the needed ids
+        # unless the whole pool is smaller than it.
+        needed = section.count - len(picked)
+        window = needed * BLUEPRINT_OVERSAMPLE + len(seen)
+        pivot = uuid.UUID(int=rng.getrandbits(128))
+        stmt = select(Question.id).where(*clauses, Question.id >= pivot).order_by(Question.id).limit(window)
+        candidates = list((await db.execute(stmt)).scalars())
+        if len(candidates) < window:
+            stmt = (select(Question.id).where(*clauses, Question.id < pivot)
+                    .order_by(Question.id).limit(window - len(candidates)))
+            candidates.extend((await db.execute(stmt)).scalars())
+
+        remaining = [q_id for q_id in candidates if q_id not in seen]
+        if len(remaining) < needed:
+            return picked + remaining
+        return picked + rng.sample(remaining, needed)
+
+    # Admin: Generate a draft exam from a blueprint of random question sections
+    async def generate_exam(self, db: AsyncSession, blueprint: ExamGenerate) -> Exam:
+        if blueprint.start_time >= blueprint.end_time:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                detail="Start time must be before end time.")
+
+        recent_question_ids = None
+        if blueprint.avoid_recent_days:
+            since = datetime.now(timezone.utc) - timedelta(days=blueprint.avoid_recent_days)
+            recent_question_ids = select(func.unnest(Exam.questions_order)).where(Exam.start_time >= since)
+
+        rng = random.Random()
+        questions_order: List[uuid.UUID] = []
+        chosen: Set[uuid.UUID] = set()
+        for number, section in enumerate(blueprint.sections, start=1):
+            picked = await self._sample_section(db, section, chosen, recent_question_ids, rng)
+            if len(picked) < section.count:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Section {number} needs {section.count} questions but only {len(picked)} match.")
+            questions_order.extend(picked)
+            chosen.update(picked)
+
+        new_exam = Exam(
+            title=blueprint.title,
+            start_time=blueprint.start_time,
+            end_time=blueprint.end_time,
+            duration_minutes=blueprint.duration_minutes,
+            questions_order=questions_order,
+            status=ExamStatus.DRAFT
+        )
+        db.add(new_exam)
+        await db.commit()
+        await db.refresh(new_exam)
+        return new_exam
+
     # Admin: Update Exam (including publish/unpublish)
     async def update_exam(self, db: AsyncSession, exam_id: uuid.UUID, update_data: ExamUpdate) -> Exam:
         stmt = select(Exam).where(Exam.id == exam_id)
@@ -225,6 +778,7 @@ class ExamService:
         db.add(exam)
         await db.commit()
         await db.refresh(exam)
+        exam_paper_cache.invalidate(exam_id)
         return exam
     
     # Student: View Available Exams
@@ -256,3 +810,94 @@ class ExamService:
                 status_code=status.HTTP_404_NOT_FOUND, detail="Exam not found.")
         return exam
 
+    # Build an exam paper (questions without answer keys) with a single query
+    async def _build_exam_paper(self, db: AsyncSession, exam_id: uuid.UUID) -> ExamPaper:
+        stmt = (
+            select(Exam, Question)
+            .outerjoin(Question, Question.id == any_(Exam.questions_order))
+            .options(load_only(Question.id, Question.title, Question.ques_type,
+                               Question.options, Question.max_score))
+            .where(Exam.id == exam_id)
+        )
+        rows = (await db.execute(stmt)).all()
+        if not rows:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Exam not found.")
+
+        exam = rows[0][0]
+        questions = {question.id: question for _, question in rows if question is not None}
+        paper = ExamPaperOut(
+            exam_id=exam.id,
+            title=exam.title,
+            start_time=exam.start_time,
+            end_time=exam.end_time,
+            duration_minutes=exam.duration_minutes,
+            questions=[
+                PaperQuestionOut.model_validate(questions[q_id])
+                for q_id in (exam.questions_order or []) if q_id in questions
+            ]
+        )
+        return ExamPaper(paper, is_published=exam.status == ExamStatus.PUBLISHED)
+
+    # Cached exam paper without availability checks (answer relabeling, grading)
+    async def get_cached_paper(self, db: AsyncSession, exam_id: uuid.UUID) -> ExamPaper:
+        return await exam_paper_cache.get_or_build(
+            exam_id, lambda: self._build_exam_paper(db, exam_id))
+
+    # Student: Get the exam paper, served from the in-process cache
+    async def get_exam_paper(self, db: AsyncSession, exam_id: uuid.UUID) -> ExamPaper:
+        paper = await self.get_cached_paper(db, exam_id)
+
+        now = datetime.now(timezone.utc)
+        if not paper.is_published or now < paper.start_time:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN, detail="Exam is not available yet.")
+        return paper
+
+
+# Jobs this host can run: pending, or left running by a worker that stopped
+# committing chunks, and spooled where this host can read them
+def _runnable_import_jobs(stale_before: datetime):
+    return and_(
+        or_(
+            QuestionImportJob.status == ImportJobStatus.PENDING,
+            and_(QuestionImportJob.status == ImportJobStatus.RUNNING,
+                 QuestionImportJob.updated_at < stale_before)
+        ),
+        # Jobs queued before hosts were recorded can run anywhere
+        or_(QuestionImportJob.spool_host == settings.QUESTION_IMPORT_HOST,
+            QuestionImportJob.spool_host.is_(None))
+    )
+
+
+def _remove_spooled_file(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def start_import_job(job_id: uuid.UUID) -> None:
+    task = asyncio.create_task(ExamService().run_import_job(job_id))
+    _import_tasks.add(task)
+    task.add_done_callback(_import_tasks.discard)
+
+
+async def stop_import_jobs() -> None:
+    """Cancel running import jobs; each hands itself back as PENDING."""
+    tasks = list(_import_tasks)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def run_import_job_sweeper(interval: float) -> None:
+    """Background loop that resumes interrupted import jobs every `interval` seconds."""
+    exam_service = ExamService()
+    while True:
+        try:
+            async with async_session() as db:
+                await exam_service.resume_import_jobs(db)
+        except Exception:
+            logger.exception("Import job sweep failed")
+        await asyncio.sleep(interval)
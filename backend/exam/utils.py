@@ -0,0 +1,728 @@
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import random
+import re
+import shutil
+import uuid
+from collections import OrderedDict
+from typing import IO, Any, Awaitable, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+from openpyxl import load_workbook
+from pydantic import ValidationError
+from pydantic_core import to_json
+from sqlalchemy import case, func, literal_column, or_
+from sqlalchemy.dialects.postgresql import Insert, insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from conf.cache import LRUCache
+from conf.config import settings
+from conf.database import async_session
+from .models import Question, Tag
+from .schemas import ExamPaperOut, PaperQuestionOut, QuestionBase
+
+OBJECTIVE_QUESTION_TYPES = ("single_choice", "multiple_choice")
+
+# Mask returned for answers that select an option the key does not know;
+# it can never equal a compiled correct mask
+INVALID_MASK = -1
+
+
+def normalize_tag(name: Any) -> str:
+    return " ".join(str(name).split())
+
+
+class TagCache:
+    """
+    In-process map between tag names and interned tag ids.
+
+    The tags table is append-only and an id's name never changes, so cached
+    entries never go stale; a miss costs one query and is remembered.
+    Names match ignoring case and surrounding/repeated whitespace.
+    """
+
+    def __init__(self) -> None:
+        self._ids: Dict[str, int] = {}
+        self._names: Dict[int, str] = {}
+
+    def _remember(self, rows: Iterable[Tuple[int, str]]) -> None:
+        for tag_id, name in rows:
+            self._ids[name.lower()] = tag_id
+            self._names[tag_id] = name
+
+    def names_for(self, tag_ids: Iterable[int]) -> List[str]:
+        return [self._names.get(tag_id, str(tag_id)) for tag_id in tag_ids]
+
+    async def ensure_ids(self, db: AsyncSession, tag_ids: Iterable[int]) -> None:
+        """Load the names of any uncached ids, so names_for() can resolve them."""
+        missing = {tag_id for tag_id in tag_ids if tag_id not in self._names}
+        if missing:
+            result = await db.execute(select(Tag.id, Tag.name).where(Tag.id.in_(missing)))
+            self._remember(result.all())
+
+    async def lookup(self, db: AsyncSession, names: Iterable[str]) -> Dict[str, int]:
+        """Ids of existing tags by lower-cased name; unknown names are left out."""
+        keys = {normalize_tag(name).lower() for name in names} - {""}
+        missing = [key for key in keys if key not in self._ids]
+        if missing:
+            result = await db.execute(
+                select(Tag.id, Tag.name).where(func.lower(Tag.name).in_(missing)))
+            self._remember(result.all())
+        return {key: self._ids[key] for key in keys if key in self._ids}
+
+    async def intern(self, names: Iterable[str]) -> Dict[str, int]:
+        """
+        Ids for the given names, creating missing tags. New tags are committed
+        in their own transaction so a later rollback of the caller cannot
+        leave ids in the cache that do not exist.
+        """
+        names = [normalize_tag(name) for name in names]
+        new_names: Dict[str, str] = {}
+        for name in names:
+            if name and name.lower() not in self._ids:
+                new_names.setdefault(name.lower(), name)
+
+        if new_names:
+            insert_stmt = pg_insert(Tag).values([{"name": name} for name in new_names.values()])
+            # No-op update so existing rows are returned too
+            stmt = insert_stmt.on_conflict_do_update(
+                index_elements=[func.lower(Tag.name)],
+                set_={"name": Tag.name}
+            ).returning(Tag.id, Tag.name)
+            async with async_session() as tag_db:
+                result = await tag_db.execute(stmt)
+                rows = result.all()
+                await tag_db.commit()
+            self._remember(rows)
+
+        return {name.lower(): self._ids[name.lower()] for name in names if name}
+
+    async def intern_question_rows(self, questions: List[Dict[str, Any]]) -> None:
+        """Replace each row's 'tags' names with 'tag_ids', interning the whole batch at once."""
+        ids = await self.intern(name for question in questions for name in question.get("tags") or [])
+        for question in questions:
+            tag_ids = []
+            for name in question.pop("tags", None) or []:
+                tag_id = ids.get(normalize_tag(name).lower())
+                if tag_id is not None and tag_id not in tag_ids:
+                    tag_ids.append(tag_id)
+            question["tag_ids"] = tag_ids
+
+
+class CompiledQuestionKey:
+    """
+    Answer key of one objective question compiled to an option bitmask.
+
+    Every option (and every key listed in correct_answers) gets a bit, so
+    grading a selection is a few dict lookups and one integer comparison
+    instead of building two sets per answer.
+    """
+
+    __slots__ = ("question_id", "version", "ques_type", "max_score", "option_bits", "correct_mask")
+
+    def __init__(self, question_id: uuid.UUID, version: int, ques_type: str, max_score: int,
+                 option_bits: Dict[Any, int], correct_mask: int) -> None:
+        self.question_id = question_id
+        self.version = version
+        self.ques_type = ques_type
+        self.max_score = max_score
+        self.option_bits = option_bits
+        self.correct_mask = correct_mask
+
+    @property
+    def is_objective(self) -> bool:
+        return self.ques_type in OBJECTIVE_QUESTION_TYPES
+
+    def encode(self, student_answer: Optional[Mapping[str, Any]]) -> int:
+        """Encode a student's 'selected_options' as a bitmask."""
+        selected = student_answer.get("selected_options", []) if isinstance(student_answer, Mapping) else []
+        if not isinstance(selected, list):
+            # A string would otherwise be read as a selection of its characters
+            return INVALID_MASK
+        option_bits = self.option_bits
+        mask = 0
+        try:
+            for option in selected:
+                bit = option_bits.get(option)
+                if bit is None:
+                    return INVALID_MASK
+                mask |= bit
+        except TypeError:
+            # Unhashable option, e.g. a nested list
+            return INVALID_MASK
+        return mask
+
+    def grade_mask(self, mask: int) -> float:
+        return self.max_score if mask == self.correct_mask else 0.0
+
+    def grade(self, student_answer: Optional[Mapping[str, Any]]) -> Optional[float]:
+        """Score an answer, or None if the question is not auto-gradable."""
+        if not self.is_objective:
+            return None
+        return self.grade_mask(self.encode(student_answer))
+
+
+def is_valid_selection(student_answer: Mapping[str, Any]) -> bool:
+    """
+    Whether an answer's 'selected_options', if given, is a list of option
+    labels. Anything else is scored as wrong by both graders, so it is
+    refused when saved rather than silently graded 0.
+    """
+    selected = student_answer.get("selected_options", [])
+    return isinstance(selected, list) and all(isinstance(option, str) for option in selected)
+
+
+def compile_question_key(question: Question) -> CompiledQuestionKey:
+    correct = (question.correct_answers or {}).get("selected_options", [])
+    option_bits: Dict[Any, int] = {}
+    for option in list(question.options or {}) + list(correct):
+        if option not in option_bits:
+            option_bits[option] = 1 << len(option_bits)
+
+    correct_mask = 0
+    for option in correct:
+        correct_mask |= option_bits[option]
+
+    return CompiledQuestionKey(
+        question_id=question.id,
+        version=question.version,
+        ques_type=question.ques_type,
+        max_score=question.max_score,
+        option_bits=option_bits,
+        correct_mask=correct_mask,
+    )
+
+
+class AnswerKeyCache:
+    """
+    Bounded LRU of compiled answer keys keyed by (question id, version).
+
+    A question whose key changes gets a new version, so stale entries are
+    never served; they simply age out.
+    """
+
+    def __init__(self, max_size: int = 50000) -> None:
+        self.max_size = max_size
+        self._keys: "OrderedDict[Tuple[uuid.UUID, int], CompiledQuestionKey]" = OrderedDict()
+
+    def get(self, question_id: uuid.UUID, version: int) -> Optional[CompiledQuestionKey]:
+        key = self._keys.get((question_id, version))
+        if key is not None:
+            self._keys.move_to_end((question_id, version))
+        return key
+
+    def put(self, compiled: CompiledQuestionKey) -> None:
+        self._keys[(compiled.question_id, compiled.version)] = compiled
+        self._keys.move_to_end((compiled.question_id, compiled.version))
+        while len(self._keys) > self.max_size:
+            self._keys.popitem(last=False)
+
+    def invalidate(self, question_id: uuid.UUID) -> None:
+        for cache_key in [k for k in self._keys if k[0] == question_id]:
+            del self._keys[cache_key]
+
+    async def get_many(self, db: AsyncSession, versions: Mapping[uuid.UUID, int]) -> Dict[uuid.UUID, CompiledQuestionKey]:
+        """
+        Compiled keys for the given {question_id: version}. Misses are loaded
+        with a single query and compiled once.
+        """
+        compiled: Dict[uuid.UUID, CompiledQuestionKey] = {}
+        missing: List[uuid.UUID] = []
+        for question_id, version in versions.items():
+            key = self.get(question_id, version)
+            if key is None:
+                missing.append(question_id)
+            else:
+                compiled[question_id] = key
+
+        if missing:
+            # populate_existing fills in a Question already loaded with load_only()
+            result = await db.execute(
+                select(Question)
+                .where(Question.id.in_(missing))
+                .execution_options(populate_existing=True)
+            )
+            for question in result.scalars().all():
+                key = compile_question_key(question)
+                self.put(key)
+                compiled[question.id] = key
+
+        return compiled
+
+
+def build_grading_table(keys: Mapping[uuid.UUID, CompiledQuestionKey]) -> Dict[uuid.UUID, Tuple[Dict[Any, int], int, int]]:
+    # Flattened (option_bits, correct_mask, max_score) per objective question,
+    # so the hot loop below does no attribute lookups or method calls
+    return {
+        q_id: (key.option_bits, key.correct_mask, key.max_score)
+        for q_id, key in keys.items() if key.is_objective
+    }
+
+
+def _grade_with_table(
+    table: Mapping[uuid.UUID, Tuple[Dict[Any, int], int, int]],
+    answers: Mapping[uuid.UUID, Optional[Mapping[str, Any]]],
+) -> Tuple[Dict[uuid.UUID, float], float]:
+    scores: Dict[uuid.UUID, float] = {}
+    total = 0.0
+    for question_id, student_answer in answers.items():
+        entry = table.get(question_id)
+        if entry is None:
+            continue
+        option_bits, correct_mask, max_score = entry
+
+        # Same reading of the answer as CompiledQuestionKey.encode()
+        selected = student_answer.get("selected_options", []) if isinstance(student_answer, Mapping) else []
+        mask = 0
+        if not isinstance(selected, list):
+            mask = INVALID_MASK
+        else:
+            try:
+                for option in selected:
+                    bit = option_bits.get(option)
+                    if bit is None:
+                        mask = INVALID_MASK
+                        break
+                    mask |= bit
+            except TypeError:
+                mask = INVALID_MASK
+
+        if mask == correct_mask:
+            scores[question_id] = max_score
+            total += max_score
+        else:
+            scores[question_id] = 0.0
+    return scores, total
+
+
+def grade_attempt(
+    keys: Mapping[uuid.UUID, CompiledQuestionKey],
+    answers: Mapping[uuid.UUID, Optional[Mapping[str, Any]]],
+) -> Tuple[Dict[uuid.UUID, float], float]:
+    """
+    Grade one attempt's {question_id: student_answer}. Returns the scores of
+    the auto-graded answers and their total.
+    """
+    return _grade_with_table(build_grading_table(keys), answers)
+
+
+def grade_attempts_with_table(
+    table: Mapping[uuid.UUID, Tuple[Dict[Any, int], int, int]],
+    attempts: Iterable[Tuple[Any, Mapping[uuid.UUID, Optional[Mapping[str, Any]]]]],
+) -> Dict[Any, Tuple[Dict[uuid.UUID, float], float]]:
+    """
+    Grade a batch of (attempt_id, answers) pairs against a table from
+    build_grading_table(). Plain data in and out, so it can run in a worker process.
+    """
+    return {
+        attempt_id: _grade_with_table(table, answers)
+        for attempt_id, answers in attempts
+    }
+
+
+def grade_attempts(
+    keys: Mapping[uuid.UUID, CompiledQuestionKey],
+    attempts: Iterable[Tuple[Any, Mapping[uuid.UUID, Optional[Mapping[str, Any]]]]],
+) -> Dict[Any, Tuple[Dict[uuid.UUID, float], float]]:
+    """Grade a batch of (attempt_id, answers) pairs against one exam's keys."""
+    return grade_attempts_with_table(build_grading_table(keys), attempts)
+
+
+def question_permutation(seed: int, count: int) -> List[int]:
+    """Order in which an attempt with `seed` sees the exam's questions."""
+    order = list(range(count))
+    random.Random(seed).shuffle(order)
+    return order
+
+
+def option_permutation(seed: int, question_id: uuid.UUID, count: int) -> List[int]:
+    """
+    Option order of one question for an attempt: display slot i shows the
+    option at position order[i]. Seeded per question, so it does not depend
+    on where the question lands in the shuffled paper.
+    """
+    order = list(range(count))
+    random.Random(f"{seed}:{question_id}").shuffle(order)
+    return order
+
+
+class PaperQuestion:
+    """One question of a paper as pre-serialized JSON fragments."""
+
+    __slots__ = ("id", "head", "option_keys", "key_parts", "value_parts", "shuffle_options")
+
+    def __init__(self, question: PaperQuestionOut) -> None:
+        self.id = question.id
+        # Everything up to the options object; options is the last field
+        head = question.model_copy(update={"options": {}}).model_dump_json().encode()
+        self.head = head[:-2]
+        self.option_keys = list(question.options)
+        self.key_parts = [to_json(key) + b":" for key in self.option_keys]
+        self.value_parts = [to_json(value) for value in question.options.values()]
+        self.shuffle_options = question.ques_type in OBJECTIVE_QUESTION_TYPES
+
+    def render(self, seed: Optional[int]) -> bytes:
+        count = len(self.option_keys)
+        if seed is None or not self.shuffle_options:
+            order = range(count)
+        else:
+            order = option_permutation(seed, self.id, count)
+        # Labels stay in place; the option texts move between them
+        options = b",".join(self.key_parts[slot] + self.value_parts[order[slot]] for slot in range(count))
+        return self.head + options + b"}}"
+
+    def relabel(self, seed: int, student_answer: Optional[Mapping[str, Any]], to_display: bool) -> Optional[Mapping[str, Any]]:
+        """Translate an answer's selected_options between display and stored labels."""
+        if not self.shuffle_options or not isinstance(student_answer, Mapping):
+            return student_answer
+        selected = student_answer.get("selected_options")
+        if not isinstance(selected, list):
+            return student_answer
+
+        keys = self.option_keys
+        order = option_permutation(seed, self.id, len(keys))
+        if to_display:
+            mapping = {keys[order[slot]]: keys[slot] for slot in range(len(keys))}
+        else:
+            mapping = {keys[slot]: keys[order[slot]] for slot in range(len(keys))}
+        # Unknown labels pass through and grade as wrong
+        return {**student_answer, "selected_options": [
+            mapping.get(option, option) if isinstance(option, str) else option for option in selected
+        ]}
+
+
+class ExamPaper:
+    """
+    A student exam paper serialized once, with its strong ETag.
+
+    Kept as JSON fragments too, so a per-attempt shuffled copy is a
+    permutation and a join of bytes rather than a new serialization.
+    """
+
+    __slots__ = ("head", "questions", "_index", "body", "etag", "is_published", "start_time", "end_time")
+
+    def __init__(self, paper: ExamPaperOut, is_published: bool) -> None:
+        # Everything up to the questions array; questions is the last field
+        head = paper.model_copy(update={"questions": []}).model_dump_json().encode()
+        self.head = head[:-2]
+        self.questions = [PaperQuestion(question) for question in paper.questions]
+        self._index = {question.id: question for question in self.questions}
+        self.body = self.render(None)
+        self.etag = f'"{hashlib.sha256(self.body).hexdigest()[:32]}"'
+        self.is_published = is_published
+        self.start_time = paper.start_time
+        self.end_time = paper.end_time
+
+    def render(self, seed: Optional[int]) -> bytes:
+        """The paper as JSON; shuffled for an attempt's seed, canonical for None."""
+        if seed is None:
+            order = range(len(self.questions))
+        else:
+            order = question_permutation(seed, len(self.questions))
+        questions = b",".join(self.questions[position].render(seed) for position in order)
+        return self.head + questions + b"]}"
+
+    def attempt_etag(self, seed: Optional[int]) -> str:
+        if seed is None:
+            return self.etag
+        return f'"{self.etag[1:17]}-{seed:x}"'
+
+    def relabel_answers(self, seed: Optional[int], answers: Mapping[uuid.UUID, Any], to_display: bool) -> Dict[uuid.UUID, Any]:
+        """Map {question_id: student_answer} between an attempt's display labels and stored labels."""
+        if seed is None:
+            return dict(answers)
+        relabeled = {}
+        for question_id, student_answer in answers.items():
+            question = self._index.get(question_id)
+            relabeled[question_id] = (
+                question.relabel(seed, student_answer, to_display) if question else student_answer
+            )
+        return relabeled
+
+
+class ExamPaperCache:
+    """
+    In-process cache of serialized exam papers keyed by exam id.
+
+    Builds are single-flight per exam: when every student opens the paper at
+    exam start, one request queries the database and the rest wait for it.
+    """
+
+    def __init__(self, max_size: int, ttl: Optional[float] = None) -> None:
+        self._papers = LRUCache(max_size, ttl)
+        self._locks: Dict[uuid.UUID, asyncio.Lock] = {}
+
+    async def get_or_build(self, exam_id: uuid.UUID, build: Callable[[], Awaitable[ExamPaper]]) -> ExamPaper:
+        paper = self._papers.get(exam_id)
+        if paper is not None:
+            return paper
+
+        lock = self._locks.setdefault(exam_id, asyncio.Lock())
+        try:
+            async with lock:
+                # Another request may have built it while we waited
+                paper = self._papers.get(exam_id)
+                if paper is None:
+                    paper = await build()
+                    self._papers.set(exam_id, paper)
+                return paper
+        finally:
+            if not lock.locked() and self._locks.get(exam_id) is lock:
+                del self._locks[exam_id]
+
+    def invalidate(self, exam_id: uuid.UUID) -> None:
+        self._papers.pop(exam_id)
+
+    def clear(self) -> None:
+        self._papers.clear()
+
+    def metrics(self) -> Dict[str, Any]:
+        return self._papers.metrics()
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match check (weak comparison, as RFC 9110 requires for it)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def question_content_hash(title: Any, ques_type: Any, options: Any, correct_answers: Any) -> str:
+    """
+    SHA-256 of a question's normalized content. Whitespace and case in the
+    title, key order in the JSON fields and the order of selected_options in
+    the answer key do not change the hash.
+    """
+    answers = dict(correct_answers or {})
+    selected = answers.get("selected_options")
+    if isinstance(selected, list):
+        answers["selected_options"] = sorted(selected, key=str)
+
+    payload = json.dumps(
+        {
+            "title": " ".join(str(title or "").split()).casefold(),
+            "ques_type": str(ques_type or "").strip().lower(),
+            "options": options or {},
+            "correct_answers": answers,
+        },
+        sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def with_content_hash(question: Dict[str, Any]) -> Dict[str, Any]:
+    question["content_hash"] = question_content_hash(
+        question["title"], question["ques_type"], question["options"], question["correct_answers"])
+    return question
+
+
+def dedupe_questions(questions: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Drop repeats of the same content within a batch (the last row wins)."""
+    return list({question["content_hash"]: question for question in questions}.values())
+
+
+def question_upsert_statement(rows: List[Dict[str, Any]]) -> Insert:
+    """
+    Multi-row INSERT of questions keyed by content_hash. An existing question
+    with the same content gets the row's complexity, max_score and tag_ids; a
+    max_score change bumps its version. Returns one `inserted` flag per row
+    created or updated; rows that changed nothing return nothing.
+    Rows must be unique by content_hash (see dedupe_questions).
+    """
+    insert_stmt = pg_insert(Question).values(rows)
+    excluded = insert_stmt.excluded
+    return insert_stmt.on_conflict_do_update(
+        index_elements=[Question.content_hash],
+        set_={
+            "complexity": excluded.complexity,
+            "max_score": excluded.max_score,
+            "tag_ids": excluded.tag_ids,
+            "version": case(
+                (Question.max_score.is_distinct_from(excluded.max_score), Question.version + 1),
+                else_=Question.version
+            ),
+        },
+        where=or_(
+            Question.complexity.is_distinct_from(excluded.complexity),
+            Question.max_score.is_distinct_from(excluded.max_score),
+            Question.tag_ids.is_distinct_from(excluded.tag_ids),
+        )
+    ).returning(literal_column("xmax = 0").label("inserted"))
+
+
+_SEARCH_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def build_prefix_tsquery(search_term: str) -> Optional[str]:
+    """
+    to_tsquery() input matching every word of `search_term`, the last one as
+    a prefix. Only word characters are kept, so user input cannot inject
+    tsquery operators. None if the term has no words.
+    """
+    words = _SEARCH_WORD.findall(search_term)
+    if not words:
+        return None
+    return " & ".join(words[:-1] + [f"{words[-1]}:*"])
+
+
+def escape_like(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def encode_cursor(position: Dict[str, Any]) -> str:
+    """Opaque keyset-pagination cursor for the last row of a page."""
+    return base64.urlsafe_b64encode(json.dumps(position, default=str).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    """Inverse of encode_cursor(); raises ValueError for a malformed cursor."""
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (TypeError, UnicodeDecodeError, json.JSONDecodeError, base64.binascii.Error) as e:
+        raise ValueError(f"Invalid cursor: {e}")
+    if not isinstance(position, dict):
+        raise ValueError("Invalid cursor.")
+    return position
+
+
+# Header names accepted in the first row of an import workbook
+IMPORT_COLUMN_ALIASES = {
+    "title": "title",
+    "question": "title",
+    "complexity": "complexity",
+    "ques_type": "ques_type",
+    "type": "ques_type",
+    "options": "options",
+    "correct_answers": "correct_answers",
+    "max_score": "max_score",
+    "tags": "tags",
+}
+IMPORT_REQUIRED_COLUMNS = {"title", "complexity", "ques_type", "options", "correct_answers", "max_score"}
+
+
+def iter_workbook_rows(source: IO[bytes], after_row: int = 1) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    Stream (row number, {column: cell value}) from the first sheet of an .xlsx
+    file, starting after `after_row` (row 1 is the header). The workbook is
+    opened read-only, so rows are parsed lazily and memory does not grow with
+    the file. Blank rows are skipped.
+    """
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            raise ValueError("The workbook is empty.")
+
+        columns = [IMPORT_COLUMN_ALIASES.get(str(name).strip().lower()) if name is not None else None
+                   for name in header]
+        missing = IMPORT_REQUIRED_COLUMNS - set(columns)
+        if missing:
+            raise ValueError(f"Missing required column(s): {', '.join(sorted(missing))}")
+
+        for row_number, values in enumerate(rows, start=2):
+            if row_number <= after_row or all(value is None for value in values):
+                continue
+            yield row_number, {
+                column: value for column, value in zip(columns, values) if column is not None
+            }
+    finally:
+        workbook.close()
+
+
+def _parse_json_cell(value: Any) -> Any:
+    if value is None or value == "":
+        return {}
+    if isinstance(value, str):
+        return json.loads(value)
+    return value
+
+
+def parse_question_row(raw: Mapping[str, Any]) -> Dict[str, Any]:
+    """Convert one spreadsheet row into validated Question column values."""
+    tags = raw.get("tags")
+    if isinstance(tags, str):
+        tags = [tag.strip() for tag in tags.split(",") if tag.strip()]
+
+    def text(value: Any) -> Any:
+        return str(value).strip() if value is not None else None
+
+    question = QuestionBase(
+        title=text(raw.get("title")),
+        complexity=text(raw.get("complexity")),
+        ques_type=text(raw.get("ques_type")),
+        options=_parse_json_cell(raw.get("options")),
+        correct_answers=_parse_json_cell(raw.get("correct_answers")),
+        max_score=raw.get("max_score"),
+        tags=tags or [],
+    )
+    return with_content_hash(question.model_dump())
+
+
+def validate_question_rows(rows: Iterable[Tuple[int, Mapping[str, Any]]]) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """Validate a chunk of workbook rows; returns (valid rows, per-row errors)."""
+    valid: List[Dict[str, Any]] = []
+    errors: List[str] = []
+    for row_number, raw in rows:
+        try:
+            valid.append(parse_question_row(raw))
+        except ValidationError as e:
+            problems = "; ".join(
+                f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in e.errors())
+            errors.append(f"Row {row_number} ('{raw.get('title', 'N/A')}'): {problems}")
+        except ValueError as e:
+            errors.append(f"Row {row_number} ('{raw.get('title', 'N/A')}'): Invalid JSON: {e}")
+    return valid, errors
+
+
+class QuestionRowChunk:
+    """A validated chunk of workbook rows."""
+
+    __slots__ = ("last_row", "rows_read", "questions", "errors")
+
+    def __init__(self, last_row: int, rows_read: int, questions: List[Dict[str, Any]], errors: List[str]) -> None:
+        self.last_row = last_row
+        self.rows_read = rows_read
+        self.questions = questions
+        self.errors = errors
+
+
+def iter_question_chunks(source: IO[bytes], chunk_size: int, after_row: int = 1) -> Iterator[QuestionRowChunk]:
+    """
+    Read and validate an import workbook `chunk_size` rows at a time.
+    Blocking: drive it from a worker thread.
+    """
+    chunk: List[Tuple[int, Dict[str, Any]]] = []
+    for row in iter_workbook_rows(source, after_row):
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield QuestionRowChunk(chunk[-1][0], len(chunk), *validate_question_rows(chunk))
+            chunk = []
+    if chunk:
+        yield QuestionRowChunk(chunk[-1][0], len(chunk), *validate_question_rows(chunk))
+
+
+def spool_upload(source: IO[bytes], path: str) -> None:
+    """Copy an upload to `path` atomically. Blocking: run it in a worker thread."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    partial_path = f"{path}.part"
+    source.seek(0)
+    with open(partial_path, "wb") as target:
+        shutil.copyfileobj(source, target, 1024 * 1024)
+    os.replace(partial_path, path)
+
+
+answer_key_cache = AnswerKeyCache()
+tag_cache = TagCache()
+# Facet counts keyed by the serialized QuestionFilter; cleared on question writes
+question_facet_cache = LRUCache(settings.QUESTION_FACET_CACHE_SIZE, settings.QUESTION_FACET_CACHE_TTL_SECONDS)
+exam_paper_cache = ExamPaperCache(settings.EXAM_PAPER_CACHE_SIZE, settings.EXAM_PAPER_CACHE_TTL_SECONDS)
@@ -1,3 +1,5 @@
+import asyncio
+import os
 from sqlalchemy import text
 from fastapi import FastAPI, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -6,6 +8,13 @@ from auth.middleware import register_middleware
 from auth.routes import auth_router
 from exam.routes import exam_router
 from result.routes import result_router
+from exam.services import run_import_job_sweeper, stop_import_jobs
+from result.services import run_exam_finalizer
+from result.utils import autosave_buffer, leaderboard, shutdown_grading_pool
+from auth.services import rebuild_revoked_token_filter, run_email_outbox_sender, run_revoked_token_sync
+from auth.utils import shutdown_hash_pool
+from conf.config import settings
+from conf.utils import smtp_pool
 
 version = "v1"
 version_prefix = f"/api/{version}"
@@ -41,6 +50,46 @@ register_middleware(app)
 @app.on_event("startup")
 async def on_startup():
     await init_db()
+    await leaderboard.rebuild()
+    await rebuild_revoked_token_filter()
+    app.state.revoked_token_sync = asyncio.create_task(
+        run_revoked_token_sync(settings.REVOKED_TOKEN_SYNC_INTERVAL_SECONDS))
+    app.state.email_outbox_sender = asyncio.create_task(
+        run_email_outbox_sender(settings.EMAIL_OUTBOX_POLL_INTERVAL_SECONDS))
+    if settings.AUTOSAVE_WRITE_BEHIND:
+        if int(os.getenv("WEB_CONCURRENCY", 1)) > 1:
+            raise RuntimeError(
+                "AUTOSAVE_WRITE_BEHIND buffers answers per process and needs a single worker; "
+                "unset it or run with WEB_CONCURRENCY=1.")
+        autosave_buffer.start()
+    if settings.EXAM_FINALIZER_INTERVAL_SECONDS > 0:
+        app.state.exam_finalizer = asyncio.create_task(
+            run_exam_finalizer(settings.EXAM_FINALIZER_INTERVAL_SECONDS))
+    # Resumes import jobs interrupted by a restart, then keeps sweeping for stalled ones
+    app.state.import_job_sweeper = asyncio.create_task(
+        run_import_job_sweeper(settings.QUESTION_IMPORT_SWEEP_INTERVAL_SECONDS))
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    exam_finalizer = getattr(app.state, "exam_finalizer", None)
+    if exam_finalizer:
+        exam_finalizer.cancel()
+    email_outbox_sender = getattr(app.state, "email_outbox_sender", None)
+    if email_outbox_sender:
+        email_outbox_sender.cancel()
+    await smtp_pool.close()
+    revoked_token_sync = getattr(app.state, "revoked_token_sync", None)
+    if revoked_token_sync:
+        revoked_token_sync.cancel()
+    import_job_sweeper = getattr(app.state, "import_job_sweeper", None)
+    if import_job_sweeper:
+        import_job_sweeper.cancel()
+    await stop_import_jobs()
+    if settings.AUTOSAVE_WRITE_BEHIND:
+        await autosave_buffer.stop()
+    shutdown_grading_pool()
+    shutdown_hash_pool()
 
 
 @app.get("/")
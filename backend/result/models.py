@@ -3,7 +3,7 @@ from conf.database import Base
 from datetime import datetime
 from typing import List, Optional, TYPE_CHECKING
 from sqlalchemy import (
-    Integer, DateTime, Boolean, ForeignKey, JSON, UUID, func
+    BigInteger, Integer, DateTime, Boolean, ForeignKey, JSON, UUID, UniqueConstraint, func
 )
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 if TYPE_CHECKING:
@@ -27,6 +27,9 @@ class ExamAttempt(Base):
         DateTime(timezone=True))
     is_submitted: Mapped[bool] = mapped_column(Boolean, default=False)
     total_score: Mapped[Optional[float]] = mapped_column(Integer, default=None)
+    # Seeds this attempt's question and option order (exam.utils.ExamPaper.render);
+    # answers are stored under the canonical option labels. NULL: no shuffling
+    shuffle_seed: Mapped[Optional[int]] = mapped_column(BigInteger, default=None)
 
     # Relationships
     user: Mapped["User"] = relationship("User", back_populates="attempts")
@@ -42,6 +45,10 @@ class ExamAttempt(Base):
 
 class AttemptAnswer(Base):
     __tablename__ = 'attempt_answers'
+    __table_args__ = (
+        UniqueConstraint('attempt_id', 'question_id',
+                         name='uq_attempt_answers_attempt_question'),
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True), primary_key=True, default=uuid.uuid4
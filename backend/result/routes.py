@@ -1,81 +1,173 @@
 import uuid
-from typing import List
-from fastapi import APIRouter, Depends, status, HTTPException
-from sqlalchemy.orm import Session
+from typing import List, Optional
+from fastapi import APIRouter, Depends, status, Header, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from conf.database import get_db
-from pydantic import BaseModel, Field
 from .services import ResultService
-from .schemas import ExamAttemptStart, ExamAttemptOut, ExamAttemptProgress, AttemptAnswerOut, ResultSummaryOut
-from auth.models import UserRole
+from .schemas import ExamAttemptStart, ExamAttemptOut, ExamAttemptProgress, AttemptAnswerSavedOut, ResultSummaryOut, ExamFinalizeSummary, RegradeSummary, LeaderboardOut, AttemptRankOut
+from .utils import attempt_cache, autosave_buffer, result_summary_cache, full_result_cache
+from auth.dependencies import get_admin_user, get_user_claims
+from auth.models import User, UserRole
+from auth.schemas import TokenClaims
 
 result_router = APIRouter()
 result_service = ResultService()
 
 
-class MockUser(BaseModel):
-    id: uuid.UUID = Field(default_factory=uuid.uuid4)
-    email: str
-    role: UserRole
+def _owner_scope(user: TokenClaims) -> Optional[uuid.UUID]:
+    """Owner an attempt must have for this caller: admins may read any attempt."""
+    return None if user.role == UserRole.ADMIN else user.id
 
 
-def get_current_user():
-    return MockUser(email="student@example.com", role=UserRole.STUDENT)
+@result_router.get("/autosave/metrics", response_model=dict)
+async def get_autosave_metrics(
+    admin_user: User = Depends(get_admin_user)
+):
+    """Admin: Write-behind autosave buffer metrics (buffered entries, flush latency, coalescing)."""
+    return autosave_buffer.metrics()
 
 
-def get_admin_user(current_user: MockUser = Depends(get_current_user)):
-    if current_user.role != UserRole.ADMIN:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
-                            detail="Only Admins are allowed to perform this action.")
-    return current_user
+@result_router.get("/cache/metrics", response_model=dict)
+async def get_result_cache_metrics(
+    admin_user: User = Depends(get_admin_user)
+):
+    """Admin: Hit ratios of the submitted-result caches."""
+    return {
+        "summary": result_summary_cache.metrics(),
+        "full_result": full_result_cache.metrics(),
+        "attempt": attempt_cache.metrics(),
+    }
 
 
 @result_router.post("/start", response_model=ExamAttemptOut)
-def start_or_resume_attempt(
+async def start_or_resume_attempt(
     attempt_data: ExamAttemptStart,
-    db: Session = Depends(get_db),
-    user: MockUser = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    user: TokenClaims = Depends(get_user_claims)
 ):
     """Student: Start a new exam attempt or resume an active one."""
-    return result_service.start_exam_attempt(db, user.id, attempt_data.exam_id)
+    return await result_service.start_exam_attempt(db, user.id, attempt_data.exam_id)
 
 
-@result_router.post("/{attempt_id}/progress", response_model=List[AttemptAnswerOut])
-def save_progress(
+@result_router.get("/{attempt_id}/paper")
+async def get_attempt_paper(
+    attempt_id: uuid.UUID,
+    if_none_match: Optional[str] = Header(None),
+    user: TokenClaims = Depends(get_user_claims)
+):
+    """Student: The exam paper with this attempt's question and option order. Supports If-None-Match."""
+    body, etag = await result_service.get_attempt_paper(attempt_id, user.id, if_none_match)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if body is None:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@result_router.post("/{attempt_id}/progress", response_model=List[AttemptAnswerSavedOut])
+async def save_progress(
     attempt_id: uuid.UUID,
     progress_data: ExamAttemptProgress,
-    db: Session = Depends(get_db),
-    user: MockUser = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    user: TokenClaims = Depends(get_user_claims)
 ):
-    """Student: Auto-save progress periodically/on change."""
-    return result_service.save_attempt_progress(db, attempt_id, progress_data)
+    """Student: Auto-save progress periodically/on change. Option labels are the ones shown on the attempt's paper."""
+    return await result_service.save_attempt_progress(db, attempt_id, user.id, progress_data)
 
 
 @result_router.post("/{attempt_id}/submit", response_model=ExamAttemptOut)
-def submit_attempt(
+async def submit_attempt(
     attempt_id: uuid.UUID,
-    db: Session = Depends(get_db),
-    user: MockUser = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    user: TokenClaims = Depends(get_user_claims)
 ):
     """Student: Submit the exam, triggering auto-grading and total score calculation."""
-    attempt = result_service.submit_exam_attempt(db, attempt_id)
+    attempt = await result_service.submit_exam_attempt(db, attempt_id, user.id)
     return attempt
 
 
 @result_router.get("/{attempt_id}/summary", response_model=ResultSummaryOut)
-def get_result_summary(
+async def get_result_summary(
     attempt_id: uuid.UUID,
-    db: Session = Depends(get_db),
-    user: MockUser = Depends(get_current_user)
+    user: TokenClaims = Depends(get_user_claims)
 ):
-    """Admin/Student: View the result summary (score, graded count)."""
-    return result_service.get_result_summary(db, attempt_id)
+    """Admin/Student: View the result summary (score, graded count). Students see only their own attempts."""
+    body = await result_service.get_result_summary_json(attempt_id, _owner_scope(user))
+    return Response(content=body, media_type="application/json")
 
 
 @result_router.get("/{attempt_id}/full", response_model=ExamAttemptOut)
-def get_full_result_details(
+async def get_full_result_details(
     attempt_id: uuid.UUID,
-    db: Session = Depends(get_db),
-    user: MockUser = Depends(get_current_user)
+    user: TokenClaims = Depends(get_user_claims)
+):
+    """Admin/Student: View the full result details, including all answers and scores. Students see only their own attempts."""
+    body = await result_service.get_full_result_json(attempt_id, _owner_scope(user))
+    return Response(content=body, media_type="application/json")
+
+
+@result_router.post("/exam/{exam_id}/finalize", response_model=ExamFinalizeSummary)
+async def finalize_exam_attempts(
+    exam_id: uuid.UUID,
+    db: AsyncSession = Depends(get_db),
+    admin_user: User = Depends(get_admin_user)
+):
+    """Admin: Submit and grade every attempt still open after the exam closed."""
+    return await result_service.finalize_exam(db, exam_id)
+
+
+@result_router.post("/regrade/question/{question_id}", response_model=RegradeSummary)
+async def regrade_question(
+    question_id: uuid.UUID,
+    db: AsyncSession = Depends(get_db),
+    admin_user: User = Depends(get_admin_user)
+):
+    """Admin: Rescore submitted answers to a question against its current answer key."""
+    return await result_service.regrade_question(db, question_id)
+
+
+@result_router.post("/regrade/exam/{exam_id}", response_model=RegradeSummary)
+async def regrade_exam(
+    exam_id: uuid.UUID,
+    db: AsyncSession = Depends(get_db),
+    admin_user: User = Depends(get_admin_user)
+):
+    """Admin: Rescore every submitted attempt of an exam against the current answer keys."""
+    return await result_service.regrade_exam(db, exam_id)
+
+
+@result_router.get("/exam/{exam_id}/leaderboard", response_model=LeaderboardOut)
+async def get_exam_leaderboard(
+    exam_id: uuid.UUID,
+    limit: int = Query(10, ge=1, le=1000),
+    db: AsyncSession = Depends(get_db),
+    user: TokenClaims = Depends(get_user_claims)
+):
+    """Admin/Student: Top submitted attempts of an exam."""
+    return await result_service.get_leaderboard(db, exam_id, limit)
+
+
+@result_router.get("/{attempt_id}/rank", response_model=AttemptRankOut)
+async def get_attempt_rank(
+    attempt_id: uuid.UUID,
+    db: AsyncSession = Depends(get_db),
+    user: TokenClaims = Depends(get_user_claims)
+):
+    """Admin/Student: Rank and percentile of a submitted attempt within its exam. Students see only their own attempts."""
+    return await result_service.get_attempt_rank(db, attempt_id, _owner_scope(user))
+
+
+@result_router.get("/exam/{exam_id}/export")
+async def export_exam_results(
+    exam_id: uuid.UUID,
+    export_format: str = Query("csv", alias="format", pattern="^(csv|ndjson|parquet)$"),
+    db: AsyncSession = Depends(get_db),
+    admin_user: User = Depends(get_admin_user)
 ):
-    """Admin/Student: View the full result details, including all answers and scores."""
-    return result_service.get_full_result(db, attempt_id)
+    """Admin: Stream all attempts of an exam with per-question scores (CSV, NDJSON or Parquet)."""
+    writer, stream = await result_service.export_exam_results(db, exam_id, export_format)
+    return StreamingResponse(
+        stream,
+        media_type=writer.media_type,
+        headers={"Content-Disposition": f'attachment; filename="exam-{exam_id}-results.{writer.extension}"'}
+    )
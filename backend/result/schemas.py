@@ -18,6 +18,15 @@ class AttemptAnswerOut(AttemptAnswerBase, IDBase):
     class Config:
         from_attributes = True
 
+class AttemptAnswerSavedOut(AttemptAnswerBase):
+    # id is unknown until a write-behind autosave has been flushed
+    id: Optional[uuid.UUID] = None
+    score: Optional[float] = None
+    is_graded: bool = False
+
+    class Config:
+        from_attributes = True
+
 class ExamAttemptStart(BaseModel):
     exam_id: uuid.UUID
 
@@ -47,3 +56,34 @@ class ResultSummaryOut(BaseModel):
 
     class Config:
         from_attributes = True
+
+class ExamFinalizeSummary(BaseModel):
+    exam_id: uuid.UUID
+    attempts_finalized: int
+    answers_graded: int
+    chunks: int
+    elapsed_seconds: float
+    attempts_per_second: float
+
+class RegradeSummary(BaseModel):
+    answers_rescored: int
+    attempts_updated: int
+    elapsed_seconds: float
+
+class LeaderboardEntry(BaseModel):
+    rank: int
+    attempt_id: uuid.UUID
+    total_score: float
+
+class LeaderboardOut(BaseModel):
+    exam_id: uuid.UUID
+    total_attempts: int
+    entries: List[LeaderboardEntry]
+
+class AttemptRankOut(BaseModel):
+    attempt_id: uuid.UUID
+    exam_id: uuid.UUID
+    total_score: float
+    rank: int
+    total_attempts: int
+    percentile: float
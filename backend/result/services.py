@@ -1,151 +1,663 @@
+import asyncio
+import logging
+import secrets
+import time
 import uuid
-from datetime import datetime
-from typing import List
+from datetime import datetime, timezone
+from typing import AsyncIterator, List, Optional, Tuple, Union
 from fastapi import HTTPException, status
-from sqlalchemy import func
-from sqlalchemy.orm import Session
+from sqlalchemy import and_, case, cast, func, literal, update
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.orm import joinedload
 from .models import ExamAttempt, AttemptAnswer
-from .schemas import ExamAttemptProgress, ResultSummaryOut
+from .schemas import (
+    ExamAttemptProgress, ExamAttemptOut, AttemptAnswerSavedOut, ResultSummaryOut, ExamFinalizeSummary, RegradeSummary,
+    LeaderboardOut, LeaderboardEntry, AttemptRankOut
+)
+from .utils import (
+    answer_upsert_statement, attempt_cache, autosave_buffer, grade_attempts_in_pool, leaderboard,
+    result_summary_cache, full_result_cache, invalidate_result_cache,
+    EXPORT_BATCH_ATTEMPTS, EXPORT_FETCH_ROWS, EXPORT_WRITERS, pa, pivot_attempt_rows
+)
 from exam.services import ExamService
 from exam.models import Exam, ExamStatus, Question
+from exam.utils import (
+    OBJECTIVE_QUESTION_TYPES, answer_key_cache, build_grading_table, etag_matches, grade_attempt, is_valid_selection
+)
+from auth.models import User
+from conf.config import settings
+from conf.database import async_session
+
+logger = logging.getLogger(__name__)
 
 
 class ResultService:
     def __init__(self):
         self.exam_service = ExamService()
 
+    # Answers are stored under canonical option labels; students get them back
+    # under the labels their attempt's shuffled paper displays
+    async def _displayed_attempt(self, db: AsyncSession, attempt: ExamAttempt) -> Union[ExamAttempt, ExamAttemptOut]:
+        if attempt.shuffle_seed is None:
+            return attempt
+        paper = await self.exam_service.get_cached_paper(db, attempt.exam_id)
+        displayed = paper.relabel_answers(attempt.shuffle_seed, {
+            answer.question_id: answer.student_answer for answer in attempt.attempt_answers
+        }, to_display=True)
+        attempt_out = ExamAttemptOut.model_validate(attempt)
+        for answer in attempt_out.attempt_answers:
+            answer.student_answer = displayed[answer.question_id]
+        return attempt_out
+
     # Student: Start Exam Attempt
-    def start_exam_attempt(self, db: Session, user_id: uuid.UUID, exam_id: uuid.UUID) -> ExamAttempt:
-        exam = db.query(Exam).filter(Exam.id == exam_id).first()
+    async def start_exam_attempt(self, db: AsyncSession, user_id: uuid.UUID, exam_id: uuid.UUID) -> Union[ExamAttempt, ExamAttemptOut]:
+        # Exam and the user's active attempt (with its answers) in one round trip
+        stmt = (
+            select(Exam, ExamAttempt)
+            .outerjoin(
+                ExamAttempt,
+                and_(
+                    ExamAttempt.exam_id == Exam.id,
+                    ExamAttempt.user_id == user_id,
+                    ExamAttempt.is_submitted == False
+                )
+            )
+            .options(joinedload(ExamAttempt.attempt_answers))
+            .where(Exam.id == exam_id)
+        )
+        result = await db.execute(stmt)
+        row = result.unique().first()
+
+        exam = row[0] if row else None
         if not exam or exam.status != ExamStatus.PUBLISHED:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Exam not available.")
 
-        active_attempt = db.query(ExamAttempt).filter(
-            ExamAttempt.user_id == user_id,
-            ExamAttempt.exam_id == exam_id,
-            ExamAttempt.is_submitted == False
-        ).first()
-
+        active_attempt = row[1]
         if active_attempt:
-            return active_attempt
+            attempt_cache.set(active_attempt.id, (exam_id, user_id, active_attempt.shuffle_seed))
+            return await self._displayed_attempt(db, active_attempt)
 
         now = datetime.now(exam.start_time.tzinfo)
         if not (exam.start_time <= now and exam.end_time >= now):
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
                                 detail="Exam is outside the allowed time window.")
 
+        # start_time is fetched back through INSERT ... RETURNING, no refresh needed
         new_attempt = ExamAttempt(
             user_id=user_id,
             exam_id=exam_id,
-            start_time=func.now()
+            start_time=func.now(),
+            shuffle_seed=secrets.randbits(63),
+            attempt_answers=[]
         )
         db.add(new_attempt)
-        db.commit()
-        db.refresh(new_attempt)
+        await db.commit()
+        attempt_cache.set(new_attempt.id, (exam_id, user_id, new_attempt.shuffle_seed))
         return new_attempt
 
     # Student: Auto-save progress / Answer submission (Periodic save or on change)
-    def save_attempt_progress(self, db: Session, attempt_id: uuid.UUID, progress_data: ExamAttemptProgress) -> List[AttemptAnswer]:
-        attempt = db.query(ExamAttempt).filter(
-            ExamAttempt.id == attempt_id, ExamAttempt.is_submitted == False).first()
-        if not attempt:
+    async def save_attempt_progress(self, db: AsyncSession, attempt_id: uuid.UUID, user_id: uuid.UUID,
+                                    progress_data: ExamAttemptProgress) -> List[AttemptAnswerSavedOut]:
+        stmt = (
+            select(Exam.questions_order, ExamAttempt.exam_id, ExamAttempt.shuffle_seed)
+            .join(ExamAttempt, ExamAttempt.exam_id == Exam.id)
+            .where(ExamAttempt.id == attempt_id, ExamAttempt.user_id == user_id,
+                   ExamAttempt.is_submitted == False)
+        )
+        result = await db.execute(stmt)
+        row = result.first()
+        if not row:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Active attempt not found.")
 
-        saved_answers = []
-        for answer_data in progress_data.answers:
-            attempt_answer = db.query(AttemptAnswer).filter(
-                AttemptAnswer.attempt_id == attempt_id,
-                AttemptAnswer.question_id == answer_data.question_id
-            ).first()
-
-            if not attempt_answer:
-                attempt_answer = AttemptAnswer(
-                    attempt_id=attempt_id,
-                    question_id=answer_data.question_id,
-                    student_answer=answer_data.student_answer
+        # Last write wins for a question repeated in one payload; ON CONFLICT
+        # cannot touch the same row twice within a single statement
+        answers = {
+            answer_data.question_id: answer_data.student_answer
+            for answer_data in progress_data.answers
+        }
+        if not answers:
+            return []
+
+        exam_question_ids = set(row.questions_order or [])
+        unknown_ids = [q_id for q_id in answers if q_id not in exam_question_ids]
+        if unknown_ids:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Questions not part of this exam: {', '.join(map(str, unknown_ids))}")
+
+        malformed_ids = [q_id for q_id, answer in answers.items() if not is_valid_selection(answer)]
+        if malformed_ids:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"selected_options must be a list of option labels: {', '.join(map(str, malformed_ids))}")
+
+        # Answers arrive under this attempt's shuffled option labels; store canonical ones
+        displayed_answers = answers
+        if row.shuffle_seed is not None:
+            paper = await self.exam_service.get_cached_paper(db, row.exam_id)
+            answers = paper.relabel_answers(row.shuffle_seed, answers, to_display=False)
+
+        if settings.AUTOSAVE_WRITE_BEHIND:
+            # Acknowledged from memory; the buffer writes the answers later
+            await autosave_buffer.add(attempt_id, answers)
+            return [
+                AttemptAnswerSavedOut(
+                    question_id=question_id,
+                    student_answer=student_answer,
+                    is_graded=False
                 )
-            else:
-                attempt_answer.student_answer = answer_data.student_answer
+                for question_id, student_answer in displayed_answers.items()
+            ]
 
-            db.add(attempt_answer)
-            saved_answers.append(attempt_answer)
+        upsert_stmt = answer_upsert_statement([
+            {
+                "attempt_id": attempt_id,
+                "question_id": question_id,
+                "student_answer": student_answer
+            }
+            for question_id, student_answer in answers.items()
+        ]).returning(AttemptAnswer)
+        result = await db.scalars(
+            upsert_stmt, execution_options={"populate_existing": True})
+        saved_answers = [
+            AttemptAnswerSavedOut.model_validate(answer).model_copy(
+                update={"student_answer": displayed_answers[answer.question_id]})
+            for answer in result.all()
+        ]
 
-        db.commit()
+        await db.commit()
         return saved_answers
 
+    # (exam_id, user_id, shuffle_seed) of an attempt the caller may read;
+    # owner_id None (admins) skips the owner check
+    async def get_attempt_ref(self, attempt_id: uuid.UUID,
+                              owner_id: Optional[uuid.UUID]) -> Tuple[uuid.UUID, uuid.UUID, Optional[int]]:
+        ref = attempt_cache.get(attempt_id)
+        if ref is None:
+            stmt = select(ExamAttempt.exam_id, ExamAttempt.user_id, ExamAttempt.shuffle_seed).where(
+                ExamAttempt.id == attempt_id)
+            async with async_session() as db:
+                row = (await db.execute(stmt)).first()
+            if row:
+                ref = (row.exam_id, row.user_id, row.shuffle_seed)
+                attempt_cache.set(attempt_id, ref)
+
+        # Someone else's attempt looks the same as a missing one
+        if ref is None or (owner_id is not None and ref[1] != owner_id):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Exam attempt not found.")
+        return ref
+
+    # Student: The exam paper in this attempt's question and option order
+    async def get_attempt_paper(self, attempt_id: uuid.UUID, user_id: uuid.UUID,
+                                if_none_match: Optional[str]) -> Tuple[Optional[bytes], str]:
+        """
+        Returns (body, etag); body is None when the client's copy is current.
+        With the attempt and its paper cached, no database query is made.
+        """
+        exam_id, _, shuffle_seed = await self.get_attempt_ref(attempt_id, user_id)
+        # Sessions connect lazily, so a cached paper never checks one out
+        async with async_session() as db:
+            paper = await self.exam_service.get_exam_paper(db, exam_id)
+        etag = paper.attempt_etag(shuffle_seed)
+        if etag_matches(if_none_match, etag):
+            return None, etag
+        return paper.render(shuffle_seed), etag
+
     # Student: Submit Exam
-    def submit_exam_attempt(self, db: Session, attempt_id: uuid.UUID) -> ExamAttempt:
-        attempt = db.query(ExamAttempt).filter(
-            ExamAttempt.id == attempt_id, ExamAttempt.is_submitted == False).first()
+    async def submit_exam_attempt(self, db: AsyncSession, attempt_id: uuid.UUID, user_id: uuid.UUID) -> Union[ExamAttempt, ExamAttemptOut]:
+        if settings.AUTOSAVE_WRITE_BEHIND:
+            # Buffered answers must be durable before they are graded
+            await autosave_buffer.flush(attempt_id)
+
+        # Attempt, answers and their questions' key versions in one round trip;
+        # the row lock keeps a concurrent submit from grading the attempt twice
+        stmt = (
+            select(ExamAttempt)
+            .options(
+                joinedload(ExamAttempt.attempt_answers)
+                .joinedload(AttemptAnswer.question)
+                .load_only(Question.id, Question.version)
+            )
+            .where(ExamAttempt.id == attempt_id, ExamAttempt.user_id == user_id,
+                   ExamAttempt.is_submitted == False)
+            .with_for_update(of=ExamAttempt)
+        )
+        result = await db.execute(stmt)
+        attempt = result.unique().scalars().first()
         if not attempt:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Active attempt not found.")
 
         attempt.is_submitted = True
-        attempt.end_time = func.now()
-
-        total_score = 0.0
-
-        answers_to_grade = db.query(AttemptAnswer).filter(
-            AttemptAnswer.attempt_id == attempt_id).all()
-        question_ids = [ans.question_id for ans in answers_to_grade]
-        questions = db.query(Question).filter(
-            Question.id.in_(question_ids)).all()
-        question_map = {q.id: q for q in questions}
-
-        for answer in answers_to_grade:
-            question = question_map.get(answer.question_id)
-            if not question:
-                continue
-
-            if question.ques_type in ['single_choice', 'multiple_choice']:
-                score = self.exam_service._grade_objective_question(
-                    question, answer.student_answer)
-                answer.score = score
-                answer.is_graded = True
-                total_score += score
+        attempt.end_time = datetime.now(timezone.utc)
 
-            db.add(answer)
+        # Compiled keys come from the cache; only unseen versions hit the database
+        keys = await answer_key_cache.get_many(db, {
+            answer.question_id: answer.question.version
+            for answer in attempt.attempt_answers if answer.question
+        })
+        scores, total_score = grade_attempt(keys, {
+            answer.question_id: answer.student_answer
+            for answer in attempt.attempt_answers
+        })
+
+        for answer in attempt.attempt_answers:
+            if answer.question_id in scores:
+                answer.score = scores[answer.question_id]
+                answer.is_graded = True
 
         attempt.total_score = total_score
 
-        db.add(attempt)
-        db.commit()
-        db.refresh(attempt)
-        return attempt
+        await db.commit()
+        leaderboard.record(attempt.exam_id, attempt.id, total_score)
+        return await self._displayed_attempt(db, attempt)
 
     # Admin/Student: View Result Summary
-    def get_result_summary(self, db: Session, attempt_id: uuid.UUID) -> ResultSummaryOut:
-        attempt = db.query(ExamAttempt).filter(
-            ExamAttempt.id == attempt_id).first()
-        if not attempt:
+    async def get_result_summary(self, db: AsyncSession, attempt_id: uuid.UUID) -> ResultSummaryOut:
+        graded_count = (
+            select(func.count(AttemptAnswer.id))
+            .where(
+                AttemptAnswer.attempt_id == ExamAttempt.id,
+                AttemptAnswer.is_graded == True
+            )
+            .correlate(ExamAttempt)
+            .scalar_subquery()
+            .label("graded_count")
+        )
+        stmt = (
+            select(
+                ExamAttempt.id.label("attempt_id"),
+                ExamAttempt.is_submitted,
+                ExamAttempt.total_score,
+                Exam.title.label("exam_title"),
+                func.coalesce(func.cardinality(Exam.questions_order), 0).label("total_questions"),
+                User.email.label("user_email"),
+                graded_count
+            )
+            .join(Exam, Exam.id == ExamAttempt.exam_id)
+            .join(User, User.id == ExamAttempt.user_id)
+            .where(ExamAttempt.id == attempt_id)
+        )
+        result = await db.execute(stmt)
+        row = result.first()
+        if not row:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Exam attempt not found.")
 
-        total_questions = len(
-            attempt.exam.questions_order) if attempt.exam else 0
-        graded_count = db.query(AttemptAnswer).filter(
-            AttemptAnswer.attempt_id == attempt_id, AttemptAnswer.is_graded == True).count()
-
         summary = ResultSummaryOut(
-            attempt_id=attempt.id,
-            exam_title=attempt.exam.title,
-            user_email=attempt.user.email,
-            is_submitted=attempt.is_submitted,
-            total_score=attempt.total_score,
-            graded_count=graded_count,
-            total_questions=total_questions
+            attempt_id=row.attempt_id,
+            exam_title=row.exam_title,
+            user_email=row.user_email,
+            is_submitted=row.is_submitted,
+            total_score=row.total_score,
+            graded_count=row.graded_count,
+            total_questions=row.total_questions
         )
         return summary
 
     # Admin/Student: View Full Result
-    def get_full_result(self, db: Session, attempt_id: uuid.UUID) -> ExamAttempt:
-        attempt = db.query(ExamAttempt).filter(
-            ExamAttempt.id == attempt_id).first()
+    async def get_full_result(self, db: AsyncSession, attempt_id: uuid.UUID) -> ExamAttempt:
+        stmt = (
+            select(ExamAttempt)
+            .options(joinedload(ExamAttempt.attempt_answers))
+            .where(ExamAttempt.id == attempt_id)
+        )
+        result = await db.execute(stmt)
+        attempt = result.unique().scalars().first()
         if not attempt:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Exam attempt not found.")
         return attempt
 
+    # Admin/Student: Result summary as JSON, served from memory once submitted
+    async def get_result_summary_json(self, attempt_id: uuid.UUID, owner_id: Optional[uuid.UUID]) -> bytes:
+        await self.get_attempt_ref(attempt_id, owner_id)
+        body = result_summary_cache.get(attempt_id)
+        if body is None:
+            async with async_session() as db:
+                summary = await self.get_result_summary(db, attempt_id)
+            body = summary.model_dump_json().encode()
+            # Open attempts still change; submitted ones only change on regrade
+            if summary.is_submitted:
+                result_summary_cache.set(attempt_id, body)
+        return body
+
+    # Admin/Student: Full result as JSON, served from memory once submitted
+    async def get_full_result_json(self, attempt_id: uuid.UUID, owner_id: Optional[uuid.UUID]) -> bytes:
+        await self.get_attempt_ref(attempt_id, owner_id)
+        body = full_result_cache.get(attempt_id)
+        if body is None:
+            async with async_session() as db:
+                attempt = await self.get_full_result(db, attempt_id)
+                displayed = await self._displayed_attempt(db, attempt)
+                body = ExamAttemptOut.model_validate(displayed).model_dump_json().encode()
+            if attempt.is_submitted:
+                full_result_cache.set(attempt_id, body)
+        return body
+
+    # Admin/Student: Best attempts of an exam
+    async def get_leaderboard(self, db: AsyncSession, exam_id: uuid.UUID, limit: int) -> LeaderboardOut:
+        index = await leaderboard.get_index(db, exam_id)
+        return LeaderboardOut(
+            exam_id=exam_id,
+            total_attempts=len(index),
+            entries=[
+                LeaderboardEntry(rank=rank, attempt_id=attempt_id, total_score=score)
+                for rank, attempt_id, score in index.top(limit)
+            ]
+        )
+
+    # Admin/Student: Rank and percentile of a submitted attempt
+    async def get_attempt_rank(self, db: AsyncSession, attempt_id: uuid.UUID,
+                               owner_id: Optional[uuid.UUID]) -> AttemptRankOut:
+        stmt = select(
+            ExamAttempt.exam_id, ExamAttempt.is_submitted, ExamAttempt.total_score
+        ).where(ExamAttempt.id == attempt_id)
+        if owner_id is not None:
+            stmt = stmt.where(ExamAttempt.user_id == owner_id)
+        row = (await db.execute(stmt)).first()
+        if not row:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Exam attempt not found.")
+        if not row.is_submitted:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                detail="Attempt has not been submitted yet.")
+
+        index = await leaderboard.get_index(db, row.exam_id)
+        if index.score_of(attempt_id) is None:
+            # Submitted through another worker since the index was loaded
+            index.record(attempt_id, row.total_score)
+
+        return AttemptRankOut(
+            attempt_id=attempt_id,
+            exam_id=row.exam_id,
+            total_score=index.score_of(attempt_id),
+            rank=index.rank(attempt_id),
+            total_attempts=len(index),
+            percentile=index.percentile(attempt_id)
+        )
+
+    # Admin: Export every attempt of an exam with its per-question scores
+    async def export_exam_results(self, db: AsyncSession, exam_id: uuid.UUID, export_format: str) -> Tuple[object, AsyncIterator[bytes]]:
+        """
+        Returns the format writer and an async byte stream of the export. Rows
+        come through a server-side cursor in attempt order and are pivoted to
+        one row per attempt on the fly, so memory does not grow with exam size.
+        """
+        writer_class = EXPORT_WRITERS.get(export_format)
+        if writer_class is None:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                detail=f"Unsupported export format: {export_format}")
+        if export_format == "parquet" and pa is None:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                detail="Parquet export requires the pyarrow package.")
+
+        exam = await self.exam_service.get_exam_by_id(db, exam_id)
+        writer = writer_class(list(exam.questions_order or []))
+
+        stmt = (
+            select(
+                ExamAttempt.id.label("attempt_id"),
+                ExamAttempt.user_id,
+                User.email.label("user_email"),
+                ExamAttempt.start_time,
+                ExamAttempt.end_time,
+                ExamAttempt.is_submitted,
+                ExamAttempt.total_score,
+                AttemptAnswer.question_id,
+                AttemptAnswer.score
+            )
+            .join(User, User.id == ExamAttempt.user_id)
+            .outerjoin(AttemptAnswer, AttemptAnswer.attempt_id == ExamAttempt.id)
+            .where(ExamAttempt.exam_id == exam_id)
+            .order_by(ExamAttempt.id)
+            .execution_options(yield_per=EXPORT_FETCH_ROWS)
+        )
+
+        async def stream() -> AsyncIterator[bytes]:
+            # Own session: the request's session is closed before the body is sent
+            async with async_session() as export_db:
+                yield writer.header()
+                rows = await export_db.stream(stmt)
+                batch = []
+                async for record in pivot_attempt_rows(rows):
+                    batch.append(record)
+                    if len(batch) >= EXPORT_BATCH_ATTEMPTS:
+                        yield writer.write(batch)
+                        batch = []
+                if batch:
+                    yield writer.write(batch)
+                yield writer.close()
+
+        return writer, stream()
+
+    # Admin: Regrade submitted answers after a question's answer key changed
+    async def regrade_question(self, db: AsyncSession, question_id: uuid.UUID) -> RegradeSummary:
+        await self.exam_service.get_question_by_id(db, question_id)
+        return await self._regrade(db, Question.id == question_id)
+
+    # Admin: Regrade every submitted attempt of an exam
+    async def regrade_exam(self, db: AsyncSession, exam_id: uuid.UUID) -> RegradeSummary:
+        await self.exam_service.get_exam_by_id(db, exam_id)
+        return await self._regrade(db, ExamAttempt.exam_id == exam_id)
+
+    async def _regrade(self, db: AsyncSession, scope) -> RegradeSummary:
+        """
+        Set-based regrade in a single statement: rescore the objective answers
+        of submitted attempts matching `scope` in SQL, update only the answers
+        whose score changed, and shift each affected attempt's total by the
+        sum of its deltas. Nothing is loaded into Python but the changed
+        attempt ids, and only the touched rows are locked.
+        """
+        started = time.perf_counter()
+
+        # Same rule as the compiled grader: the selected option set must equal
+        # the correct option set (jsonb containment both ways), and a selection
+        # that is not a list is wrong
+        empty = cast(literal("[]"), JSONB)
+        selected = func.coalesce(
+            cast(AttemptAnswer.student_answer, JSONB)["selected_options"], empty)
+        correct = func.coalesce(
+            cast(Question.correct_answers, JSONB)["selected_options"], empty)
+        new_score = case(
+            (and_(func.jsonb_typeof(selected) == "array",
+                  selected.contains(correct), correct.contains(selected)), Question.max_score),
+            else_=0
+        )
+
+        scored = (
+            select(
+                AttemptAnswer.id,
+                new_score.label("new_score"),
+                func.coalesce(AttemptAnswer.score, 0).label("old_score")
+            )
+            .join(Question, Question.id == AttemptAnswer.question_id)
+            .join(ExamAttempt, ExamAttempt.id == AttemptAnswer.attempt_id)
+            .where(
+                ExamAttempt.is_submitted == True,
+                Question.ques_type.in_(OBJECTIVE_QUESTION_TYPES),
+                scope
+            )
+            .subquery("scored")
+        )
+        rescored = (
+            update(AttemptAnswer)
+            .where(
+                AttemptAnswer.id == scored.c.id,
+                AttemptAnswer.score.is_distinct_from(scored.c.new_score)
+            )
+            .values(score=scored.c.new_score, is_graded=True)
+            .returning(
+                AttemptAnswer.attempt_id,
+                (scored.c.new_score - scored.c.old_score).label("delta")
+            )
+            .cte("rescored")
+        )
+        deltas = (
+            select(
+                rescored.c.attempt_id,
+                func.sum(rescored.c.delta).label("delta"),
+                func.count().label("answers")
+            )
+            .group_by(rescored.c.attempt_id)
+            .subquery("deltas")
+        )
+        totals = (
+            update(ExamAttempt)
+            .where(ExamAttempt.id == deltas.c.attempt_id)
+            .values(total_score=func.coalesce(ExamAttempt.total_score, 0) + deltas.c.delta)
+            .returning(ExamAttempt.id, ExamAttempt.exam_id, ExamAttempt.total_score, deltas.c.answers)
+        )
+
+        result = await db.execute(
+            totals, execution_options={"synchronize_session": False})
+        updated = result.all()
+        await db.commit()
+
+        for row in updated:
+            leaderboard.record(row.exam_id, row.id, row.total_score)
+            invalidate_result_cache(row.id)
+
+        return RegradeSummary(
+            answers_rescored=sum(row.answers for row in updated),
+            attempts_updated=len(updated),
+            elapsed_seconds=time.perf_counter() - started
+        )
+
+    # System/Admin: Grade every attempt still open after the exam closed
+    async def finalize_exam(self, db: AsyncSession, exam_id: uuid.UUID) -> ExamFinalizeSummary:
+        """
+        Claims open attempts of a closed exam in chunks (FOR UPDATE SKIP LOCKED),
+        grades each chunk in the grading process pool and writes scores, totals
+        and the submitted flag in one transaction per chunk. A crash loses at
+        most the chunk in flight, which stays open and is picked up by the next
+        run, so the operation is idempotent and resumable.
+        """
+        exam = await self.exam_service.get_exam_by_id(db, exam_id)
+        if exam.end_time > datetime.now(timezone.utc):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                detail="Exam has not closed yet.")
+
+        if settings.AUTOSAVE_WRITE_BEHIND:
+            await autosave_buffer.flush()
+
+        started = time.perf_counter()
+
+        version_rows = await db.execute(
+            select(Question.id, Question.version)
+            .where(Question.id.in_(exam.questions_order or []))
+        )
+        keys = await answer_key_cache.get_many(db, dict(version_rows.all()))
+        table = build_grading_table(keys)
+        await db.commit()
+
+        attempts_finalized = 0
+        answers_graded = 0
+        chunks = 0
+
+        while True:
+            claim_stmt = (
+                select(ExamAttempt.id)
+                .where(ExamAttempt.exam_id == exam_id, ExamAttempt.is_submitted == False)
+                .order_by(ExamAttempt.id)
+                .limit(settings.EXAM_FINALIZER_CHUNK_SIZE)
+                .with_for_update(skip_locked=True)
+            )
+            attempt_ids = (await db.scalars(claim_stmt)).all()
+            if not attempt_ids:
+                await db.rollback()
+                break
+
+            answer_rows = await db.execute(
+                select(
+                    AttemptAnswer.id,
+                    AttemptAnswer.attempt_id,
+                    AttemptAnswer.question_id,
+                    AttemptAnswer.student_answer
+                )
+                .where(AttemptAnswer.attempt_id.in_(attempt_ids))
+            )
+            answers_by_attempt = {attempt_id: {} for attempt_id in attempt_ids}
+            answer_ids = {}
+            for row in answer_rows:
+                answers_by_attempt[row.attempt_id][row.question_id] = row.student_answer
+                answer_ids[(row.attempt_id, row.question_id)] = row.id
+
+            graded = await grade_attempts_in_pool(table, list(answers_by_attempt.items()))
+
+            answer_updates = [
+                {"id": answer_ids[(attempt_id, question_id)], "score": score, "is_graded": True}
+                for attempt_id, (scores, _) in graded.items()
+                for question_id, score in scores.items()
+            ]
+            if answer_updates:
+                await db.execute(update(AttemptAnswer), answer_updates)
+            await db.execute(update(ExamAttempt), [
+                {
+                    "id": attempt_id,
+                    "is_submitted": True,
+                    "end_time": exam.end_time,
+                    "total_score": total_score
+                }
+                for attempt_id, (_, total_score) in graded.items()
+            ])
+            await db.commit()
+
+            for attempt_id, (_, total_score) in graded.items():
+                leaderboard.record(exam_id, attempt_id, total_score)
+
+            attempts_finalized += len(attempt_ids)
+            answers_graded += len(answer_updates)
+            chunks += 1
+
+        elapsed = time.perf_counter() - started
+        summary = ExamFinalizeSummary(
+            exam_id=exam_id,
+            attempts_finalized=attempts_finalized,
+            answers_graded=answers_graded,
+            chunks=chunks,
+            elapsed_seconds=elapsed,
+            attempts_per_second=attempts_finalized / elapsed if elapsed else 0.0
+        )
+        logger.info(
+            "Finalized %d attempts (%d answers) of exam %s in %.2fs (%.1f attempts/s)",
+            attempts_finalized, answers_graded, exam_id, elapsed, summary.attempts_per_second)
+        return summary
+
+    # System: Finalize every closed exam that still has open attempts
+    async def finalize_closed_exams(self, db: AsyncSession) -> List[ExamFinalizeSummary]:
+        stmt = (
+            select(ExamAttempt.exam_id)
+            .join(Exam, Exam.id == ExamAttempt.exam_id)
+            .where(Exam.end_time <= func.now(), ExamAttempt.is_submitted == False)
+            .distinct()
+        )
+        exam_ids = (await db.scalars(stmt)).all()
+        await db.rollback()
+
+        # One exam failing must not hold back the others; it is retried next run
+        summaries = []
+        for exam_id in exam_ids:
+            try:
+                summaries.append(await self.finalize_exam(db, exam_id))
+            except Exception:
+                logger.exception("Finalizing exam %s failed", exam_id)
+                await db.rollback()
+        return summaries
+
+
+async def run_exam_finalizer(interval: float) -> None:
+    """Background loop that finalizes closed exams every `interval` seconds."""
+    result_service = ResultService()
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with async_session() as db:
+                await result_service.finalize_closed_exams(db)
+        except Exception:
+            logger.exception("Exam finalizer run failed")
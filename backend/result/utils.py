@@ -0,0 +1,694 @@
+import asyncio
+import bisect
+import csv
+import io
+import json
+import logging
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, List, Mapping, Optional, Tuple
+from sqlalchemy import column, values
+from sqlalchemy.dialects.postgresql import Insert, insert as pg_insert
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from conf.cache import LRUCache
+from conf.config import settings
+from conf.database import async_session
+from exam.models import Exam, ExamStatus
+from exam.utils import grade_attempts_with_table
+from .models import AttemptAnswer, ExamAttempt
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet export is optional
+    pa = None
+    pq = None
+
+logger = logging.getLogger(__name__)
+
+# Rows per multi-row INSERT; keeps each statement well under the
+# 32767 bind parameter limit of the Postgres wire protocol
+UPSERT_CHUNK_SIZE = 1000
+
+
+ANSWER_UPSERT_COLUMNS = ("id", "attempt_id", "question_id", "student_answer")
+
+
+def answer_upsert_statement(rows: List[Dict[str, Any]]) -> Insert:
+    """
+    Build a multi-row INSERT ... SELECT ... ON CONFLICT DO UPDATE for attempt
+    answers. Each row needs 'attempt_id', 'question_id' and 'student_answer'.
+    Rows of attempts that are submitted (or gone) are skipped, so a late
+    write can never change an attempt that has been graded.
+    """
+    incoming = values(
+        *(column(name, AttemptAnswer.__table__.c[name].type) for name in ANSWER_UPSERT_COLUMNS),
+        name="incoming"
+    ).data([
+        (uuid.uuid4(), row["attempt_id"], row["question_id"], row["student_answer"])
+        for row in rows
+    ])
+    open_rows = (
+        select(*(incoming.c[name] for name in ANSWER_UPSERT_COLUMNS))
+        .join(ExamAttempt, ExamAttempt.id == incoming.c.attempt_id)
+        .where(ExamAttempt.is_submitted == False)
+    )
+    insert_stmt = pg_insert(AttemptAnswer).from_select(list(ANSWER_UPSERT_COLUMNS), open_rows)
+    return insert_stmt.on_conflict_do_update(
+        constraint="uq_attempt_answers_attempt_question",
+        set_={"student_answer": insert_stmt.excluded.student_answer}
+    )
+
+
+_grading_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_grading_pool() -> ProcessPoolExecutor:
+    global _grading_pool
+    if _grading_pool is None:
+        _grading_pool = ProcessPoolExecutor(
+            max_workers=settings.GRADING_PROCESS_WORKERS)
+    return _grading_pool
+
+
+def shutdown_grading_pool() -> None:
+    global _grading_pool
+    if _grading_pool is not None:
+        _grading_pool.shutdown(cancel_futures=True)
+        _grading_pool = None
+
+
+async def grade_attempts_in_pool(
+    table: Mapping[uuid.UUID, Tuple[Dict[Any, int], int, int]],
+    attempts: List[Tuple[uuid.UUID, Dict[uuid.UUID, Any]]],
+) -> Dict[uuid.UUID, Tuple[Dict[uuid.UUID, float], float]]:
+    """
+    Grade (attempt_id, answers) pairs against a compiled grading table, split
+    across the grading process pool so large chunks do not hold the GIL of
+    the event loop's process.
+    """
+    workers = settings.GRADING_PROCESS_WORKERS
+    if workers <= 1 or len(attempts) < workers:
+        return grade_attempts_with_table(table, attempts)
+
+    loop = asyncio.get_running_loop()
+    pool = get_grading_pool()
+    size = -(-len(attempts) // workers)
+    parts = await asyncio.gather(*(
+        loop.run_in_executor(pool, grade_attempts_with_table, table, attempts[i:i + size])
+        for i in range(0, len(attempts), size)
+    ))
+
+    graded: Dict[uuid.UUID, Tuple[Dict[uuid.UUID, float], float]] = {}
+    for part in parts:
+        graded.update(part)
+    return graded
+
+
+class AutosaveBuffer:
+    """
+    In-process write-behind buffer for autosaved answers.
+
+    Saves are coalesced per (attempt_id, question_id) so only the latest answer
+    is written. Pending answers are flushed in batched upserts every
+    `flush_interval` seconds, when `max_entries` is reached, on shutdown, and
+    for a single attempt right before it is graded. Anything still buffered
+    when the process dies is lost, so the loss window is bounded by the flush
+    interval (plus the duration of one flush).
+
+    The buffer is per process: a submit handled by another worker cannot
+    flush it, so write-behind is only safe with a single worker (see
+    settings.AUTOSAVE_WRITE_BEHIND). Answers for attempts that were
+    submitted meanwhile are dropped by the upsert, never written late.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession] = async_session,
+        flush_interval: float = settings.AUTOSAVE_FLUSH_INTERVAL_SECONDS,
+        max_entries: int = settings.AUTOSAVE_MAX_BUFFERED_ANSWERS,
+    ) -> None:
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval
+        self.max_entries = max_entries
+
+        self._pending: Dict[uuid.UUID, Dict[uuid.UUID, Dict[str, Any]]] = {}
+        self._pending_count = 0
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+        self._writes_received = 0
+        self._writes_coalesced = 0
+        self._entries_flushed = 0
+        self._entries_dropped = 0
+        self._flushes = 0
+        self._flush_failures = 0
+        self._last_flush_seconds = 0.0
+        self._max_flush_seconds = 0.0
+        self._total_flush_seconds = 0.0
+
+    async def add(self, attempt_id: uuid.UUID, answers: Dict[uuid.UUID, Dict[str, Any]]) -> None:
+        """Buffer the latest answers of an attempt, flushing if the buffer is full."""
+        attempt_answers = self._pending.setdefault(attempt_id, {})
+        for question_id, student_answer in answers.items():
+            if question_id in attempt_answers:
+                self._writes_coalesced += 1
+            else:
+                self._pending_count += 1
+            attempt_answers[question_id] = student_answer
+        self._writes_received += len(answers)
+
+        if self._pending_count >= self.max_entries:
+            try:
+                await self.flush()
+            except Exception:
+                # The answers stay buffered and the timer retries the flush
+                pass
+
+    async def flush(self, attempt_id: Optional[uuid.UUID] = None) -> int:
+        """
+        Write buffered answers to the database, either for every attempt or
+        only for `attempt_id`. Returns the number of answers written.
+        """
+        # Serialized so an older batch can never commit after a newer one
+        async with self._flush_lock:
+            if attempt_id is None:
+                batch, self._pending = self._pending, {}
+            else:
+                attempt_answers = self._pending.pop(attempt_id, None)
+                batch = {attempt_id: attempt_answers} if attempt_answers else {}
+
+            rows = [
+                {"attempt_id": a_id, "question_id": q_id, "student_answer": answer}
+                for a_id, attempt_answers in batch.items()
+                for q_id, answer in attempt_answers.items()
+            ]
+            self._pending_count -= len(rows)
+            if not rows:
+                return 0
+
+            started = time.perf_counter()
+            try:
+                try:
+                    written = await self._write(rows)
+                except DBAPIError as e:
+                    if _is_transient(e):
+                        raise
+                    # A row the database rejects would fail every retry of the
+                    # whole batch: write attempt by attempt and drop the bad ones
+                    logger.warning("Autosave flush of %d answers rejected (%s); retrying per attempt", len(rows), e)
+                    written = await self._write_each(batch)
+            except BaseException:
+                # Connection problems, and cancellation of the timer task mid-flush
+                self._flush_failures += 1
+                self._requeue(batch)
+                logger.exception("Autosave flush of %d answers failed", len(rows))
+                raise
+            finally:
+                elapsed = time.perf_counter() - started
+                self._last_flush_seconds = elapsed
+                self._max_flush_seconds = max(self._max_flush_seconds, elapsed)
+                self._total_flush_seconds += elapsed
+                self._flushes += 1
+
+            self._entries_flushed += written
+            # Skipped by the upsert (attempt submitted) or rejected by the database
+            self._entries_dropped += len(rows) - written
+            return written
+
+    async def _write(self, rows: List[Dict[str, Any]]) -> int:
+        """Upsert rows in one transaction; returns how many were written."""
+        written = 0
+        async with self.session_factory() as session:
+            for i in range(0, len(rows), UPSERT_CHUNK_SIZE):
+                result = await session.execute(answer_upsert_statement(rows[i:i + UPSERT_CHUNK_SIZE]))
+                written += result.rowcount
+            await session.commit()
+        return written
+
+    async def _write_each(self, batch: Dict[uuid.UUID, Dict[uuid.UUID, Dict[str, Any]]]) -> int:
+        """Upsert each attempt's answers in its own transaction, dropping attempts the database rejects."""
+        written = 0
+        for attempt_id, attempt_answers in batch.items():
+            rows = [
+                {"attempt_id": attempt_id, "question_id": q_id, "student_answer": answer}
+                for q_id, answer in attempt_answers.items()
+            ]
+            try:
+                written += await self._write(rows)
+            except DBAPIError as e:
+                if _is_transient(e):
+                    raise
+                logger.error("Dropping %d autosaved answers of attempt %s: %s", len(rows), attempt_id, e)
+        return written
+
+    def _requeue(self, batch: Dict[uuid.UUID, Dict[uuid.UUID, Dict[str, Any]]]) -> None:
+        # Answers saved while the failed flush was running are newer; keep them
+        for attempt_id, attempt_answers in batch.items():
+            pending = self._pending.setdefault(attempt_id, {})
+            for question_id, student_answer in attempt_answers.items():
+                if question_id not in pending:
+                    pending[question_id] = student_answer
+                    self._pending_count += 1
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                # Already logged and requeued; retry on the next tick
+                pass
+
+    def start(self) -> None:
+        """Start the periodic flush task on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the periodic flush task and write out everything still buffered."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "enabled": settings.AUTOSAVE_WRITE_BEHIND,
+            "flush_interval_seconds": self.flush_interval,
+            "buffered_attempts": len(self._pending),
+            "buffered_entries": self._pending_count,
+            "writes_received": self._writes_received,
+            "writes_coalesced": self._writes_coalesced,
+            "coalescing_ratio": (
+                self._writes_coalesced / self._writes_received
+                if self._writes_received else 0.0
+            ),
+            "entries_flushed": self._entries_flushed,
+            "entries_dropped": self._entries_dropped,
+            "flushes": self._flushes,
+            "flush_failures": self._flush_failures,
+            "last_flush_ms": self._last_flush_seconds * 1000,
+            "max_flush_ms": self._max_flush_seconds * 1000,
+            "avg_flush_ms": (
+                self._total_flush_seconds / self._flushes * 1000
+                if self._flushes else 0.0
+            ),
+        }
+
+
+def _is_transient(error: DBAPIError) -> bool:
+    """Whether retrying the same statement later can succeed (lost connection, server down)."""
+    return error.connection_invalidated or isinstance(error, (OperationalError, InterfaceError))
+
+
+autosave_buffer = AutosaveBuffer()
+
+
+class ScoreIndex:
+    """
+    Ordered score index for one exam.
+
+    A Fenwick tree over integer total scores holds how many attempts have
+    each score, so recording a score, an attempt's rank and its percentile
+    are all O(log S) where S is the highest score seen. The tree is one slot
+    per possible score, so scores above `max_tree_score` are kept in a
+    sorted list instead (O(n) inserts, but only outliers land there).
+    Attempts with equal scores share a rank (1 + number of strictly higher
+    scores).
+    """
+
+    def __init__(self, max_tree_score: int = settings.LEADERBOARD_TREE_MAX_SCORE) -> None:
+        self.max_tree_score = max_tree_score
+        self._size = 1
+        self._tree = [0] * 2
+        self._high: List[int] = []
+        self._scores: Dict[uuid.UUID, int] = {}
+        self._buckets: Dict[int, Dict[uuid.UUID, None]] = {}
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+    def _update(self, score: int, delta: int) -> None:
+        i = score + 1
+        while i <= self._size:
+            self._tree[i] += delta
+            i += i & -i
+
+    def _count_at_most(self, score: int) -> int:
+        i = min(score + 1, self._size)
+        count = 0
+        while i > 0:
+            count += self._tree[i]
+            i -= i & -i
+        if self._high:
+            count += bisect.bisect_right(self._high, score)
+        return count
+
+    def _kth_smallest(self, k: int) -> int:
+        in_tree = len(self._scores) - len(self._high)
+        if k > in_tree:
+            return self._high[k - in_tree - 1]
+        # Binary descent: smallest score whose cumulative count reaches k
+        pos = 0
+        step = self._size
+        while step:
+            nxt = pos + step
+            if nxt <= self._size and self._tree[nxt] < k:
+                pos = nxt
+                k -= self._tree[nxt]
+            step >>= 1
+        return pos
+
+    def _grow(self, score: int) -> None:
+        size = self._size
+        while score >= size:
+            size *= 2
+        self._size = size
+        self._tree = [0] * (size + 1)
+        for bucket_score, bucket in self._buckets.items():
+            if bucket_score <= self.max_tree_score:
+                self._update(bucket_score, len(bucket))
+
+    def record(self, attempt_id: uuid.UUID, total_score: Optional[float]) -> None:
+        score = max(int(round(total_score or 0)), 0)
+        previous = self._scores.get(attempt_id)
+        if previous == score:
+            return
+        if previous is not None:
+            self.remove(attempt_id)
+
+        if score > self.max_tree_score:
+            bisect.insort(self._high, score)
+        else:
+            if score >= self._size:
+                self._grow(score)
+            self._update(score, 1)
+
+        self._scores[attempt_id] = score
+        self._buckets.setdefault(score, {})[attempt_id] = None
+
+    def remove(self, attempt_id: uuid.UUID) -> None:
+        score = self._scores.pop(attempt_id, None)
+        if score is None:
+            return
+        bucket = self._buckets[score]
+        del bucket[attempt_id]
+        if not bucket:
+            del self._buckets[score]
+        if score > self.max_tree_score:
+            del self._high[bisect.bisect_left(self._high, score)]
+        else:
+            self._update(score, -1)
+
+    def score_of(self, attempt_id: uuid.UUID) -> Optional[int]:
+        return self._scores.get(attempt_id)
+
+    def rank(self, attempt_id: uuid.UUID) -> Optional[int]:
+        score = self._scores.get(attempt_id)
+        if score is None:
+            return None
+        return len(self._scores) - self._count_at_most(score) + 1
+
+    def percentile(self, attempt_id: uuid.UUID) -> Optional[float]:
+        """Share of attempts (in %) scoring at or below this attempt."""
+        score = self._scores.get(attempt_id)
+        if score is None:
+            return None
+        return 100.0 * self._count_at_most(score) / len(self._scores)
+
+    def top(self, limit: int) -> List[Tuple[int, uuid.UUID, int]]:
+        """(rank, attempt_id, score) of the best `limit` attempts, best first."""
+        total = len(self._scores)
+        entries: List[Tuple[int, uuid.UUID, int]] = []
+        k = total
+        while k > 0 and len(entries) < limit:
+            score = self._kth_smallest(k)
+            at_most = self._count_at_most(score)
+            rank = total - at_most + 1
+            bucket = self._buckets[score]
+            for attempt_id in bucket:
+                if len(entries) >= limit:
+                    break
+                entries.append((rank, attempt_id, score))
+            k = at_most - len(bucket)
+        return entries
+
+
+class Leaderboard:
+    """
+    Per-exam ScoreIndex registry.
+
+    Indexes are built from submitted attempts on startup (or on first use)
+    and kept current by submit, finalize and regrade in this process. Each
+    index is reloaded once it is older than `max_staleness` seconds so
+    results recorded by other worker processes show up as well.
+    """
+
+    def __init__(self, max_staleness: float = settings.LEADERBOARD_MAX_STALENESS_SECONDS) -> None:
+        self.max_staleness = max_staleness
+        self._indexes: Dict[uuid.UUID, ScoreIndex] = {}
+        self._loaded_at: Dict[uuid.UUID, float] = {}
+
+    def record(self, exam_id: uuid.UUID, attempt_id: uuid.UUID, total_score: Optional[float]) -> None:
+        # An exam that is not loaded yet will pick the score up from the database
+        index = self._indexes.get(exam_id)
+        if index is not None:
+            index.record(attempt_id, total_score)
+
+    def invalidate(self, exam_id: uuid.UUID) -> None:
+        self._indexes.pop(exam_id, None)
+        self._loaded_at.pop(exam_id, None)
+
+    async def get_index(self, db: AsyncSession, exam_id: uuid.UUID) -> ScoreIndex:
+        loaded_at = self._loaded_at.get(exam_id)
+        if loaded_at is None or time.monotonic() - loaded_at > self.max_staleness:
+            if not await self.load_exams(db, ExamAttempt.exam_id == exam_id):
+                # No submitted attempts yet
+                self._indexes[exam_id] = ScoreIndex()
+                self._loaded_at[exam_id] = time.monotonic()
+        return self._indexes[exam_id]
+
+    async def load_exams(self, db: AsyncSession, *criteria) -> int:
+        """(Re)build the indexes of every exam with submitted attempts matching `criteria`."""
+        stmt = (
+            select(ExamAttempt.exam_id, ExamAttempt.id, ExamAttempt.total_score)
+            .where(ExamAttempt.is_submitted == True, *criteria)
+            .execution_options(yield_per=10000)
+        )
+        indexes: Dict[uuid.UUID, ScoreIndex] = {}
+        result = await db.stream(stmt)
+        async for exam_id, attempt_id, total_score in result:
+            indexes.setdefault(exam_id, ScoreIndex()).record(attempt_id, total_score)
+
+        now = time.monotonic()
+        for exam_id, index in indexes.items():
+            self._indexes[exam_id] = index
+            self._loaded_at[exam_id] = now
+        return len(indexes)
+
+    async def rebuild(self) -> None:
+        """Load every non-archived exam's leaderboard; called on startup."""
+        async with async_session() as db:
+            stmt_filter = ExamAttempt.exam_id.in_(
+                select(Exam.id).where(Exam.status != ExamStatus.ARCHIVED))
+            count = await self.load_exams(db, stmt_filter)
+        logger.info("Leaderboard rebuilt for %d exams", count)
+
+
+leaderboard = Leaderboard()
+
+
+# JSON bodies of submitted attempts' results, keyed by attempt id. A submitted
+# result only changes on regrade, which invalidates it explicitly.
+result_summary_cache = LRUCache(
+    max_size=settings.RESULT_CACHE_SIZE, ttl=settings.RESULT_CACHE_TTL_SECONDS)
+full_result_cache = LRUCache(
+    max_size=settings.RESULT_CACHE_SIZE, ttl=settings.RESULT_CACHE_TTL_SECONDS)
+
+
+# (exam_id, user_id, shuffle_seed) of attempts, so a paper request for an
+# attempt already seen needs no database round trip. None of these change
+# after the attempt is created, so entries are only ever evicted.
+attempt_cache = LRUCache(max_size=settings.ATTEMPT_CACHE_SIZE)
+
+
+def invalidate_result_cache(attempt_id: uuid.UUID) -> None:
+    result_summary_cache.pop(attempt_id)
+    full_result_cache.pop(attempt_id)
+
+
+# Attempts per CSV/NDJSON chunk or Parquet row group, and DB rows per cursor fetch
+EXPORT_BATCH_ATTEMPTS = 500
+EXPORT_FETCH_ROWS = 5000
+
+EXPORT_FIELDS = (
+    "attempt_id", "user_id", "user_email", "start_time",
+    "end_time", "is_submitted", "total_score",
+)
+
+
+async def pivot_attempt_rows(rows: AsyncIterator[Any]) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Fold (attempt columns..., question_id, score) rows ordered by attempt id
+    into one record per attempt with a {question_id: score} map. Only the
+    attempt being assembled is held in memory.
+    """
+    record: Optional[Dict[str, Any]] = None
+    async for row in rows:
+        if record is None or record["attempt_id"] != row.attempt_id:
+            if record is not None:
+                yield record
+            record = {field: getattr(row, field) for field in EXPORT_FIELDS}
+            record["scores"] = {}
+        if row.question_id is not None:
+            record["scores"][row.question_id] = row.score
+    if record is not None:
+        yield record
+
+
+class CsvExportWriter:
+    media_type = "text/csv"
+    extension = "csv"
+
+    def __init__(self, question_ids: List[uuid.UUID]) -> None:
+        self.question_ids = question_ids
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer)
+
+    def _drain(self) -> bytes:
+        data = self._buffer.getvalue().encode()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return data
+
+    def header(self) -> bytes:
+        self._writer.writerow(list(EXPORT_FIELDS) + [str(q_id) for q_id in self.question_ids])
+        return self._drain()
+
+    def write(self, records: List[Dict[str, Any]]) -> bytes:
+        for record in records:
+            scores = record["scores"]
+            self._writer.writerow(
+                [record[field] for field in EXPORT_FIELDS]
+                + [scores.get(q_id) for q_id in self.question_ids]
+            )
+        return self._drain()
+
+    def close(self) -> bytes:
+        return b""
+
+
+class NdjsonExportWriter:
+    media_type = "application/x-ndjson"
+    extension = "ndjson"
+
+    def __init__(self, question_ids: List[uuid.UUID]) -> None:
+        self.question_ids = question_ids
+
+    def header(self) -> bytes:
+        return b""
+
+    def write(self, records: List[Dict[str, Any]]) -> bytes:
+        lines = []
+        for record in records:
+            record = dict(record, scores={str(q_id): score for q_id, score in record["scores"].items()})
+            lines.append(json.dumps(record, default=str))
+        return ("\n".join(lines) + "\n").encode()
+
+    def close(self) -> bytes:
+        return b""
+
+
+class _DrainingSink:
+    """
+    Write-only file object for pyarrow that hands written bytes back to the
+    caller instead of keeping them, while still reporting the absolute
+    position the Parquet footer offsets are based on.
+    """
+
+    def __init__(self) -> None:
+        self._chunks: List[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def writable(self) -> bool:
+        return True
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class ParquetExportWriter:
+    media_type = "application/vnd.apache.parquet"
+    extension = "parquet"
+
+    def __init__(self, question_ids: List[uuid.UUID]) -> None:
+        self.question_ids = question_ids
+        self._schema = pa.schema(
+            [
+                ("attempt_id", pa.string()),
+                ("user_id", pa.string()),
+                ("user_email", pa.string()),
+                ("start_time", pa.timestamp("us", tz="UTC")),
+                ("end_time", pa.timestamp("us", tz="UTC")),
+                ("is_submitted", pa.bool_()),
+                ("total_score", pa.float64()),
+            ]
+            + [(str(q_id), pa.float64()) for q_id in question_ids]
+        )
+        self._sink = _DrainingSink()
+        self._writer = pq.ParquetWriter(self._sink, self._schema)
+
+    def header(self) -> bytes:
+        return self._sink.drain()
+
+    def write(self, records: List[Dict[str, Any]]) -> bytes:
+        columns: Dict[str, List[Any]] = {
+            "attempt_id": [str(r["attempt_id"]) for r in records],
+            "user_id": [str(r["user_id"]) for r in records],
+            "user_email": [r["user_email"] for r in records],
+            "start_time": [r["start_time"] for r in records],
+            "end_time": [r["end_time"] for r in records],
+            "is_submitted": [r["is_submitted"] for r in records],
+            "total_score": [r["total_score"] for r in records],
+        }
+        for q_id in self.question_ids:
+            columns[str(q_id)] = [r["scores"].get(q_id) for r in records]
+        # Each batch becomes one row group, flushed to the client right away
+        self._writer.write_table(pa.Table.from_pydict(columns, schema=self._schema))
+        return self._sink.drain()
+
+    def close(self) -> bytes:
+        self._writer.close()
+        return self._sink.drain()
+
+
+EXPORT_WRITERS = {
+    "csv": CsvExportWriter,
+    "ndjson": NdjsonExportWriter,
+    "parquet": ParquetExportWriter,
+}
@@ -0,0 +1,137 @@
+import random
+import time
+import uuid
+
+import pytest
+
+import exam.services as exam_services
+from exam.models import Question
+from exam.services import ExamService
+from exam.utils import AnswerKeyCache, compile_question_key, grade_attempt, grade_attempts
+
+LABELS = ["A", "B", "C", "D", "E"]
+
+
+def set_grader(question, student_answer):
+    """The grader the compiled keys replaced: compare option sets."""
+    correct_answers = question.correct_answers.get("selected_options", [])
+    student_selected = student_answer.get("selected_options", [])
+    if question.ques_type in ("single_choice", "multiple_choice"):
+        return question.max_score if set(student_selected) == set(correct_answers) else 0.0
+    return 0.0
+
+
+def make_bank(rng, count):
+    bank = []
+    for _ in range(count):
+        ques_type = rng.choice(["single_choice", "multiple_choice"])
+        options = LABELS[:rng.randint(2, 5)]
+        if ques_type == "single_choice":
+            correct = [rng.choice(options)]
+        else:
+            correct = rng.sample(options, rng.randint(1, len(options)))
+        bank.append(Question(
+            id=uuid.uuid4(), version=1, ques_type=ques_type, max_score=rng.randint(1, 5),
+            options={label: f"option {label}" for label in options},
+            correct_answers={"selected_options": correct},
+        ))
+    return bank
+
+
+def random_answer(rng, question):
+    options = list(question.options)
+    roll = rng.random()
+    if roll < 0.4:
+        # Right answer, possibly reordered or repeated
+        selected = list(question.correct_answers["selected_options"])
+        rng.shuffle(selected)
+        if rng.random() < 0.2:
+            selected.append(selected[0])
+    elif roll < 0.8:
+        selected = rng.sample(options, rng.randint(0, len(options)))
+    elif roll < 0.9:
+        selected = [rng.choice(options), "Z"]
+    else:
+        return {}
+    return {"selected_options": selected}
+
+
+def test_compiled_keys_grade_like_the_set_grader():
+    rng = random.Random(4)
+    bank = make_bank(rng, 200)
+    keys = {question.id: compile_question_key(question) for question in bank}
+
+    for _ in range(50):
+        answers = {question.id: random_answer(rng, question) for question in bank}
+        expected = {question.id: set_grader(question, answers[question.id]) for question in bank}
+        scores, total = grade_attempt(keys, answers)
+        assert scores == expected
+        assert total == sum(expected.values())
+        for question in bank:
+            assert keys[question.id].grade(answers[question.id]) == expected[question.id]
+
+
+def test_exam_service_grades_through_the_key_cache(monkeypatch):
+    cache = AnswerKeyCache(max_size=10)
+    monkeypatch.setattr(exam_services, "answer_key_cache", cache)
+    question = make_bank(random.Random(1), 1)[0]
+    right = {"selected_options": question.correct_answers["selected_options"]}
+
+    assert ExamService()._grade_objective_question(question, right) == question.max_score
+    assert cache.get(question.id, 1) is not None
+    # A new version is compiled again rather than served stale
+    question.version = 2
+    question.correct_answers = {"selected_options": ["Z"]}
+    assert ExamService()._grade_objective_question(question, right) == 0.0
+
+
+def test_answer_key_cache_is_bounded_and_keyed_by_version():
+    cache = AnswerKeyCache(max_size=2)
+    first, second, third = (compile_question_key(q) for q in make_bank(random.Random(2), 3))
+    cache.put(first)
+    cache.put(second)
+    cache.get(first.question_id, 1)
+    cache.put(third)
+    assert cache.get(second.question_id, 1) is None
+    assert cache.get(first.question_id, 1) is first
+    assert cache.get(first.question_id, 2) is None
+    cache.invalidate(first.question_id)
+    assert cache.get(first.question_id, 1) is None
+
+
+@pytest.mark.parametrize("attempts, questions", [(2000, 50)])
+def test_batch_grading_throughput(attempts, questions):
+    """
+    100k answers graded about 1us each here. The floor leaves room for slow
+    machines but catches a grader that falls back to per-answer objects.
+    """
+    rng = random.Random(7)
+    bank = make_bank(rng, questions)
+    keys = {question.id: compile_question_key(question) for question in bank}
+    batch = [
+        (attempt, {question.id: random_answer(rng, question) for question in bank})
+        for attempt in range(attempts)
+    ]
+
+    def set_grade_all():
+        by_id = {question.id: question for question in bank}
+        return {
+            attempt: sum(set_grader(by_id[q_id], answer) for q_id, answer in answers.items())
+            for attempt, answers in batch
+        }
+
+    def best_of(run, rounds=3):
+        timings = []
+        for _ in range(rounds):
+            started = time.perf_counter()
+            result = run()
+            timings.append(time.perf_counter() - started)
+        return min(timings), result
+
+    compiled_seconds, graded = best_of(lambda: grade_attempts(keys, batch))
+    set_seconds, expected = best_of(set_grade_all)
+
+    assert {attempt: total for attempt, (_, total) in graded.items()} == expected
+    assert attempts * questions / compiled_seconds > 200_000
+    # No slower than the grader it replaced, with headroom for timing noise
+    assert compiled_seconds < set_seconds * 1.5
@@ -0,0 +1,200 @@
+import asyncio
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+import result.utils as result_utils
+from result.utils import AutosaveBuffer, answer_upsert_statement
+
+A, B = uuid.UUID(int=1), uuid.UUID(int=2)
+Q1, Q2 = uuid.UUID(int=11), uuid.UUID(int=12)
+
+
+def answer(*options):
+    return {"selected_options": list(options)}
+
+
+class FakeDatabase:
+    """
+    attempt_answers as a dict, with the parts of the real upsert the buffer
+    relies on: rows of submitted attempts are skipped, a rejected row fails
+    the whole statement, and nothing is visible before commit.
+    """
+
+    def __init__(self) -> None:
+        self.answers = {}
+        self.submitted = set()
+        self.rejected = set()
+        self.fail_next = None
+        self.gate = None
+        self.executing = asyncio.Event()
+
+    def session(self):
+        return FakeSession(self)
+
+
+class FakeSession:
+    def __init__(self, db: FakeDatabase) -> None:
+        self.db = db
+        self.staged = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def execute(self, stmt):
+        self.db.executing.set()
+        if self.db.gate is not None:
+            await self.db.gate.wait()
+        if self.db.fail_next is not None:
+            error, self.db.fail_next = self.db.fail_next, None
+            raise error
+        written = 0
+        for row in stmt.rows:
+            if row["attempt_id"] in self.db.rejected:
+                raise IntegrityError("INSERT", {}, Exception("violates check constraint"))
+            if row["attempt_id"] in self.db.submitted:
+                continue
+            self.staged[(row["attempt_id"], row["question_id"])] = row["student_answer"]
+            written += 1
+        return SimpleNamespace(rowcount=written)
+
+    async def commit(self):
+        self.db.answers.update(self.staged)
+
+
+@pytest.fixture
+def db(monkeypatch):
+    monkeypatch.setattr(result_utils, "answer_upsert_statement", lambda rows: SimpleNamespace(rows=rows))
+    return FakeDatabase()
+
+
+def make_buffer(db, max_entries=1000):
+    return AutosaveBuffer(session_factory=db.session, flush_interval=3600, max_entries=max_entries)
+
+
+def test_saves_are_coalesced_to_the_latest_answer(db):
+    buffer = make_buffer(db)
+
+    async def run():
+        await buffer.add(A, {Q1: answer("A")})
+        await buffer.add(A, {Q1: answer("B"), Q2: answer("C")})
+        await buffer.add(A, {Q1: answer("D")})
+        return await buffer.flush()
+
+    assert asyncio.run(run()) == 2
+    assert db.answers == {(A, Q1): answer("D"), (A, Q2): answer("C")}
+    metrics = buffer.metrics()
+    assert metrics["writes_received"] == 4
+    assert metrics["writes_coalesced"] == 2
+    assert metrics["buffered_entries"] == 0
+
+
+def test_flush_of_one_attempt_leaves_the_others_buffered(db):
+    buffer = make_buffer(db)
+
+    async def run():
+        await buffer.add(A, {Q1: answer("A")})
+        await buffer.add(B, {Q1: answer("B")})
+        return await buffer.flush(A)
+
+    assert asyncio.run(run()) == 1
+    assert db.answers == {(A, Q1): answer("A")}
+    assert buffer.metrics()["buffered_entries"] == 1
+
+
+def test_full_buffer_flushes_on_add(db):
+    buffer = make_buffer(db, max_entries=2)
+
+    async def run():
+        await buffer.add(A, {Q1: answer("A")})
+        assert db.answers == {}
+        await buffer.add(B, {Q1: answer("B")})
+
+    asyncio.run(run())
+    assert len(db.answers) == 2
+
+
+def test_failed_flush_is_requeued_and_retried(db):
+    buffer = make_buffer(db)
+
+    async def run():
+        await buffer.add(A, {Q1: answer("A")})
+        db.fail_next = OperationalError("INSERT", {}, Exception("server closed the connection"))
+        with pytest.raises(OperationalError):
+            await buffer.flush()
+        assert db.answers == {}
+        assert buffer.metrics()["buffered_entries"] == 1
+        return await buffer.flush()
+
+    assert asyncio.run(run()) == 1
+    assert db.answers == {(A, Q1): answer("A")}
+    assert buffer.metrics()["flush_failures"] == 1
+
+
+def test_cancelled_flush_is_requeued_behind_newer_saves(db):
+    buffer = make_buffer(db)
+
+    async def run():
+        await buffer.add(A, {Q1: answer("old"), Q2: answer("kept")})
+        db.gate = asyncio.Event()
+        flush = asyncio.create_task(buffer.flush())
+        await db.executing.wait()
+        # Saved while the flush is in flight: newer than what it was writing
+        await buffer.add(A, {Q1: answer("new")})
+        flush.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await flush
+        db.gate = None
+        return await buffer.flush()
+
+    assert asyncio.run(run()) == 2
+    assert db.answers == {(A, Q1): answer("new"), (A, Q2): answer("kept")}
+
+
+def test_rejected_attempt_is_dropped_without_blocking_the_batch(db):
+    buffer = make_buffer(db)
+    db.rejected.add(A)
+
+    async def run():
+        await buffer.add(A, {Q1: answer("A")})
+        await buffer.add(B, {Q1: answer("B"), Q2: answer("C")})
+        written = await buffer.flush()
+        # Not requeued: the next flush has nothing left to retry
+        return written, await buffer.flush()
+
+    assert asyncio.run(run()) == (2, 0)
+    assert db.answers == {(B, Q1): answer("B"), (B, Q2): answer("C")}
+    metrics = buffer.metrics()
+    assert metrics["entries_dropped"] == 1
+    assert metrics["buffered_entries"] == 0
+
+
+def test_answers_of_submitted_attempts_are_never_written(db):
+    buffer = make_buffer(db)
+
+    async def run():
+        await buffer.add(A, {Q1: answer("A")})
+        await buffer.add(B, {Q1: answer("B")})
+        db.submitted.add(A)
+        written = await buffer.flush()
+        return written, await buffer.flush()
+
+    assert asyncio.run(run()) == (1, 0)
+    assert db.answers == {(B, Q1): answer("B")}
+    assert buffer.metrics()["entries_dropped"] == 1
+
+
+def test_upsert_only_selects_rows_of_open_attempts():
+    stmt = answer_upsert_statement([
+        {"attempt_id": A, "question_id": Q1, "student_answer": answer("A")},
+    ])
+    sql = str(stmt.compile(dialect=postgresql.dialect()))
+    assert "JOIN exam_attempts ON exam_attempts.id = incoming.attempt_id" in sql
+    assert "WHERE exam_attempts.is_submitted = false" in sql
+    assert "ON CONFLICT ON CONSTRAINT uq_attempt_answers_attempt_question DO UPDATE" in sql
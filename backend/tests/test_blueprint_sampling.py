@@ -0,0 +1,79 @@
+import asyncio
+import bisect
+import random
+import uuid
+from types import SimpleNamespace
+
+import exam.services as exam_services
+from exam.schemas import BlueprintSection
+from exam.services import ExamService
+from sqlalchemy.dialects import postgresql
+
+
+class IndexSession:
+    """
+    Answers the sampler's queries from a sorted list of ids, as the id
+    index would: a probe returns the first id at or after each pivot, a
+    window the ids on one side of its pivot up to its LIMIT.
+    """
+
+    def __init__(self, ids) -> None:
+        self.ids = sorted(ids)
+        self.windows = []
+        self.rows_read = 0
+
+    async def execute(self, stmt):
+        query = stmt.compile(dialect=postgresql.dialect())
+        if "pivots" in query.params:
+            found = [bisect.bisect_left(self.ids, pivot) for pivot in query.params["pivots"]]
+            rows = [self.ids[at] for at in found if at < len(self.ids)]
+        else:
+            sql, pivot, limit = str(query), query.params["id_1"], query.params["param_1"]
+            assert "ORDER BY questions.id" in sql
+            at = bisect.bisect_left(self.ids, pivot)
+            rows = self.ids[at:at + limit] if "questions.id >= " in sql else self.ids[:at][:limit]
+            self.windows.append(limit)
+        self.rows_read += len(rows)
+        return SimpleNamespace(scalars=lambda: iter(rows))
+
+
+def sample(session, count, exclude=(), seed=0):
+    section = BlueprintSection(count=count, complexity="easy")
+    return asyncio.run(ExamService()._sample_section(session, section, set(exclude), None, random.Random(seed)))
+
+
+def test_small_pool_is_drawn_completely_without_repeats():
+    pool = [uuid.uuid4() for _ in range(12)]
+    taken = set(pool[:4])
+    picked = sample(IndexSession(pool), 8, exclude=taken)
+    assert sorted(picked) == sorted(set(pool) - taken)
+
+    assert len(sample(IndexSession(pool), 20)) == 12
+
+
+def test_fallback_reads_one_window_not_the_pool(monkeypatch):
+    """
+    The fallback used to read every matching id. It now reads one window
+    sized by the draw, so its cost does not grow with the section's pool.
+    """
+    monkeypatch.setattr(exam_services, "BLUEPRINT_SAMPLE_ROUNDS", 0)
+    pool = [uuid.uuid4() for _ in range(100_000)]
+    taken = set(random.Random(1).sample(pool, 10))
+    session = IndexSession(pool)
+
+    picked = sample(session, 5, exclude=taken)
+    assert len(set(picked)) == 5 and not taken & set(picked)
+    window = 5 * exam_services.BLUEPRINT_OVERSAMPLE + len(taken)
+    assert sum(session.windows) == window
+    assert session.rows_read <= window
+
+
+def test_window_wraps_around_past_the_last_id(monkeypatch):
+    monkeypatch.setattr(exam_services, "BLUEPRINT_SAMPLE_ROUNDS", 0)
+    # Every id sorts below any pivot the sampler will draw
+    pool = [uuid.UUID(int=number) for number in range(1, 1000)]
+    session = IndexSession(pool)
+
+    picked = sample(session, 3)
+    assert len(session.windows) == 2
+    assert set(picked) <= set(pool[:3 * exam_services.BLUEPRINT_OVERSAMPLE])
@@ -0,0 +1,186 @@
+import asyncio
+import socket
+import time
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from aiosmtpd.controller import Controller
+from sqlalchemy.dialects import postgresql
+
+import auth.services as auth_services
+from auth.services import deliver_email_outbox_batch, email_outbox_claim_limit
+from conf.config import settings
+from conf.utils import SMTPConnectionPool, create_message
+
+
+class RecordingHandler:
+    """aiosmtpd handler that keeps every message and the connection it came on."""
+
+    def __init__(self, delay: float = 0.0) -> None:
+        self.delay = delay
+        self.messages = []
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.messages.append((id(session), envelope.rcpt_tos, envelope.content))
+        return "250 Message accepted for delivery"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_server(monkeypatch):
+    """Starts local SMTP stand-ins on one port; call with a handler, get its controller."""
+    port = free_port()
+    monkeypatch.setattr(settings, "MAIL_SERVER", "127.0.0.1")
+    monkeypatch.setattr(settings, "MAIL_PORT", port)
+    monkeypatch.setattr(settings, "MAIL_STARTTLS", False)
+    monkeypatch.setattr(settings, "MAIL_SSL_TLS", False)
+    monkeypatch.setattr(settings, "USE_CREDENTIALS", False)
+    monkeypatch.setattr(settings, "MAIL_TIMEOUT_SECONDS", 2.0)
+    controllers = []
+
+    def start(handler):
+        controller = Controller(handler, hostname="127.0.0.1", port=port)
+        controller.start()
+        controllers.append(controller)
+        return controller
+
+    yield start
+    for controller in controllers:
+        if controller._thread is not None:
+            controller.stop()
+
+
+def messages(count: int):
+    return [create_message([f"student{i}@example.com"], f"Subject {i}", f"<p>{i}</p>") for i in range(count)]
+
+
+def test_pool_reuses_its_connections(smtp_server):
+    handler = RecordingHandler()
+    smtp_server(handler)
+    pool = SMTPConnectionPool(2)
+
+    async def run():
+        try:
+            return await pool.send_many(messages(10))
+        finally:
+            await pool.close()
+
+    assert asyncio.run(run()) == [None] * 10
+    assert sorted(rcpt for _, (rcpt,), _ in handler.messages) == sorted(f"student{i}@example.com" for i in range(10))
+    # Ten messages over at most two SMTP sessions
+    assert len({session for session, _, _ in handler.messages}) <= 2
+
+
+def test_pool_reconnects_after_the_server_drops_it(smtp_server):
+    first = RecordingHandler()
+    controller = smtp_server(first)
+    pool = SMTPConnectionPool(1)
+
+    async def send(message):
+        return await pool.send_many([message])
+
+    loop = asyncio.new_event_loop()
+    try:
+        assert loop.run_until_complete(send(messages(1)[0])) == [None]
+        controller.stop()
+        second = RecordingHandler()
+        smtp_server(second)
+        assert loop.run_until_complete(send(messages(1)[0])) == [None]
+        loop.run_until_complete(pool.close())
+    finally:
+        loop.close()
+    assert len(first.messages) == 1
+    assert len(second.messages) == 1
+
+
+def test_send_is_cut_off_at_the_mail_timeout(smtp_server):
+    smtp_server(RecordingHandler(delay=settings.MAIL_TIMEOUT_SECONDS * 3))
+    pool = SMTPConnectionPool(1)
+
+    async def run():
+        started = time.monotonic()
+        results = await pool.send_many(messages(1))
+        return results, time.monotonic() - started
+
+    (error,), elapsed = asyncio.run(run())
+    assert isinstance(error, TimeoutError)
+    assert elapsed < settings.MAIL_TIMEOUT_SECONDS * 2
+
+
+@pytest.mark.parametrize("lease, timeout, connections, batch, expected", [
+    (300, 30, 2, 100, 18),
+    (60, 30, 2, 100, 2),
+    (10, 30, 2, 100, 1),
+    (3600, 1, 4, 100, 100),
+])
+def test_claim_limit_fits_the_batch_inside_the_lease(monkeypatch, lease, timeout, connections, batch, expected):
+    monkeypatch.setattr(settings, "EMAIL_OUTBOX_LEASE_SECONDS", lease)
+    monkeypatch.setattr(settings, "MAIL_TIMEOUT_SECONDS", timeout)
+    monkeypatch.setattr(settings, "EMAIL_OUTBOX_BATCH_SIZE", batch)
+    monkeypatch.setattr(auth_services, "smtp_pool", SMTPConnectionPool(connections))
+
+    limit = email_outbox_claim_limit()
+    assert limit == expected
+    if expected > 1:
+        # Sends on the busiest connection, plus one spare timeout, fit in the lease
+        assert (-(-limit // connections) + 1) * timeout <= lease
+
+
+class FakeOutboxSession:
+    """Returns the claimed rows for the claim UPDATE and records every statement."""
+
+    def __init__(self, outbox) -> None:
+        self.outbox = outbox
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def execute(self, stmt):
+        self.outbox.statements.append(stmt)
+        if len(self.outbox.statements) == 1:
+            return SimpleNamespace(all=lambda: self.outbox.rows)
+        return SimpleNamespace()
+
+    async def commit(self):
+        pass
+
+
+def test_outbox_batch_claims_a_bounded_lease_and_delivers(smtp_server, monkeypatch):
+    handler = RecordingHandler()
+    smtp_server(handler)
+    pool = SMTPConnectionPool(2)
+    monkeypatch.setattr(auth_services, "smtp_pool", pool)
+    monkeypatch.setattr(settings, "EMAIL_OUTBOX_LEASE_SECONDS", 20.0)
+
+    outbox = SimpleNamespace(statements=[], rows=[
+        SimpleNamespace(id=uuid.uuid4(), recipients=[f"student{i}@example.com"],
+                        subject=f"Subject {i}", body="<p>hi</p>", attempts=1)
+        for i in range(3)
+    ])
+    monkeypatch.setattr(auth_services, "async_session", lambda: FakeOutboxSession(outbox))
+
+    async def run():
+        try:
+            return await deliver_email_outbox_batch()
+        finally:
+            await pool.close()
+
+    assert asyncio.run(run()) == 3
+    assert len(handler.messages) == 3
+
+    claim = outbox.statements[0].compile(dialect=postgresql.dialect())
+    # 2 connections * (20s lease // 2s timeout - 1)
+    assert email_outbox_claim_limit() == 18
+    assert 18 in claim.params.values()
+    assert "LIMIT" in str(claim) and "FOR UPDATE SKIP LOCKED" in str(claim)
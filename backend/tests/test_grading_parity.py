@@ -0,0 +1,134 @@
+import asyncio
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.dialects import postgresql
+
+from exam.models import Question
+from exam.utils import compile_question_key, grade_attempt
+from result.models import ExamAttempt
+from result.schemas import AttemptAnswerBase, ExamAttemptProgress
+from result.services import ResultService
+
+Q = uuid.UUID(int=1)
+MISSING = object()
+
+
+def jsonb_contains(left, right, top_level=True):
+    """Postgres `left @> right` on decoded JSON values."""
+    if isinstance(left, list):
+        if isinstance(right, list):
+            return all(any(_element_contains(item, wanted) for item in left) for wanted in right)
+        # Only a top-level array may contain a bare scalar
+        return top_level and not isinstance(right, dict) and any(_same_scalar(item, right) for item in left)
+    if isinstance(left, dict):
+        return isinstance(right, dict) and all(
+            key in left and jsonb_contains(left[key], value, top_level=False) for key, value in right.items())
+    return not isinstance(right, (list, dict)) and _same_scalar(left, right)
+
+
+def _element_contains(item, wanted):
+    if isinstance(wanted, (list, dict)):
+        return type(item) is type(wanted) and jsonb_contains(item, wanted, top_level=False)
+    return not isinstance(item, (list, dict)) and _same_scalar(item, wanted)
+
+
+def _same_scalar(a, b):
+    # jsonb has distinct boolean and number types; Python has True == 1
+    return type(a) is type(b) and a == b or (
+        isinstance(a, (int, float)) and isinstance(b, (int, float))
+        and not isinstance(a, bool) and not isinstance(b, bool) and a == b)
+
+
+def sql_score(student_answer, correct_answers, max_score):
+    """The CASE expression ResultService._regrade runs, on decoded JSON."""
+    def selected_options(document):
+        if isinstance(document, dict) and "selected_options" in document:
+            return document["selected_options"]
+        return []
+
+    selected = selected_options(student_answer)
+    correct = selected_options(correct_answers)
+    if isinstance(selected, list) and jsonb_contains(selected, correct) and jsonb_contains(correct, selected):
+        return max_score
+    return 0
+
+
+QUESTIONS = {
+    "single": Question(id=Q, version=1, ques_type="single_choice", max_score=2,
+                       options={"A": "1", "B": "2", "C": "3"}, correct_answers={"selected_options": ["A"]}),
+    "multiple": Question(id=Q, version=1, ques_type="multiple_choice", max_score=3,
+                         options={"A": "1", "B": "2", "C": "3"}, correct_answers={"selected_options": ["A", "C"]}),
+    "no_key": Question(id=Q, version=1, ques_type="multiple_choice", max_score=1,
+                       options={"A": "1", "B": "2"}, correct_answers={}),
+}
+
+SELECTIONS = [
+    ["A"], ["C", "A"], ["A", "C", "A"], ["A", "C"], ["B"], [], ["A", "B", "C"], ["D"], ["a"],
+    "A", "AC", "", 1, None, {"A": True}, [["A"]], [{"A": 1}], [1], [True], ["A", None],
+]
+
+
+@pytest.mark.parametrize("question", sorted(QUESTIONS))
+@pytest.mark.parametrize("selection", SELECTIONS + [MISSING], ids=repr)
+def test_compiled_grader_agrees_with_sql_regrade(question, selection):
+    question = QUESTIONS[question]
+    answer = {} if selection is MISSING else {"selected_options": selection}
+    key = compile_question_key(question)
+    expected = sql_score(answer, question.correct_answers, question.max_score)
+
+    assert key.grade(answer) == expected
+    assert grade_attempt({Q: key}, {Q: answer}) == ({Q: expected}, expected)
+
+
+@pytest.mark.parametrize("answer", [None, [], ["A"], "A"], ids=repr)
+def test_answers_that_are_not_objects_grade_as_an_empty_selection(answer):
+    for question in QUESTIONS.values():
+        key = compile_question_key(question)
+        expected = sql_score(answer, question.correct_answers, question.max_score)
+        assert key.grade(answer) == expected
+        assert grade_attempt({Q: key}, {Q: answer})[1] == expected
+
+
+def test_string_selection_is_not_read_as_characters():
+    key = compile_question_key(QUESTIONS["multiple"])
+    assert key.grade({"selected_options": "AC"}) == 0
+    assert key.grade({"selected_options": ["A", "C"]}) == 3
+
+
+def test_regrade_requires_an_array_selection():
+    captured = {}
+
+    class CapturingSession:
+        async def execute(self, stmt, execution_options=None):
+            captured["sql"] = stmt.compile(dialect=postgresql.dialect())
+            return SimpleNamespace(all=lambda: [])
+
+        async def commit(self):
+            pass
+
+    asyncio.run(ResultService()._regrade(CapturingSession(), ExamAttempt.exam_id == uuid.uuid4()))
+    sql = str(captured["sql"])
+    assert "jsonb_typeof(coalesce((CAST(attempt_answers.student_answer AS JSONB))[" in sql
+    assert captured["sql"].params["jsonb_typeof_1"] == "array"
+
+
+class ProgressSession:
+    """Enough of a session for save_attempt_progress to reach its validation."""
+
+    async def execute(self, stmt):
+        row = SimpleNamespace(questions_order=[Q], exam_id=uuid.uuid4(), shuffle_seed=None)
+        return SimpleNamespace(first=lambda: row)
+
+
+@pytest.mark.parametrize("selection", ["A", 1, None, {"A": True}, [1], [["A"]]], ids=repr)
+def test_non_list_selection_is_refused_at_save_time(selection):
+    progress = ExamAttemptProgress(answers=[
+        AttemptAnswerBase(question_id=Q, student_answer={"selected_options": selection})
+    ])
+    with pytest.raises(HTTPException) as refused:
+        asyncio.run(ResultService().save_attempt_progress(ProgressSession(), uuid.uuid4(), uuid.uuid4(), progress))
+    assert refused.value.status_code == 400
+    assert str(Q) in refused.value.detail
@@ -0,0 +1,86 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from fastapi import HTTPException
+
+import auth.utils as auth_utils
+from auth.utils import _run_hasher, generate_password_hash, verify_password
+from conf.config import settings
+
+
+@pytest.fixture
+def thread_hasher(monkeypatch):
+    """Hash in the loop's default thread pool (PASSWORD_HASH_WORKERS=0) with a small queue."""
+    monkeypatch.setattr(settings, "PASSWORD_HASH_WORKERS", 0)
+    monkeypatch.setattr(settings, "PASSWORD_HASH_MAX_QUEUE", 2)
+    monkeypatch.setattr(auth_utils, "_hash_pool", None)
+    assert auth_utils._hash_calls == 0
+
+
+def test_calls_past_workers_and_queue_are_shed_with_retry_after(thread_hasher):
+    release = threading.Event()
+
+    def slow_hash(password):
+        release.wait(5)
+        return f"hashed:{password}"
+
+    async def run():
+        admitted = [asyncio.create_task(_run_hasher(slow_hash, str(i))) for i in range(3)]
+        await asyncio.sleep(0)
+        # One worker plus a queue of two are busy: the next calls fail fast
+        shed = await asyncio.gather(*(_run_hasher(slow_hash, "x") for _ in range(5)), return_exceptions=True)
+        release.set()
+        return await asyncio.gather(*admitted), shed
+
+    admitted, shed = asyncio.run(run())
+    assert admitted == ["hashed:0", "hashed:1", "hashed:2"]
+    for error in shed:
+        assert isinstance(error, HTTPException)
+        assert error.status_code == 503
+        assert error.headers["Retry-After"] == str(settings.PASSWORD_HASH_RETRY_AFTER_SECONDS)
+    assert auth_utils._hash_calls == 0
+
+
+def test_failed_hash_frees_its_slot(thread_hasher):
+    def broken_hash(password):
+        raise ValueError("bad hash")
+
+    async def run():
+        for _ in range(5):
+            with pytest.raises(ValueError):
+                await _run_hasher(broken_hash, "x")
+
+    asyncio.run(run())
+    assert auth_utils._hash_calls == 0
+
+
+def test_argon2_runs_off_the_event_loop(thread_hasher, monkeypatch):
+    """
+    Inline Argon2 blocked the loop for the whole hash. With the pool, a
+    ticker on the loop keeps running while three logins verify.
+    """
+    password_hash = asyncio.run(generate_password_hash("correct horse"))
+
+    async def run():
+        delays = []
+
+        async def ticker():
+            while True:
+                started = time.perf_counter()
+                await asyncio.sleep(0.005)
+                delays.append(time.perf_counter() - started - 0.005)
+
+        probe = asyncio.create_task(ticker())
+        started = time.perf_counter()
+        results = await asyncio.gather(*(verify_password("correct horse", password_hash) for _ in range(3)))
+        elapsed = time.perf_counter() - started
+        probe.cancel()
+        return results, delays, elapsed
+
+    results, delays, elapsed = asyncio.run(run())
+    assert results == [(True, None)] * 3
+    # The loop kept ticking through the hashes instead of stalling behind them
+    assert len(delays) >= 3
+    assert max(delays) < max(0.05, elapsed / 2)
@@ -0,0 +1,84 @@
+import io
+import json
+import tracemalloc
+
+import pytest
+from openpyxl import Workbook
+
+from exam.utils import iter_question_chunks, iter_workbook_rows
+
+HEADER = ["Question", "Complexity", "Type", "Options", "Correct_Answers", "Max_Score", "Tags", "Notes"]
+
+
+def workbook(rows, header=HEADER):
+    book = Workbook(write_only=True)
+    sheet = book.create_sheet()
+    sheet.append(header)
+    for row in rows:
+        sheet.append(row)
+    buffer = io.BytesIO()
+    book.save(buffer)
+    buffer.seek(0)
+    return buffer
+
+
+def question_row(number):
+    return [
+        f"Question {number}", "easy", "single_choice",
+        json.dumps({"A": "yes", "B": "no"}), json.dumps({"selected_options": ["A"]}),
+        1 + number % 5, "algebra, week 1", "ignored",
+    ]
+
+
+def test_chunks_are_bounded_and_report_bad_rows_by_number():
+    rows = [question_row(number) for number in range(1, 26)]
+    rows[4][3] = "{not json"
+    rows[9][5] = "lots"
+    rows.insert(12, [None] * len(HEADER))
+    chunks = list(iter_question_chunks(workbook(rows), chunk_size=10))
+
+    assert [chunk.rows_read for chunk in chunks] == [10, 10, 5]
+    # Row 1 is the header, and the blank row 14 is skipped without being counted
+    assert [chunk.last_row for chunk in chunks] == [11, 22, 27]
+    questions = [question for chunk in chunks for question in chunk.questions]
+    errors = [error for chunk in chunks for error in chunk.errors]
+    assert len(questions) == 23
+    assert errors[0].startswith("Row 6 ('Question 5'): Invalid JSON")
+    assert errors[1].startswith("Row 11 ('Question 10'): max_score")
+    assert questions[0]["tags"] == ["algebra", "week 1"]
+    assert questions[0]["content_hash"]
+    assert "Notes" not in questions[0] and "notes" not in questions[0]
+
+
+def test_resumes_after_the_last_committed_row():
+    rows = [question_row(number) for number in range(1, 21)]
+    chunks = list(iter_question_chunks(workbook(rows), chunk_size=8, after_row=11))
+    titles = [question["title"] for chunk in chunks for question in chunk.questions]
+    assert titles == [f"Question {number}" for number in range(11, 21)]
+
+
+def test_missing_columns_are_reported_before_any_row():
+    with pytest.raises(ValueError, match="Missing required column"):
+        next(iter_workbook_rows(workbook([question_row(1)], header=HEADER[:3])))
+
+
+def test_memory_does_not_grow_with_the_workbook():
+    """
+    A 100k-row workbook parsed in ~20 s with 144 MB peak RSS, app imports
+    included. Only one chunk of rows is held at a time; what still grows is
+    openpyxl's shared-strings table (about 1.7x here for 10x the rows of
+    unique titles), nowhere near the 10x of loading every row.
+    """
+    def peak_bytes(row_count):
+        source = workbook(question_row(number) for number in range(row_count))
+        tracemalloc.start()
+        try:
+            read = sum(chunk.rows_read for chunk in iter_question_chunks(source, chunk_size=200))
+            return read, tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    small_rows, small_peak = peak_bytes(400)
+    large_rows, large_peak = peak_bytes(4000)
+    assert (small_rows, large_rows) == (400, 4000)
+    assert large_peak < 3 * small_peak
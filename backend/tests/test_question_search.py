@@ -0,0 +1,91 @@
+import asyncio
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.dialects import postgresql
+
+from exam.schemas import QuestionFilter, QuestionPageParams
+from exam.services import ExamService
+from exam.utils import build_prefix_tsquery, decode_cursor, escape_like
+
+
+@pytest.mark.parametrize("term, expected", [
+    ("alg", "alg:*"),
+    ("  linear   alg ", "linear & alg:*"),
+    ("a&b|!c:*", "a & b & c:*"),
+    ("(x) <-> 'y'", "x & y:*"),
+    ("théorème", "théorème:*"),
+    ("!!! & |", None),
+])
+def test_prefix_tsquery_keeps_only_words(term, expected):
+    assert build_prefix_tsquery(term) == expected
+
+
+def test_like_wildcards_are_escaped():
+    assert escape_like(r"50%_off\now") == r"50\%\_off\\now"
+
+
+class CapturingSession:
+    """Records the page query and returns `rows` for it."""
+
+    def __init__(self, rows=()) -> None:
+        self.rows = list(rows)
+        self.statements = []
+
+    async def execute(self, stmt):
+        self.statements.append(stmt.compile(dialect=postgresql.dialect()))
+        return SimpleNamespace(mappings=lambda: SimpleNamespace(all=lambda: self.rows))
+
+
+def page_row(rank):
+    return {
+        "id": uuid.uuid4(), "title": "Linear algebra", "complexity": "easy", "ques_type": "single_choice",
+        "max_score": 1, "tag_ids": [], "rank": rank, "snippet": "<mark>Linear</mark> algebra",
+    }
+
+
+def list_page(filters, page, rows=()):
+    session = CapturingSession(rows)
+    result = asyncio.run(ExamService().list_questions(session, filters, page))
+    return result, session.statements
+
+
+def test_search_uses_the_indexed_operators_and_ranks():
+    _, (query,) = list_page(QuestionFilter(search_term="50% alg"), QuestionPageParams(limit=20, fields="summary"))
+    sql = str(query)
+
+    # GIN tsvector match, escaped trigram ILIKE and word similarity, never a bare ILIKE scan
+    assert "questions.search_vector @@ to_tsquery(" in sql
+    assert "questions.title ILIKE %(title_1)s::VARCHAR ESCAPE '\\'" in sql
+    assert "questions.title %%> %(title_2)s::VARCHAR" in sql
+    assert query.params["title_1"] == "%50\\% alg%"
+    assert query.params["to_tsquery_2"] == "50 & alg:*"
+    assert "ORDER BY rank DESC, questions.id" in sql
+    assert query.params["param_1"] == 21
+    # Summary pages leave out the answer key; the tsvector is never selected
+    assert "correct_answers" not in sql and "SELECT questions.search_vector" not in sql
+
+
+def test_fuzzy_off_uses_only_full_text():
+    _, (query,) = list_page(QuestionFilter(search_term="alg", fuzzy=False), QuestionPageParams())
+    sql = str(query)
+    assert "@@ to_tsquery(" in sql
+    assert "ILIKE" not in sql and "%%>" not in sql
+
+
+def test_search_pages_continue_after_the_last_rank_and_id():
+    rows = [page_row(rank) for rank in (0.9, 0.5, 0.5)]
+    page, _ = list_page(QuestionFilter(search_term="linear"), QuestionPageParams(limit=2, fields="summary"), rows)
+    assert [item.rank for item in page.items] == [0.9, 0.5]
+    position = decode_cursor(page.next_cursor)
+    assert position == {"id": str(rows[1]["id"]), "rank": 0.5}
+
+    _, (query,) = list_page(QuestionFilter(search_term="linear"),
+                            QuestionPageParams(limit=2, fields="summary", cursor=page.next_cursor))
+    assert "< %(param_1)s OR" in str(query) and "questions.id > %(id_1)s" in str(query)
+
+    with pytest.raises(HTTPException) as invalid:
+        list_page(QuestionFilter(search_term="linear"), QuestionPageParams(cursor="not-a-cursor"))
+    assert invalid.value.status_code == 400
@@ -0,0 +1,106 @@
+import asyncio
+import csv
+import io
+import json
+import tracemalloc
+import uuid
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+
+import result.services as result_services
+from result.services import ResultService
+from result.utils import pa
+
+QUESTIONS = [uuid.uuid4() for _ in range(5)]
+STARTED = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+class FakeExportSession:
+    """Stands in for async_session(): streams `attempts` attempts' rows, generated on the fly."""
+
+    def __init__(self, attempts: int) -> None:
+        self.attempts = attempts
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def stream(self, stmt):
+        return self._rows()
+
+    async def _rows(self):
+        user_id = uuid.uuid4()
+        for number in range(self.attempts):
+            attempt_id = uuid.UUID(int=number + 1)
+            for q_id in QUESTIONS:
+                yield SimpleNamespace(
+                    attempt_id=attempt_id, user_id=user_id, user_email="student@example.com",
+                    start_time=STARTED, end_time=STARTED, is_submitted=True,
+                    total_score=5.0, question_id=q_id, score=1.0,
+                )
+
+
+def export(monkeypatch, attempts: int, export_format: str, keep_output: bool = False):
+    """Run export_exam_results over fake rows; returns (peak traced bytes, output)."""
+    service = ResultService()
+
+    async def get_exam_by_id(db, exam_id):
+        return SimpleNamespace(questions_order=QUESTIONS)
+
+    monkeypatch.setattr(service.exam_service, "get_exam_by_id", get_exam_by_id)
+    monkeypatch.setattr(result_services, "async_session", lambda: FakeExportSession(attempts))
+
+    async def run():
+        chunks = []
+        writer, stream = await service.export_exam_results(None, uuid.uuid4(), export_format)
+        tracemalloc.start()
+        try:
+            async for chunk in stream:
+                if keep_output:
+                    chunks.append(chunk)
+            return tracemalloc.get_traced_memory()[1], b"".join(chunks)
+        finally:
+            tracemalloc.stop()
+
+    return asyncio.run(run())
+
+
+FORMATS = ["csv", "ndjson", pytest.param(
+    "parquet", marks=pytest.mark.skipif(pa is None, reason="pyarrow not installed"))]
+
+
+@pytest.mark.parametrize("export_format", FORMATS)
+def test_export_peak_memory_does_not_grow_with_attempts(monkeypatch, export_format):
+    small_peak, _ = export(monkeypatch, 5_000, export_format)
+    large_peak, _ = export(monkeypatch, 50_000, export_format)
+    # Ten times the attempts, the same batches in flight
+    assert large_peak < small_peak * 1.5
+
+
+def test_csv_export_has_one_row_per_attempt(monkeypatch):
+    _, output = export(monkeypatch, 1_200, "csv", keep_output=True)
+    rows = list(csv.reader(io.StringIO(output.decode())))
+    assert rows[0][-len(QUESTIONS):] == [str(q_id) for q_id in QUESTIONS]
+    assert len(rows) == 1 + 1_200
+    assert rows[1][-len(QUESTIONS):] == ["1.0"] * len(QUESTIONS)
+
+
+def test_ndjson_export_keys_scores_by_question(monkeypatch):
+    _, output = export(monkeypatch, 3, "ndjson", keep_output=True)
+    records = [json.loads(line) for line in output.decode().splitlines()]
+    assert len(records) == 3
+    assert records[0]["scores"] == {str(q_id): 1.0 for q_id in QUESTIONS}
+
+
+@pytest.mark.skipif(pa is None, reason="pyarrow not installed")
+def test_parquet_export_reads_back(monkeypatch):
+    import pyarrow.parquet as pq
+
+    _, output = export(monkeypatch, 1_200, "parquet", keep_output=True)
+    table = pq.read_table(io.BytesIO(output))
+    assert table.num_rows == 1_200
+    assert table.column(str(QUESTIONS[0])).to_pylist()[:2] == [1.0, 1.0]
@@ -0,0 +1,193 @@
+import asyncio
+import json
+import uuid
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+import result.services as result_services
+from conf.config import settings
+from exam.models import Exam, ExamStatus, Question
+from exam.schemas import ExamPaperOut, PaperQuestionOut
+from exam.utils import AnswerKeyCache, ExamPaper, compile_question_key
+from result.models import AttemptAnswer, ExamAttempt
+from result.services import ResultService
+from result.utils import attempt_cache, result_summary_cache
+
+
+class Rows:
+    """The result shapes ResultService reads: first(), unique().first(), unique().scalars().first()."""
+
+    def __init__(self, row) -> None:
+        self.row = row
+
+    def first(self):
+        return self.row
+
+    def unique(self):
+        return self
+
+    def scalars(self):
+        return self
+
+
+class CountingSession:
+    """Answers each execute() with the next scripted row and counts round trips."""
+
+    def __init__(self, *rows) -> None:
+        self.rows = list(rows)
+        self.statements = []
+        self.commits = 0
+        self.added = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def execute(self, stmt, *args, **kwargs):
+        self.statements.append(stmt)
+        return Rows(self.rows.pop(0))
+
+    def add(self, instance):
+        self.added.append(instance)
+
+    async def commit(self):
+        self.commits += 1
+
+
+def make_exam():
+    now = datetime.now(timezone.utc)
+    return Exam(id=uuid.uuid4(), title="Quiz", status=ExamStatus.PUBLISHED,
+                start_time=now - timedelta(hours=1), end_time=now + timedelta(hours=1),
+                questions_order=[])
+
+
+def test_resuming_an_attempt_is_one_query():
+    exam = make_exam()
+    attempt = ExamAttempt(id=uuid.uuid4(), exam_id=exam.id, user_id=uuid.uuid4(),
+                          shuffle_seed=None, attempt_answers=[])
+    session = CountingSession((exam, attempt))
+
+    assert asyncio.run(ResultService().start_exam_attempt(session, attempt.user_id, exam.id)) is attempt
+    assert len(session.statements) == 1
+    assert session.commits == 0
+
+
+def test_starting_an_attempt_is_one_query_and_one_insert():
+    exam = make_exam()
+    session = CountingSession((exam, None))
+
+    attempt = asyncio.run(ResultService().start_exam_attempt(session, uuid.uuid4(), exam.id))
+    # The insert goes out with the commit; nothing is refreshed afterwards
+    assert session.added == [attempt]
+    assert len(session.statements) == 1
+    assert session.commits == 1
+    attempt_cache.pop(attempt.id)
+
+
+def test_submit_grades_from_cached_keys_in_one_query(monkeypatch):
+    monkeypatch.setattr(settings, "AUTOSAVE_WRITE_BEHIND", False)
+    question = Question(id=uuid.uuid4(), version=1, ques_type="single_choice", max_score=4,
+                        options={"A": "yes", "B": "no"}, correct_answers={"selected_options": ["A"]})
+    keys = AnswerKeyCache()
+    keys.put(compile_question_key(question))
+    monkeypatch.setattr(result_services, "answer_key_cache", keys)
+
+    user_id = uuid.uuid4()
+    attempt = ExamAttempt(id=uuid.uuid4(), exam_id=uuid.uuid4(), user_id=user_id, is_submitted=False,
+                          attempt_answers=[AttemptAnswer(question_id=question.id, question=question,
+                                                         student_answer={"selected_options": ["A"]})])
+    session = CountingSession(attempt)
+
+    submitted = asyncio.run(ResultService().submit_exam_attempt(session, attempt.id, user_id))
+    assert submitted.is_submitted and submitted.total_score == 4
+    assert submitted.attempt_answers[0].score == 4
+    assert len(session.statements) == 1
+    assert session.commits == 1
+
+
+def test_submitted_summary_is_served_from_memory(monkeypatch):
+    attempt_id, exam_id, user_id = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    sessions = []
+
+    def open_session():
+        session = CountingSession(*scripted.pop(0))
+        sessions.append(session)
+        return session
+
+    summary_row = SimpleNamespace(
+        attempt_id=attempt_id, exam_title="Quiz", user_email="student@example.com",
+        is_submitted=True, total_score=4, graded_count=1, total_questions=1)
+    scripted = [
+        [SimpleNamespace(exam_id=exam_id, user_id=user_id, shuffle_seed=None)],
+        [summary_row],
+    ]
+    monkeypatch.setattr(result_services, "async_session", open_session)
+    service = ResultService()
+
+    try:
+        first = asyncio.run(service.get_result_summary_json(attempt_id, user_id))
+        # Attempt owner and summary each take one query the first time...
+        assert [len(session.statements) for session in sessions] == [1, 1]
+        # ...and none after that
+        assert asyncio.run(service.get_result_summary_json(attempt_id, user_id)) == first
+        assert len(sessions) == 2
+        with pytest.raises(HTTPException) as not_owner:
+            asyncio.run(service.get_result_summary_json(attempt_id, uuid.uuid4()))
+        assert not_owner.value.status_code == 404
+    finally:
+        attempt_cache.pop(attempt_id)
+        result_summary_cache.pop(attempt_id)
+
+
+def test_submitted_answers_come_back_under_the_displayed_labels(monkeypatch):
+    monkeypatch.setattr(settings, "AUTOSAVE_WRITE_BEHIND", False)
+    now = datetime.now(timezone.utc)
+    question = Question(id=uuid.uuid4(), version=1, title="Pick", ques_type="single_choice", max_score=4,
+                        options={label: f"option {label}" for label in "ABCD"},
+                        correct_answers={"selected_options": ["A"]})
+    exam_id = uuid.uuid4()
+    paper = ExamPaper(ExamPaperOut(exam_id=exam_id, title="Quiz", start_time=now, end_time=now,
+                                   duration_minutes=10, questions=[PaperQuestionOut.model_validate(question)]),
+                      is_published=True)
+    # A seed that moves the correct option's text off label A
+    seed = next(seed for seed in range(1, 100)
+                if paper.relabel_answers(seed, {question.id: {"selected_options": ["A"]}},
+                                         to_display=True)[question.id] != {"selected_options": ["A"]})
+    displayed = paper.relabel_answers(seed, {question.id: {"selected_options": ["A"]}}, to_display=True)
+
+    async def cached_paper(db, exam_id):
+        return paper
+
+    keys = AnswerKeyCache()
+    keys.put(compile_question_key(question))
+    monkeypatch.setattr(result_services, "answer_key_cache", keys)
+    service = ResultService()
+    monkeypatch.setattr(service.exam_service, "get_cached_paper", cached_paper)
+
+    def make_attempt():
+        return ExamAttempt(
+            id=uuid.uuid4(), exam_id=exam_id, user_id=uuid.uuid4(), shuffle_seed=seed,
+            start_time=now, is_submitted=False,
+            attempt_answers=[AttemptAnswer(id=uuid.uuid4(), question_id=question.id, question=question,
+                                           is_graded=False, student_answer={"selected_options": ["A"]})])
+
+    attempt = make_attempt()
+    submitted = asyncio.run(service.submit_exam_attempt(CountingSession(attempt), attempt.id, attempt.user_id))
+    assert submitted.total_score == 4
+    assert submitted.attempt_answers[0].student_answer == displayed[question.id]
+    # Stored answers keep the canonical labels they were graded under
+    assert attempt.attempt_answers[0].student_answer == {"selected_options": ["A"]}
+
+    attempt = make_attempt()
+    monkeypatch.setattr(result_services, "async_session", lambda: CountingSession(attempt))
+    attempt_cache.set(attempt.id, (attempt.exam_id, attempt.user_id, seed))
+    try:
+        body = asyncio.run(service.get_full_result_json(attempt.id, attempt.user_id))
+        assert json.loads(body)["attempt_answers"][0]["student_answer"] == displayed[question.id]
+    finally:
+        attempt_cache.pop(attempt.id)
@@ -0,0 +1,113 @@
+import asyncio
+import math
+import time
+import uuid
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+
+import auth.services as auth_services
+import auth.utils as auth_utils
+from auth.services import UserService
+from auth.utils import BloomFilter, RevokedTokenFilter
+from conf.config import settings
+
+
+def jtis(count):
+    return [str(uuid.uuid4()) for _ in range(count)]
+
+
+@pytest.mark.parametrize("capacity, error_rate", [(10_000, 0.01), (20_000, 0.001)])
+def test_bloom_filter_has_no_false_negatives_and_bounded_false_positives(capacity, error_rate):
+    bloom = BloomFilter(capacity, error_rate)
+    members = jtis(capacity)
+    for jti in members:
+        bloom.add(jti)
+
+    assert all(jti in bloom for jti in members)
+    probes = 200_000
+    false_positives = sum(jti in bloom for jti in jtis(probes))
+    assert false_positives / probes < 2 * error_rate
+    # About 1.44 * log2(1 / error_rate) bits per item
+    assert len(bloom._bits) * 8 <= 1.5 * capacity * 1.44 * -math.log2(error_rate)
+
+
+def test_bloom_filter_lookups_stay_cheap():
+    """A revoked-token check runs on every authenticated request."""
+    bloom = BloomFilter(settings.REVOKED_TOKEN_FILTER_CAPACITY, settings.REVOKED_TOKEN_FILTER_ERROR_RATE)
+    for jti in jtis(10_000):
+        bloom.add(jti)
+    probes = jtis(20_000)
+    started = time.perf_counter()
+    for jti in probes:
+        jti in bloom
+    per_lookup = (time.perf_counter() - started) / len(probes)
+    # A few microseconds here
+    assert per_lookup < 50e-6
+
+
+def test_filter_is_rebuilt_larger_once_past_capacity():
+    revoked = RevokedTokenFilter(capacity=10, error_rate=0.01)
+    for jti in jtis(11):
+        revoked.add(jti)
+    assert revoked.needs_rebuild
+
+    members = jtis(5000)
+    revoked.replace(members, datetime.now(timezone.utc))
+    assert not revoked.needs_rebuild
+    assert revoked.bloom.capacity >= 2 * len(members)
+    assert all(revoked.might_contain(jti) for jti in members)
+    assert revoked.metrics()["items"] == len(members)
+
+
+class RevokedSession:
+    def __init__(self, revoked) -> None:
+        self.revoked = revoked
+        self.queries = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def execute(self, stmt):
+        self.queries += 1
+        return SimpleNamespace(scalar=lambda: self.revoked)
+
+
+@pytest.fixture
+def token_filter(monkeypatch):
+    revoked = RevokedTokenFilter(capacity=100, error_rate=0.01)
+    monkeypatch.setattr(auth_utils, "revoked_token_filter", revoked)
+    monkeypatch.setattr(auth_services, "revoked_token_filter", revoked)
+    return revoked
+
+
+def test_only_filter_hits_query_the_database(token_filter, monkeypatch):
+    session = RevokedSession(revoked=True)
+    monkeypatch.setattr(auth_services, "async_session", lambda: session)
+    revoked_jti = str(uuid.uuid4())
+    token_filter.add(revoked_jti)
+    service = UserService()
+
+    unseen = next(jti for jti in jtis(100) if jti not in token_filter.bloom)
+    assert asyncio.run(service.is_token_revoked(unseen)) is False
+    assert session.queries == 0
+
+    assert asyncio.run(service.is_token_revoked(revoked_jti)) is True
+    assert session.queries == 1
+    assert token_filter.hits == 1
+    assert token_filter.false_positives == 0
+
+
+def test_false_positive_is_confirmed_and_counted(token_filter, monkeypatch):
+    session = RevokedSession(revoked=False)
+    monkeypatch.setattr(auth_services, "async_session", lambda: session)
+    jti = str(uuid.uuid4())
+    token_filter.add(jti)
+
+    assert asyncio.run(UserService().is_token_revoked(jti)) is False
+    assert session.queries == 1
+    assert token_filter.false_positives == 1
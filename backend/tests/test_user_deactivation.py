@@ -0,0 +1,143 @@
+import asyncio
+import time
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+import auth.dependencies as auth_dependencies
+import conf.cache
+from auth.dependencies import check_token_user, get_user_claims
+from auth.models import User, UserRole
+from auth.schemas import UserUpdateSchema
+from auth.services import UserService
+from auth.utils import token_epoch_floors, user_cache
+from conf.config import settings
+
+MISSING = object()
+
+
+class FakeUserSession:
+    """The AsyncSession calls UserService makes, over a dict of users."""
+
+    def __init__(self, users) -> None:
+        self.users = users
+        self.gets = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def get(self, cls, user_id):
+        self.gets += 1
+        return self.users.get(user_id)
+
+    async def merge(self, user, load=True):
+        return user
+
+    async def commit(self):
+        pass
+
+    async def refresh(self, user):
+        pass
+
+
+@pytest.fixture
+def student():
+    user = User(
+        id=uuid.uuid4(), username="student", email="student@example.com", password_hash="x",
+        role=UserRole.STUDENT, is_active=True, is_verified=True, token_epoch=0,
+    )
+    yield user
+    user_cache.pop(user.id)
+    token_epoch_floors.pop(user.id, None)
+
+
+def token_for(user: User, issued_ago: float = 0.0):
+    return {
+        "user_id": str(user.id), "email": user.email, "role": user.role.value,
+        "verified": True, "epoch": user.token_epoch, "iat": time.time() - issued_ago,
+    }
+
+
+def claims(token):
+    return asyncio.run(get_user_claims(token_details=token))
+
+
+def test_deactivation_bumps_epoch_and_evicts_cached_user(student):
+    session = FakeUserSession({student.id: student})
+    service = UserService()
+
+    async def run():
+        await service.get_user_by_id(student.id, session)
+        assert user_cache.get(student.id, MISSING) is not MISSING
+        return await service.update_user(student, UserUpdateSchema(is_active=False), session)
+
+    user = asyncio.run(run())
+    assert user.token_epoch == 1
+    assert user_cache.get(student.id, MISSING) is MISSING
+    assert token_epoch_floors[student.id] == 1
+
+
+def test_old_token_rejected_on_the_user_row_path(student):
+    token = token_for(student)
+    session = FakeUserSession({student.id: student})
+    asyncio.run(UserService().update_user(student, UserUpdateSchema(is_active=False), session))
+
+    with pytest.raises(HTTPException) as inactive:
+        check_token_user(student, token)
+    assert inactive.value.status_code == 403
+
+    # Reactivating does not bring tokens from before the deactivation back
+    student.is_active = True
+    with pytest.raises(HTTPException) as revoked:
+        check_token_user(student, token)
+    assert revoked.value.status_code == 401
+    assert check_token_user(student, token_for(student)) is student
+
+
+def test_claims_rejected_at_once_in_the_deactivating_process(student):
+    token = token_for(student)
+    assert claims(token).id == student.id
+
+    session = FakeUserSession({student.id: student})
+    asyncio.run(UserService().update_user(student, UserUpdateSchema(is_active=False), session))
+
+    # Fresh enough to skip the user row, but below this process's epoch floor
+    with pytest.raises(HTTPException) as revoked:
+        claims(token)
+    assert revoked.value.status_code == 401
+
+
+def test_claims_rejected_within_the_stated_bound_in_other_processes(student, monkeypatch):
+    """
+    A worker that did not run the deactivation has no epoch floor. It trusts
+    a token for CLAIMS_MAX_TOKEN_AGE_SECONDS after issue, and then a cached
+    user row for up to USER_CACHE_TTL_SECONDS more.
+    """
+    session = FakeUserSession({student.id: student})
+    monkeypatch.setattr(auth_dependencies, "async_session", lambda: session)
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(conf.cache, "time", SimpleNamespace(monotonic=lambda: clock.now))
+
+    fresh = token_for(student)
+    past_bound = token_for(student, issued_ago=settings.CLAIMS_MAX_TOKEN_AGE_SECONDS + 1)
+    # This worker has seen the user while still active
+    assert claims(past_bound).id == student.id
+
+    # Deactivated by another worker: only the database row changes
+    student.is_active = False
+    student.token_epoch += 1
+
+    # Inside the bound both tokens still pass here...
+    assert claims(fresh).id == student.id
+    assert claims(past_bound).id == student.id
+    # ...and once the cached row expires, the token past its claims age does not
+    clock.now += settings.USER_CACHE_TTL_SECONDS + 1
+    with pytest.raises(HTTPException) as inactive:
+        claims(past_bound)
+    assert inactive.value.status_code == 403
+    assert session.gets == 2
@@ -1,15 +1,26 @@
-import { useQuery } from "@tanstack/react-query";
+import { useInfiniteQuery } from "@tanstack/react-query";
 import axiosClient from "../../api/axiosClient";
 
-export function useListQuestions(filters) {
-    const params = new URLSearchParams(filters).toString();
+const PAGE_LIMIT = 50;
 
-    return useQuery({
+export function useListQuestions(filters) {
+    return useInfiniteQuery({
         queryKey: ["questions", filters],
-        queryFn: async () => {
-            const response = await axiosClient.get(`/exam/all-questions?${params}`);
+        // Paged response: { items, next_cursor, total }. One page per fetch;
+        // callers load more with fetchNextPage() while hasNextPage is true.
+        queryFn: async ({ pageParam }) => {
+            const params = new URLSearchParams({ ...filters, limit: PAGE_LIMIT });
+            if (pageParam) {
+                params.set("cursor", pageParam);
+            } else {
+                // Counting costs a second query; the first page is enough
+                params.set("include_total", "true");
+            }
+            const response = await axiosClient.get(`/exam/all-questions?${params.toString()}`);
             return response.data;
         },
+        initialPageParam: null,
+        getNextPageParam: (lastPage) => lastPage.next_cursor ?? undefined,
         enabled: !!localStorage.getItem("access_token"),
     });
-}
\ No newline at end of file
+}
@@ -1,4 +1,4 @@
-import React, { use, useState } from 'react';
+import React, { use, useMemo, useState } from 'react';
 import { UploadCloud, List, Settings, Lock } from 'lucide-react';
 import QuestionBank from './_components/QuestionBank';
 import ExamCreator from './_components/ExamCreator';
@@ -13,11 +13,22 @@ const AdminDashboard = () => {
   const { data: examsData } = useAvailableExams();
   const exams = examsData || [];
 
-  const { data: questionsData, refetch: refetchQuestions } = useListQuestions({});
-  const questions = questionsData || [];
+  const {
+    data: questionsData,
+    refetch: refetchQuestions,
+    fetchNextPage,
+    hasNextPage,
+    isFetchingNextPage,
+  } = useListQuestions({});
+  // Pages loaded so far; the list components ask for more with fetchNextPage
+  const questions = useMemo(
+    () => questionsData?.pages.flatMap(page => page.items) || [],
+    [questionsData]
+  );
+  const questionTotal = questionsData?.pages[0]?.total ?? questions.length;
 
   const navItems = [
-    { id: 'questions', name: 'Question Bank', icon: List, component: QuestionBank, count: questions.length },
+    { id: 'questions', name: 'Question Bank', icon: List, component: QuestionBank, count: questionTotal },
     { id: 'exams', name: 'Exam Management', icon: Settings, component: ExamCreator, count: exams.length },
     { id: 'import', name: 'Import Questions', icon: UploadCloud, component: QuestionImporter },
   ];
@@ -61,6 +72,10 @@ const AdminDashboard = () => {
           {CurrentComponent && (
             <CurrentComponent
               questions={questions}
+              questionTotal={questionTotal}
+              fetchNextPage={fetchNextPage}
+              hasNextPage={hasNextPage}
+              isFetchingNextPage={isFetchingNextPage}
               setQuestions={questions}
               exams={exams}
               setExams={exams}
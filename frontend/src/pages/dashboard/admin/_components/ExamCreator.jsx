@@ -4,7 +4,7 @@ import {useCreateExam} from '../../../../hooks/exam/useCreateExam';
 import { useUpdateExam } from '../../../../hooks/exam/useUpdateExam';
 import {useListQuestions} from "../../../../hooks/exam/useListQuestions";
 
-const ExamCreator = ({ questions, exams, setExams }) => {
+const ExamCreator = ({ questions, fetchNextPage, hasNextPage, isFetchingNextPage, exams, setExams }) => {
     const [isCreating, setIsCreating] = useState(false);
     const [newExam, setNewExam] = useState({ title: '', duration: 60, startTime: '', endTime: '', questionIds: [] });
     const [searchTerm, setSearchTerm] = useState('');
@@ -138,6 +138,13 @@ const ExamCreator = ({ questions, exams, setExams }) => {
                                         </li>
                                     ))
                                 )}
+                                {hasNextPage && (
+                                    <li className="flex justify-center p-2">
+                                        <button type="button" onClick={() => fetchNextPage()} disabled={isFetchingNextPage} className="text-primary text-sm font-semibold hover:text-primary/70 transition-colors disabled:opacity-50">
+                                            {isFetchingNextPage ? 'Loading...' : 'Load more questions'}
+                                        </button>
+                                    </li>
+                                )}
                             </ul>
                         </div>
                     </div>
@@ -2,7 +2,7 @@ import React, { useState, useMemo } from 'react';
 import { Search, List, Eye, Trash2 } from 'lucide-react';
 import QuestionDetailModal from './QuestionDetailModal';
 
-const QuestionBank = ({ questions, setQuestions }) => {
+const QuestionBank = ({ questions, questionTotal, fetchNextPage, hasNextPage, isFetchingNextPage, setQuestions }) => {
     const [searchTerm, setSearchTerm] = useState('');
     const [filterSubject, setFilterSubject] = useState('All');
     const [selectedQuestion, setSelectedQuestion] = useState(null);
@@ -27,7 +27,7 @@ const QuestionBank = ({ questions, setQuestions }) => {
 
     return (
         <div className="bg-card p-6 rounded-2xl shadow-xl border border-border space-y-6">
-            <h2 className="text-2xl font-bold text-foreground flex items-center"><List className="h-6 w-6 mr-3 text-primary" /> Question Bank ({questions.length})</h2>
+            <h2 className="text-2xl font-bold text-foreground flex items-center"><List className="h-6 w-6 mr-3 text-primary" /> Question Bank ({questionTotal})</h2>
 
             <div className="flex flex-col md:flex-row space-y-4 md:space-y-0 md:space-x-4">
                 <div className="relative">
@@ -95,6 +95,18 @@ const QuestionBank = ({ questions, setQuestions }) => {
                 </table>
             </div>
 
+            {hasNextPage && (
+                <div className="flex justify-center">
+                    <button
+                        onClick={() => fetchNextPage()}
+                        disabled={isFetchingNextPage}
+                        className="bg-secondary text-foreground font-semibold px-6 py-2 rounded-xl hover:bg-accent transition-colors disabled:opacity-50 disabled:cursor-not-allowed"
+                    >
+                        {isFetchingNextPage ? 'Loading...' : `Load more (${questions.length} of ${questionTotal} shown)`}
+                    </button>
+                </div>
+            )}
+
             <QuestionDetailModal question={selectedQuestion} onClose={() => setSelectedQuestion(null)} />
         </div>
     );